@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+מאגר סיכומים חודשיים - שמירת סכומים מצטברים לכל (חשבון, מקור, יום),
+כך שניתוח מחדש נוגע רק בימים החדשים.
+
+שימוש:
+  python aggregates.py store.db ingest <account> transactions.ndjson [--whole-months | --append]
+  python aggregates.py store.db report <account> [--from YYYY-MM] [--to YYYY-MM]
+
+Each (account, source, day) row holds pre-summed income, expenses and
+transaction count, plus per-category expense sums and counts. The
+`summary`, `categories` and `trends` blocks for generate_report (Module 1-3,
+including month-over-month change and 3-month moving averages) are built
+from these aggregates alone, grouped by month, so refreshing five years of
+history costs O(days) instead of O(transactions).
+
+Ingesting replaces, per source, only the days from the input's first to its
+last date: a statement that starts mid-month leaves the earlier part of that
+month as it was. Whole-month replacement (--whole-months) and adding to the
+stored sums (--append) are explicit.
+"""
+
+import sys
+import json
+import sqlite3
+from collections import defaultdict
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS days (
+    account   TEXT NOT NULL,
+    source    TEXT NOT NULL,
+    day       TEXT NOT NULL,          -- YYYY-MM-DD
+    income    REAL NOT NULL DEFAULT 0,
+    expenses  REAL NOT NULL DEFAULT 0,
+    tx_count  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (account, source, day)
+);
+CREATE TABLE IF NOT EXISTS day_categories (
+    account   TEXT NOT NULL,
+    source    TEXT NOT NULL,
+    day       TEXT NOT NULL,
+    category  TEXT NOT NULL,
+    amount    REAL NOT NULL DEFAULT 0,
+    tx_count  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (account, source, day, category)
+);
+"""
+
+INGEST_MODES = ('range', 'months', 'append')
+
+
+def aggregate_month(transactions):
+    """Pre-sum a batch of transactions (one day or one month):
+    (income, expenses, count, {category: [amount, count]}).
+
+    Bank lines flagged as card-bill duplicates (reconcile.py) are skipped.
+    """
+    income = expenses = 0.0
+    cats = defaultdict(lambda: [0.0, 0])
+    n = 0
+    for tx in transactions:
+        if tx.get('duplicate'):
+            continue
+        amt = tx.get('amount', 0) or 0
+        n += 1
+        if amt > 0:
+            income += amt
+        elif amt < 0:
+            expenses -= amt
+            c = cats[tx.get('category') or 'אחר']
+            c[0] -= amt
+            c[1] += 1
+    return income, expenses, n, dict(cats)
+
+
+def _pct_change(prev, cur):
+    return round((cur - prev) / prev * 100, 1) if prev else None
+
+
+def _moving_average(values, window=3):
+    out = []
+    for i in range(len(values)):
+        if i + 1 < window:
+            out.append(None)
+        else:
+            out.append(round(sum(values[i + 1 - window:i + 1]) / window, 2))
+    return out
+
+
+# --- Report blocks (shared with tx_store.py) ---
+def trends_block(months, incomes, expenses):
+    incomes = [round(v, 2) for v in incomes]
+    expenses = [round(v, 2) for v in expenses]
+    return {
+        'months': list(months),
+        'incomes': incomes,
+        'expenses': expenses,
+        'savings': [round(i - e, 2) for i, e in zip(incomes, expenses)],
+        'income_change_pct': [None] + [_pct_change(a, b) for a, b in zip(incomes, incomes[1:])],
+        'expense_change_pct': [None] + [_pct_change(a, b) for a, b in zip(expenses, expenses[1:])],
+        'incomes_ma3': _moving_average(incomes),
+        'expenses_ma3': _moving_average(expenses),
+    }
+
+
+def summary_block(income, expenses, count, n_months):
+    months = n_months or 1
+    return {
+        'total_income': round(income, 2),
+        'total_expenses': round(expenses, 2),
+        'avg_monthly_saving': round((income - expenses) / months, 2),
+        'expense_ratio': round(expenses / income * 100, 1) if income else None,
+        'total_transactions': count,
+        'avg_transactions_per_month': round(count / months, 1),
+        'months': n_months,
+    }
+
+
+def categories_block(rows):
+    """rows: [(category, amount)], largest first."""
+    total = sum(r[1] for r in rows) or 1
+    return {
+        'labels': [r[0] for r in rows],
+        'amounts': [round(r[1], 2) for r in rows],
+        'percentages': [round(r[1] / total * 100, 1) for r in rows],
+    }
+
+
+# ============================================================
+# Store
+# ============================================================
+class AggregateStore:
+    """SQLite-backed aggregates keyed by (account, source, day), read back by month."""
+
+    def __init__(self, path=':memory:'):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Writes ---
+    def _write_days(self, account, source, transactions, add=False):
+        by_day = defaultdict(list)
+        for tx in transactions:
+            if tx.get('date'):
+                by_day[tx['date'][:10]].append(tx)
+        rows, cat_rows = [], []
+        for day, txs in by_day.items():
+            income, expenses, n, cats = aggregate_month(txs)
+            key = (account, source, day)
+            rows.append(key + (income, expenses, n))
+            cat_rows += [key + (c, a, k) for c, (a, k) in cats.items()]
+        if add:
+            self.conn.executemany(
+                'INSERT INTO days VALUES (?,?,?,?,?,?) '
+                'ON CONFLICT(account, source, day) DO UPDATE SET '
+                'income=income+excluded.income, expenses=expenses+excluded.expenses, '
+                'tx_count=tx_count+excluded.tx_count', rows)
+            self.conn.executemany(
+                'INSERT INTO day_categories VALUES (?,?,?,?,?,?) '
+                'ON CONFLICT(account, source, day, category) DO UPDATE SET '
+                'amount=amount+excluded.amount, tx_count=tx_count+excluded.tx_count', cat_rows)
+        else:
+            self.conn.executemany('INSERT INTO days VALUES (?,?,?,?,?,?)', rows)
+            self.conn.executemany('INSERT INTO day_categories VALUES (?,?,?,?,?,?)', cat_rows)
+
+    def _delete_days(self, account, source, first, last):
+        for table in ('days', 'day_categories'):
+            self.conn.execute(f'DELETE FROM {table} WHERE account=? AND source=? '
+                              'AND day>=? AND day<=?', (account, source, first, last))
+
+    def replace_range(self, account, source, first, last, transactions):
+        """Overwrite the days first..last (YYYY-MM-DD, inclusive) with the given
+        transactions; days in the range without transactions become empty."""
+        with self.conn:
+            self._delete_days(account, source, first, last)
+            self._write_days(account, source, transactions)
+
+    def replace_month(self, account, source, month, transactions):
+        """Overwrite one whole month's aggregates with those of the given transactions."""
+        self.replace_range(account, source, f'{month}-01', f'{month}-31', transactions)
+
+    def append_month(self, account, source, month, transactions):
+        """Add transactions to a month's existing aggregates (e.g. rows missing from it).
+
+        Rows are stored under their own day; `month` names the batch for ingest().
+        """
+        with self.conn:
+            self._write_days(account, source, transactions, add=True)
+
+    def ingest(self, account, transactions, mode='range'):
+        """Split unified transactions by source and store them.
+
+        mode: 'range'  - per source, replace only the days from the input's
+                         first to its last date (default; safe for partial
+                         statements)
+              'months' - replace every month the input touches
+              'append' - add to the stored aggregates
+        Returns the sorted list of (source, month) keys that were touched.
+        """
+        if mode not in INGEST_MODES:
+            raise ValueError(f"Unknown ingest mode: {mode} (expected one of {INGEST_MODES})")
+        buckets = defaultdict(list)
+        for tx in transactions:
+            if tx.get('date'):
+                buckets[(tx.get('source') or '', tx['date'][:7])].append(tx)
+        if mode == 'range':
+            by_source = defaultdict(list)
+            for (source, _), txs in buckets.items():
+                by_source[source] += txs
+            for source, txs in by_source.items():
+                days = [tx['date'][:10] for tx in txs]
+                self.replace_range(account, source, min(days), max(days), txs)
+        else:
+            write = self.replace_month if mode == 'months' else self.append_month
+            for (source, month), txs in buckets.items():
+                write(account, source, month, txs)
+        return sorted(buckets)
+
+    def delete_month(self, account, source, month):
+        with self.conn:
+            self._delete_days(account, source, f'{month}-01', f'{month}-31')
+
+    # --- Reads ---
+    def _where(self, account, start, end, sources):
+        # start / end are months; 'YYYY-MM' sorts before that month's days
+        sql, args = ' WHERE account=?', [account]
+        if start:
+            sql += ' AND day>=?'
+            args.append(start)
+        if end:
+            sql += ' AND day<=?'
+            args.append(f'{end}-31')
+        if sources:
+            sql += f" AND source IN ({','.join('?' * len(sources))})"
+            args += list(sources)
+        return sql, args
+
+    def months(self, account, start=None, end=None, sources=None):
+        """[(month, income, expenses, tx_count)] summed over sources, oldest first."""
+        where, args = self._where(account, start, end, sources)
+        return self.conn.execute(
+            'SELECT substr(day, 1, 7) AS month, SUM(income), SUM(expenses), SUM(tx_count) '
+            'FROM days' + where + ' GROUP BY month ORDER BY month', args).fetchall()
+
+    def trends(self, account, start=None, end=None, sources=None):
+        rows = self.months(account, start, end, sources)
+        return trends_block([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows])
+
+    def summary(self, account, start=None, end=None, sources=None):
+        rows = self.months(account, start, end, sources)
+        return summary_block(sum(r[1] for r in rows), sum(r[2] for r in rows),
+                             sum(r[3] for r in rows), len(rows))
+
+    def categories(self, account, start=None, end=None, sources=None):
+        where, args = self._where(account, start, end, sources)
+        return categories_block(self.conn.execute(
+            'SELECT category, SUM(amount) AS total FROM day_categories'
+            + where + ' GROUP BY category ORDER BY total DESC', args).fetchall())
+
+    def report_blocks(self, account, start=None, end=None, sources=None):
+        """The `summary`, `categories`, `trends` and `period` blocks for generate_report."""
+        trends = self.trends(account, start, end, sources)
+        months = trends['months']
+        return {
+            'period': {'from': months[0] if months else '', 'to': months[-1] if months else ''},
+            'summary': self.summary(account, start, end, sources),
+            'categories': self.categories(account, start, end, sources),
+            'trends': trends,
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Incremental monthly aggregate store.')
+    parser.add_argument('db', help='SQLite database file')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_in = sub.add_parser('ingest', help="replace the date range an NDJSON file covers")
+    p_in.add_argument('account')
+    p_in.add_argument('transactions')
+    mode = p_in.add_mutually_exclusive_group()
+    mode.add_argument('--whole-months', dest='mode', action='store_const', const='months',
+                      default='range', help='replace every month the file touches')
+    mode.add_argument('--append', dest='mode', action='store_const', const='append',
+                      help='add to the stored aggregates instead')
+    p_rep = sub.add_parser('report', help='print summary/categories/trends as JSON')
+    p_rep.add_argument('account')
+    p_rep.add_argument('--from', dest='start')
+    p_rep.add_argument('--to', dest='end')
+    args = parser.parse_args()
+
+    with AggregateStore(args.db) as store:
+        if args.cmd == 'ingest':
+            with open(args.transactions, 'r', encoding='utf-8') as f:
+                txs = [json.loads(line) for line in f if line.strip()]
+            touched = store.ingest(args.account, txs, mode=args.mode)
+            print(f"Stored {len(touched)} month(s) for {args.account}")
+        else:
+            json.dump(store.report_blocks(args.account, args.start, args.end),
+                      sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write('\n')
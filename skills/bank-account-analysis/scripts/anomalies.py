@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+זיהוי הוצאות חריגות - מודול 5 ב-references/analysis-guide.md, במעבר יחיד.
+
+שימוש:
+  python anomalies.py transactions.ndjson [--state anomalies_state.json] > anomalies.json
+
+Running (Welford) mean/variance is kept per category, for daily spend and
+for each category's monthly total. Every expense is compared with the
+statistics of the history *before* it and then folded in, so a date-ordered
+stream of transactions is flagged in one pass, holding only the open day's
+totals. Days without expenses count as zero-spend days, and every standard
+deviation has a floor (STD_FLOOR of the mean, at least MIN_STD), so a flat
+history does not turn any small rise into an anomaly. The state serialises
+to JSON: next month's run loads it and only processes the new rows - earlier
+days are skipped, and rows of the still-open day are recognised by a
+fingerprint (date, description, amount, source) so an overlapping export is
+not counted twice.
+
+Flags (expenses only, deviations above the mean):
+  - transaction > 2σ from its category mean  (3σ+ = high, 2-3σ = medium)
+  - day whose total spend is > 2σ above the daily mean
+  - month where a category jumps > 30% above its monthly mean (60%+ = high)
+
+The output is the `anomalies` list used by generate_report:
+  [{date, description, amount, severity, kind, category}, ...]
+"""
+
+import sys
+import json
+import math
+from datetime import date
+
+
+MEDIUM_SIGMA = 2.0
+HIGH_SIGMA = 3.0
+MONTH_JUMP = 0.30
+MONTH_JUMP_HIGH = 0.60
+MIN_SAMPLES = 5          # history needed before a statistic can flag anything
+STD_FLOOR = 0.10         # std never below this share of the mean...
+MIN_STD = 1.0            # ...or this many ₪
+MIN_MONTH_TOTAL = 100.0  # ignore jumps in categories with trivial spend
+
+DAY_LABEL = 'הוצאות יומיות חריגות'
+
+
+class Welford:
+    """Running count / mean / variance (Welford's algorithm)."""
+
+    __slots__ = ('n', 'mean', 'm2')
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n, self.mean, self.m2 = n, mean, m2
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def add_repeated(self, x, k):
+        """add(x) k times, in O(1) (Chan et al. merge with a zero-variance batch)."""
+        if k <= 0:
+            return
+        n = self.n + k
+        delta = x - self.mean
+        self.m2 += delta * delta * self.n * k / n
+        self.mean += delta * k / n
+        self.n = n
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def sigma(self, x):
+        """Deviation of x above the mean in standard deviations (None if not enough data)."""
+        if self.n < MIN_SAMPLES:
+            return None
+        std = max(self.std, STD_FLOOR * abs(self.mean), MIN_STD)
+        return (x - self.mean) / std
+
+    def to_list(self):
+        return [self.n, self.mean, self.m2]
+
+
+def _severity(sigma):
+    if sigma is None or sigma <= MEDIUM_SIGMA:
+        return None
+    return 'high' if sigma > HIGH_SIGMA else 'medium'
+
+
+def _ordinal(day):
+    return date.fromisoformat(day).toordinal()
+
+
+def _fingerprint(tx):
+    return f"{tx['date'][:10]}|{tx.get('description', '')}|{tx['amount']}|{tx.get('source', '')}"
+
+
+# ============================================================
+# Detector
+# ============================================================
+class AnomalyDetector:
+    """
+    Incremental anomaly detector over unified-schema transactions.
+
+    Feed transactions in date order with update() (detect_anomalies sorts a
+    whole list for you); call pending() to also evaluate the still-open day
+    and month. save()/load() persist the state.
+    """
+
+    def __init__(self, ignore_categories=()):
+        self.ignore_categories = set(ignore_categories)
+        self.by_category = {}
+        self.daily = Welford()
+        self.monthly = {}          # category -> Welford of monthly totals
+        self.open_day = None       # 'YYYY-MM-DD'
+        self.day_total = 0.0
+        self.open_month = None     # 'YYYY-MM'
+        self.month_totals = {}     # category -> total in open_month
+        self.day_seen = {}         # fingerprint -> rows already counted in open_day
+        self.skipped = 0
+
+    # --- Period closing ---
+    def _close_day(self, out):
+        if self.open_day is None:
+            return
+        sev = _severity(self.daily.sigma(self.day_total))
+        if sev:
+            out.append({'date': self.open_day, 'description': DAY_LABEL,
+                        'amount': -round(self.day_total, 2), 'severity': sev,
+                        'kind': 'day', 'category': None})
+        self.daily.add(self.day_total)
+        self.day_total = 0.0
+        self.day_seen = {}
+
+    def _month_flags(self):
+        flags = []
+        for cat, total in self.month_totals.items():
+            w = self.monthly.get(cat)
+            if w is None or w.n < 1 or w.mean <= 0 or total < MIN_MONTH_TOTAL:
+                continue
+            jump = total / w.mean - 1
+            if jump > MONTH_JUMP:
+                flags.append({
+                    'date': self.open_month,
+                    'description': f'קפיצה של {jump:.0%} ב{cat}',
+                    'amount': -round(total, 2),
+                    'severity': 'high' if jump > MONTH_JUMP_HIGH else 'medium',
+                    'kind': 'month', 'category': cat,
+                })
+        return flags
+
+    def _close_month(self, out):
+        if self.open_month is None:
+            return
+        out.extend(self._month_flags())
+        for cat, total in self.month_totals.items():
+            self.monthly.setdefault(cat, Welford()).add(total)
+        # Categories with no spend this month still count as a zero month
+        for cat, w in self.monthly.items():
+            if cat not in self.month_totals:
+                w.add(0.0)
+        self.month_totals = {}
+
+    # --- Streaming ---
+    def update(self, transactions):
+        """Process new transactions; returns the anomalies they close out.
+
+        transactions: any iterable in date order; it is consumed lazily.
+        Rows dated before the day that was open when the call started were
+        accounted for by an earlier run and are skipped; so are open-day rows
+        matching ones counted before (identical rows are told apart by their
+        count). Any other row older than the open day raises ValueError.
+        """
+        out = []
+        resumed_day, counted, repeats = self.open_day, dict(self.day_seen), {}
+        for tx in transactions:
+            if not tx.get('date'):
+                continue
+            amount = tx.get('amount') or 0
+            cat = tx.get('category') or 'אחר'
+            if amount >= 0 or cat in self.ignore_categories:
+                continue
+            day = tx['date'][:10]
+            if self.open_day is not None and day < self.open_day:
+                if resumed_day is None or day >= resumed_day:
+                    raise ValueError(f"transactions must be in date order ({day} after "
+                                     f"{self.open_day}); sort them or use detect_anomalies()")
+                self.skipped += 1
+                continue
+            fp = _fingerprint(tx)
+            if day == resumed_day:
+                repeats[fp] = repeats.get(fp, 0) + 1
+                if repeats[fp] <= counted.get(fp, 0):
+                    self.skipped += 1
+                    continue
+            spend = -amount
+
+            if day != self.open_day:
+                if self.open_day is not None:
+                    gap = _ordinal(day) - _ordinal(self.open_day) - 1
+                    self._close_day(out)
+                    self.daily.add_repeated(0.0, gap)    # days without expenses
+                month = day[:7]
+                if month != self.open_month:
+                    self._close_month(out)
+                    self.open_month = month
+                self.open_day = day
+
+            stats = self.by_category.setdefault(cat, Welford())
+            sev = _severity(stats.sigma(spend))
+            if sev:
+                out.append({'date': day, 'description': tx.get('description', ''),
+                            'amount': amount, 'severity': sev,
+                            'kind': 'transaction', 'category': cat})
+            stats.add(spend)
+            self.day_total += spend
+            self.day_seen[fp] = self.day_seen.get(fp, 0) + 1
+            self.month_totals[cat] = self.month_totals.get(cat, 0.0) + spend
+        return out
+
+    def pending(self):
+        """Evaluate the open day and month without closing them."""
+        out = []
+        if self.open_day is not None:
+            sev = _severity(self.daily.sigma(self.day_total))
+            if sev:
+                out.append({'date': self.open_day, 'description': DAY_LABEL,
+                            'amount': -round(self.day_total, 2), 'severity': sev,
+                            'kind': 'day', 'category': None})
+        if self.open_month is not None:
+            out.extend(self._month_flags())
+        return out
+
+    # --- Persistence ---
+    def to_dict(self):
+        return {
+            'version': 3,
+            'ignore_categories': sorted(self.ignore_categories),
+            'by_category': {k: w.to_list() for k, w in self.by_category.items()},
+            'daily': self.daily.to_list(),
+            'monthly': {k: w.to_list() for k, w in self.monthly.items()},
+            'open_day': self.open_day,
+            'day_total': self.day_total,
+            'open_month': self.open_month,
+            'month_totals': self.month_totals,
+            'day_seen': self.day_seen,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        det = cls(state.get('ignore_categories', ()))
+        det.by_category = {k: Welford(*v) for k, v in state['by_category'].items()}
+        det.daily = Welford(*state['daily'])
+        det.monthly = {k: Welford(*v) for k, v in state['monthly'].items()}
+        det.open_day = state['open_day']
+        det.day_total = state['day_total']
+        det.open_month = state['open_month']
+        det.month_totals = dict(state['month_totals'])
+        det.day_seen = dict(state.get('day_seen', {}))
+        return det
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def detect_anomalies(transactions, detector=None):
+    """One-shot helper: the full `anomalies` list for generate_report, newest first.
+
+    Sorts the transactions by date first; feed AnomalyDetector.update()
+    directly to stream input that is already in order.
+    """
+    det = detector or AnomalyDetector()
+    rows = sorted((tx for tx in transactions if tx.get('date')), key=lambda tx: tx['date'][:10])
+    found = det.update(rows) + det.pending()
+    found.sort(key=lambda a: a['date'], reverse=True)
+    return found
+
+
+if __name__ == '__main__':
+    import os
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Flag unusual expenses (Module 5).')
+    parser.add_argument('transactions', help='NDJSON file of unified transactions')
+    parser.add_argument('--state', help='detector state file, read if present and written back')
+    args = parser.parse_args()
+
+    det = (AnomalyDetector.load(args.state) if args.state and os.path.exists(args.state)
+           else AnomalyDetector())
+    with open(args.transactions, 'r', encoding='utf-8') as f:
+        txs = [json.loads(line) for line in f if line.strip()]
+    json.dump(detect_anomalies(txs, det), sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
+    if args.state:
+        det.save(args.state)
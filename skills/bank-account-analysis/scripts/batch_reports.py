@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+הפקת דוחות באצווה - הרצת generate_report על קבצי ניתוח רבים במאגר תהליכים.
+כל תהליך עובד טוען את הפונטים והסגנונות פעם אחת בלבד.
+
+שימוש:
+  python batch_reports.py <dir | "glob/*.json" | manifest.ndjson> <output_dir> [--workers N]
+
+מניפסט NDJSON - שורה לכל דוח:
+  {"input": "path/to/analysis.json", "output": "out.pdf"}
+  {"id": "cust-17", "data": {...analysis_data...}}
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import traceback
+from io import BytesIO
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+MANIFEST_EXTS = ('.ndjson', '.jsonl')
+
+
+# --- Job collection ---
+def _job_from_path(path, output_dir, name=None):
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    return {'id': name, 'input': path, 'output': os.path.join(output_dir, name + '.pdf')}
+
+
+def _unique_names(paths):
+    """Job names for input files: the file stem, prefixed with as many parent
+    directories as it takes to tell same-named files apart
+    ('a/analysis.json', 'b/analysis.json' -> 'a-analysis', 'b-analysis')."""
+    split = [os.path.abspath(p).split(os.sep) for p in paths]
+    depth = [0] * len(paths)
+    while True:
+        names = []
+        for parts, k in zip(split, depth):
+            *dirs, base = parts
+            names.append('-'.join(dirs[len(dirs) - k:] + [os.path.splitext(base)[0]]))
+        counts = Counter(names)
+        clash = [i for i, n in enumerate(names) if counts[n] > 1 and depth[i] < len(split[i]) - 2]
+        if not clash:
+            return names
+        for i in clash:
+            depth[i] += 1
+
+
+def _check_unique(jobs):
+    """Two jobs with one id or output would overwrite each other's PDF."""
+    for field in ('id', 'output'):
+        counts = Counter(job.get(field) for job in jobs if job.get(field))
+        dups = sorted(v for v, n in counts.items() if n > 1)
+        if dups:
+            raise ValueError(f"duplicate job {field}s: {', '.join(dups)}")
+    return jobs
+
+
+def _read_manifest(path, output_dir):
+    jobs = []
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if 'input' in entry:
+                job = _job_from_path(os.path.join(base, entry['input']), output_dir)
+            elif 'data' in entry:
+                job = {'id': f'line-{lineno}', 'data': entry['data']}
+            else:
+                raise ValueError(f"{path}:{lineno}: entry needs 'input' or 'data'")
+            job['id'] = str(entry.get('id', job['id']))
+            job['output'] = (os.path.join(output_dir, entry['output']) if entry.get('output')
+                             else job.get('output') or os.path.join(output_dir, job['id'] + '.pdf'))
+            jobs.append(job)
+    return _check_unique(jobs)
+
+
+def collect_jobs(source, output_dir):
+    """Expand a directory, glob pattern or NDJSON manifest into a list of jobs.
+
+    Each job is a dict with 'id', 'output' and either 'input' (path to an
+    analysis_data JSON file) or 'data' (the analysis_data dict itself).
+    Same-named input files are told apart by their parent directories; a
+    manifest that gives two jobs one id or output raises ValueError.
+    """
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, '*.json')))
+    elif source.endswith(MANIFEST_EXTS) and os.path.isfile(source):
+        return _read_manifest(source, output_dir)
+    else:
+        paths = sorted(glob.glob(source))
+    return _check_unique([_job_from_path(p, output_dir, name)
+                          for p, name in zip(paths, _unique_names(paths))])
+
+
+# --- Worker side ---
+def warm_up(chart_cache_dir=None):
+    """Pay the import / font registration / stylesheet cost once per worker."""
+    import generate_report
+    if chart_cache_dir:
+        from chart_cache import configure_chart_cache
+        configure_chart_cache(disk_dir=chart_cache_dir)
+    generate_report.setup_fonts()
+    generate_report.get_styles()
+    # Draw one chart with the configured backend: the vector one imports
+    # reportlab.graphics; the first matplotlib figure loads its font cache and
+    # the Agg backend (and numpy), which vector workers never need
+    if generate_report.CHART_BACKEND == 'vector':
+        from reportlab.graphics import renderPDF
+        renderPDF.drawToString(generate_report.chart_flowable('gauge', (0,), 100, 65))
+    elif generate_report.CHART_BACKEND == 'matplotlib':
+        generate_report.create_health_gauge.uncached(0)
+
+
+def render_job(job, section_cache=None):
+    """Render one job and return a result dict; never raises.
+
+    Without an 'output' path the PDF is rendered in memory and returned
+    under the 'pdf' key. section_cache is passed on to generate_report.
+    """
+    from generate_report import generate_report
+    start = time.perf_counter()
+    output = job.get('output')
+    pdf = None
+    try:
+        data = job.get('data')
+        if data is None:
+            with open(job['input'], 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        if output:
+            out_dir = os.path.dirname(output)
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
+            generate_report(data, output, section_cache=section_cache)
+        else:
+            buf = BytesIO()
+            generate_report(data, buf, section_cache=section_cache)
+            pdf = buf.getvalue()
+        error = None
+    except Exception:
+        error = traceback.format_exc(limit=5)
+    res = {
+        'id': job.get('id'),
+        'output': output,
+        'ok': error is None,
+        'error': error,
+        'seconds': time.perf_counter() - start,
+    }
+    if pdf is not None:
+        res['pdf'] = pdf
+    return res
+
+
+# --- Summary ---
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def summarize(results, wall_seconds):
+    latencies = sorted(r['seconds'] for r in results if r['ok'])
+    ok = len(latencies)
+    return {
+        'total': len(results),
+        'succeeded': ok,
+        'failed': len(results) - ok,
+        'wall_seconds': round(wall_seconds, 3),
+        'reports_per_sec': round(ok / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        'p50_seconds': round(_percentile(latencies, 50), 3),
+        'p95_seconds': round(_percentile(latencies, 95), 3),
+    }
+
+
+# ============================================================
+# Batch API
+# ============================================================
+def run_batch(jobs, workers=None, on_result=None, chart_cache_dir=None):
+    """
+    Render every job, fanning generate_report out over a process pool.
+
+    A failing job never stops the batch - its traceback is recorded in the
+    result and the remaining jobs keep running.
+
+    jobs:      list of job dicts (see collect_jobs)
+    workers:   pool size (default: os.cpu_count()); 1 renders in-process
+    on_result: optional callback invoked with each result as it completes
+    chart_cache_dir: on-disk chart cache shared by all workers (see chart_cache)
+
+    Returns {'results': [...], 'summary': {...}}.
+    """
+    workers = workers or os.cpu_count() or 1
+    results = []
+    start = time.perf_counter()
+
+    if workers == 1:
+        warm_up(chart_cache_dir)
+        for job in jobs:
+            res = render_job(job)
+            results.append(res)
+            if on_result:
+                on_result(res)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=warm_up,
+                                 initargs=(chart_cache_dir,)) as pool:
+            futures = [pool.submit(render_job, job) for job in jobs]
+            for fut in as_completed(futures):
+                res = fut.result()
+                results.append(res)
+                if on_result:
+                    on_result(res)
+
+    return {'results': results, 'summary': summarize(results, time.perf_counter() - start)}
+
+
+def _print_result(res):
+    if res['ok']:
+        print(f"  OK    {res['id']}  ({res['seconds']:.2f}s)  -> {res['output']}")
+    else:
+        last = res['error'].strip().splitlines()[-1]
+        print(f"  FAIL  {res['id']}  {last}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Render many analysis reports in one process pool.')
+    parser.add_argument('source', help='directory, glob pattern or NDJSON manifest of analysis payloads')
+    parser.add_argument('output_dir', help='directory for the generated PDFs')
+    parser.add_argument('--workers', type=int, default=None, help='pool size (default: CPU count)')
+    parser.add_argument('--chart-cache-dir', help='share rendered chart images between workers')
+    parser.add_argument('--summary-json', help='also write the results and summary to this file')
+    args = parser.parse_args()
+
+    try:
+        jobs = collect_jobs(args.source, args.output_dir)
+    except ValueError as e:
+        parser.error(str(e))
+    if not jobs:
+        print(f"No analysis payloads found in {args.source}")
+        sys.exit(1)
+
+    print(f"Rendering {len(jobs)} reports...")
+    batch = run_batch(jobs, workers=args.workers, on_result=_print_result,
+                      chart_cache_dir=args.chart_cache_dir)
+    s = batch['summary']
+    print(f"\nDone: {s['succeeded']}/{s['total']} succeeded, {s['failed']} failed "
+          f"in {s['wall_seconds']}s ({s['reports_per_sec']} reports/sec, "
+          f"p50 {s['p50_seconds']}s, p95 {s['p95_seconds']}s)")
+
+    if args.summary_json:
+        with open(args.summary_json, 'w', encoding='utf-8') as f:
+            json.dump(batch, f, ensure_ascii=False, indent=2)
+
+    sys.exit(1 if s['failed'] else 0)
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+מדידת ביצועים להפקת הדוח.
+
+שימוש:
+  python bench_report.py appendix [--rows 10000 100000] [--baseline]
+  python bench_report.py charts [--repeat 20]
+  python bench_report.py pipeline [--repeat 5] [--workers 4]
+  python bench_report.py suite [--profiles small typical stress] [--out results.json]
+  python bench_report.py compare before.json after.json
+
+appendix: renders the sample report plus a full-transaction appendix of N
+synthetic rows. Every size runs in a fresh process, so the reported peak
+RSS belongs to that render alone. --baseline also renders the same rows
+the old way - styled_table() into one Table - for comparison (slow and
+memory-hungry by design; keep N modest).
+
+charts: per-chart time (render + draw onto a page) for each chart backend,
+matplotlib with the chart cache bypassed; then full-report time and PDF
+size per backend.
+
+pipeline: matplotlib-backend report latency with the charts rendered
+inline, on a thread pool and on a process pool, next to the sum and the
+maximum of the individual chart times (the sequential and ideal bounds).
+
+suite: for each PROFILES entry (small: 3 months, typical: 12 months,
+stress: 60 months and 10k anomalies) and chart backend, in a fresh process:
+every create_*_chart function, every section builder in SECTIONS,
+doc.build, the whole generate_report call, peak RSS and PDF size. Results
+carry the git commit and library versions; `compare` prints new/old ratios
+per metric and exits 1 when one grew past --threshold.
+"""
+
+import sys
+import json
+import time
+import resource
+import multiprocessing as mp
+from io import BytesIO
+
+
+# --- Synthetic analysis_data ---
+_CATEGORY_NAMES = ['דיור ומשכנתא', 'מזון וסופר', 'מסעדות וקפה', 'תחבורה ורכב', 'בריאות',
+                   'חינוך וילדים', 'בילויים ופנאי', 'ביגוד והנעלה', 'ביטוח', 'תקשורת',
+                   'חשבונות בית', 'חיסכון והשקעות', 'העברות', 'אחר', 'מתנות ואירועים']
+_RECURRING_NAMES = ['נטפליקס', 'ספוטיפיי', 'ועד בית', 'הראל ביטוח', 'פרטנר', 'בזק',
+                    'חברת חשמל', 'ארנונה עיריית ת"א', 'מכבי שירותי בריאות', 'הוט', 'yes',
+                    'הולמס פלייס', 'גן ילדים', 'אפל icloud', 'גוגל', 'קרן השתלמות']
+_ANOMALY_NAMES = ['חשמל', 'מוסך אבי', 'טיסה אל על', 'איקאה', 'KSP', 'רופא שיניים',
+                  'ביטוח רכב', 'שופרסל דיל', 'באג מולטיסיסטם', 'מלון דן אילת']
+_SAVINGS_NAMES = ['איחוד מנויי סטרימינג', 'מעבר לחבילת סלולר זולה', 'צמצום משלוחי אוכל',
+                  'השוואת ביטוח רכב', 'קנייה בסופר דיסקאונט', 'ביטול עמלות עו"ש',
+                  'מעבר לתחבורה ציבורית', 'ויתור על מנוי כושר לא בשימוש']
+# Module 8 components: (name, max points)
+_HEALTH_COMPONENTS = [('יחס חיסכון', 25), ('יציבות הכנסה', 15), ('מגמת יתרה', 15),
+                      ('פיזור הוצאות', 15), ('הוצאות חריגות', 10), ('עלות מנויים', 10),
+                      ('עמלות ובנקינג', 10)]
+_INSIGHTS = ['ההוצאות על מזון עלו ב-12% ברבעון האחרון', 'הדיור הוא ההוצאה הגדולה ביותר',
+             'נמצאו שני מנויי סטרימינג כפולים', 'ההכנסה יציבה לאורך התקופה',
+             'שלוש הוצאות חריגות בחודש האחרון']
+
+PROFILES = {
+    'small':   dict(months=3,  categories=6,  recurring=3,  anomalies=2,      savings=2,
+                    health_components=3),
+    'typical': dict(months=12, categories=12, recurring=10, anomalies=15,     savings=5,
+                    health_components=7),
+    'stress':  dict(months=60, categories=15, recurring=60, anomalies=10_000, savings=30,
+                    health_components=7),
+}
+
+
+def _label(names, i):
+    return names[i] if i < len(names) else f'{names[i % len(names)]} {i // len(names) + 1}'
+
+
+def synthetic_analysis(months=12, categories=12, recurring=10, anomalies=15, savings=5,
+                       health_components=7, insights=4, seed=1):
+    """A complete analysis_data dict of the requested size, with Hebrew labels."""
+    import random
+    rnd = random.Random(seed)
+    end_y, end_m = 2025, 12
+    month_ids = [(end_y * 12 + end_m - 1) - k for k in range(months)][::-1]
+    month_labels = [f'{i // 12}-{i % 12 + 1:02d}' for i in month_ids]
+
+    incomes = [round(rnd.gauss(18500, 900), 0) for _ in month_labels]
+    expenses = [round(rnd.gauss(15800, 1400), 0) for _ in month_labels]
+    savings_by_month = [i - e for i, e in zip(incomes, expenses)]
+
+    weights = [rnd.paretovariate(1.2) for _ in range(categories)]
+    total_exp = sum(expenses)
+    cat_amounts = [round(total_exp * w / sum(weights), 0) for w in weights]
+    cat_total = sum(cat_amounts) or 1
+
+    def day():
+        i = rnd.choice(month_ids)
+        return f'{i // 12}-{i % 12 + 1:02d}-{rnd.randint(1, 28):02d}'
+
+    rec = []
+    for i in range(recurring):
+        monthly = round(rnd.uniform(20, 900), 0)
+        rec.append({'name': _label(_RECURRING_NAMES, i), 'monthly': monthly,
+                    'yearly': monthly * 12, 'frequency': 'חודשי', 'count': months,
+                    'type': rnd.choice(['מנוי', 'הוראת קבע', 'תשלום חוזר'])})
+    anom = [{'date': day(), 'description': rnd.choice(_ANOMALY_NAMES),
+             'amount': -round(rnd.uniform(400, 9000), 0),
+             'severity': 'high' if rnd.random() < 0.3 else 'medium'}
+            for _ in range(anomalies)]
+    anom.sort(key=lambda a: a['date'], reverse=True)
+    sav = []
+    for i in range(savings):
+        monthly = round(rnd.uniform(30, 600), 0)
+        sav.append({'description': _label(_SAVINGS_NAMES, i), 'monthly_saving': monthly,
+                    'yearly_saving': monthly * 12})
+
+    comps = []
+    for i in range(health_components):
+        name, mx = _HEALTH_COMPONENTS[i % len(_HEALTH_COMPONENTS)]
+        comps.append({'name': name, 'max': mx, 'score': round(mx * rnd.uniform(0.3, 1.0)),
+                      'description': f'{rnd.randint(5, 40)}% מההכנסה'})
+
+    n_act = min(months, 6)
+    balance = [round(20000 + sum(savings_by_month[:k + 1]), 0) for k in range(months)]
+    trend = (balance[-1] - balance[-n_act]) / max(n_act - 1, 1)
+    last = month_ids[-1]
+    return {
+        'user_name': 'ישראל ישראלי',
+        'period': {'from': month_labels[0], 'to': month_labels[-1]},
+        'sources': ['בנק לאומי', 'ויזה כאל', 'מקס'],
+        'summary': {
+            'total_income': sum(incomes), 'total_expenses': total_exp,
+            'avg_monthly_saving': round(sum(savings_by_month) / months, 0),
+            'expense_ratio': round(total_exp / sum(incomes) * 100, 1),
+            'total_transactions': months * 140,
+        },
+        'categories': {
+            'labels': [_label(_CATEGORY_NAMES, i) for i in range(categories)],
+            'amounts': cat_amounts,
+            'percentages': [round(a / cat_total * 100, 1) for a in cat_amounts],
+        },
+        'trends': {'months': month_labels, 'incomes': incomes, 'expenses': expenses,
+                   'savings': savings_by_month},
+        'recurring': rec,
+        'anomalies': anom,
+        'savings_potential': sav,
+        'forecast': {
+            'months_actual': month_labels[-n_act:],
+            'balances_actual': balance[-n_act:],
+            'months_forecast': [f'{(last + k) // 12}-{(last + k) % 12 + 1:02d}' for k in (1, 2, 3)],
+            'balances_forecast': [round(balance[-1] + trend * k, 0) for k in (1, 2, 3)],
+        },
+        'health_score': {
+            'total': sum(c['score'] for c in comps[:len(_HEALTH_COMPONENTS)]),
+            'components': comps,
+            'recommendations': ['לבטל מנויים כפולים', 'להגדיל הפקדה לחיסכון', 'להשוות ביטוחים'],
+        },
+        'key_insights': [_label(_INSIGHTS, i) for i in range(insights)],
+    }
+
+
+SAMPLE_ANALYSIS = synthetic_analysis(**PROFILES['typical'])
+
+_MERCHANTS = [('שופרסל דיל', 'מזון וסופר'), ('פז דלק', 'תחבורה ורכב'),
+              ('קפה גרג', 'מסעדות וקפה'), ('סופר פארם', 'בריאות'),
+              ('נטפליקס', 'בילויים ופנאי'), ('חברת חשמל', 'חשבונות בית')]
+
+
+def synthetic_transactions(n):
+    """Lazy stream of n unified-schema transactions."""
+    for i in range(n):
+        name, cat = _MERCHANTS[i % len(_MERCHANTS)]
+        yield {'date': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+               'description': f'{name} {i % 977}', 'amount': -round((i * 37) % 1500 + 9.9, 2),
+               'category': cat, 'source': 'ויזה כאל' if i % 3 else 'בנק לאומי'}
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# --- Appendix ---
+def _render_appendix(rows, baseline):
+    import generate_report as gr
+    gr.get_styles()
+    rss_before = _peak_rss_mb()
+    buf = BytesIO()
+    t = time.perf_counter()
+    if baseline:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate
+        data = [gr.heb_many(gr.APPENDIX_HEADER)] + [
+            [tx['date'], gr.heb(tx['description']), gr.heb(tx['category']),
+             gr.heb(tx['source']), f"{tx['amount']:,.2f}"] for tx in synthetic_transactions(rows)]
+        doc = SimpleDocTemplate(buf, pagesize=A4)
+        doc.build([gr.styled_table(data, gr.APPENDIX_COL_WIDTHS)])
+    else:
+        gr.generate_report(SAMPLE_ANALYSIS, buf, transactions=synthetic_transactions(rows))
+    return {
+        'rows': rows,
+        'path': 'styled_table' if baseline else 'TransactionAppendix',
+        'seconds': round(time.perf_counter() - t, 2),
+        'peak_rss_mb': _peak_rss_mb(),
+        'rss_growth_mb': round(_peak_rss_mb() - rss_before, 1),
+        'pdf_bytes': buf.tell(),
+    }
+
+
+# --- Charts ---
+def _render_charts(repeat):
+    import generate_report as gr
+    from reportlab.platypus import SimpleDocTemplate
+    gr.get_styles()
+    out = {'charts': {}, 'report': {}}
+    for kind, (args, w, h) in gr.chart_specs(SAMPLE_ANALYSIS).items():
+        row = {}
+        for backend in gr.CHART_BACKENDS:
+            if backend == 'matplotlib':
+                render = lambda: gr.Image(gr.MPL_CHARTS[kind].uncached(*args),
+                                          width=w, height=h)
+            else:
+                render = lambda: gr.chart_flowable(kind, args, w, h, backend)
+            # Time includes drawing onto a PDF page, where vector charts do their work
+            build = lambda: SimpleDocTemplate(BytesIO()).build([render()])
+            build()   # warm up
+            t = time.perf_counter()
+            for _ in range(repeat):
+                build()
+            row[f'{backend}_ms'] = round((time.perf_counter() - t) / repeat * 1000, 2)
+        out['charts'][kind] = row
+
+    from chart_cache import get_chart_cache
+    for backend in gr.CHART_BACKENDS:
+        times = []
+        for _ in range(max(1, repeat // 4)):
+            get_chart_cache().clear()   # measure real renders, not cache hits
+            buf = BytesIO()
+            t = time.perf_counter()
+            gr.generate_report(SAMPLE_ANALYSIS, buf, chart_backend=backend)
+            times.append(time.perf_counter() - t)
+        out['report'][backend] = {'seconds': round(min(times), 3), 'pdf_bytes': buf.tell()}
+    return out
+
+
+def bench_charts(repeat=20):
+    return _in_fresh_process(_render_charts, repeat)
+
+
+# --- Pipeline ---
+def _disable_chart_cache():
+    from chart_cache import configure_chart_cache
+    configure_chart_cache(enabled=False)
+
+
+def bench_pipeline(repeat=5, workers=4):
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+    import generate_report as gr
+    gr.get_styles()
+    _disable_chart_cache()
+    chart_ms = {}
+    for kind, (args, _, _) in gr.chart_specs(SAMPLE_ANALYSIS).items():
+        gr.MPL_CHARTS[kind].uncached(*args)
+        t = time.perf_counter()
+        for _ in range(repeat):
+            gr.MPL_CHARTS[kind].uncached(*args)
+        chart_ms[kind] = (time.perf_counter() - t) / repeat * 1000
+    out = {'cpus': mp.cpu_count(), 'chart_ms': {k: round(v, 1) for k, v in chart_ms.items()},
+           'sum_of_charts_ms': round(sum(chart_ms.values()), 1),
+           'slowest_chart_ms': round(max(chart_ms.values()), 1)}
+
+    executors = {'inline': None, 'threads': ThreadPoolExecutor(workers),
+                 'processes': ProcessPoolExecutor(workers, initializer=_disable_chart_cache)}
+    gr.CHART_WORKERS = 1   # 'inline' must not fall back to the shared pool
+    for name, ex in executors.items():
+        gr.generate_report(SAMPLE_ANALYSIS, BytesIO(), chart_backend='matplotlib',
+                           chart_executor=ex)   # warm up (process pool start)
+        times = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            gr.generate_report(SAMPLE_ANALYSIS, BytesIO(), chart_backend='matplotlib',
+                               chart_executor=ex)
+            times.append(time.perf_counter() - t)
+        out[f'report_{name}_ms'] = round(min(times) * 1000, 1)
+        if ex is not None:
+            ex.shutdown()
+    return out
+
+
+# --- Suite ---
+def _versions():
+    import platform
+    import subprocess
+    import reportlab
+    import matplotlib
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(),
+            'reportlab': reportlab.Version, 'matplotlib': matplotlib.__version__,
+            'cpus': mp.cpu_count(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def _ms(t):
+    return round((time.perf_counter() - t) * 1000, 2)
+
+
+def _run_profile(name, backend):
+    import generate_report as gr
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.platypus import SimpleDocTemplate
+    _disable_chart_cache()
+    gr.CHART_WORKERS = 1          # charts render inside the section that shows them
+    t = time.perf_counter()
+    gr.get_styles()
+    result = {'profile': name, 'backend': backend, 'setup_ms': _ms(t)}
+
+    t = time.perf_counter()
+    data = synthetic_analysis(**PROFILES[name])
+    result['generate_data_ms'] = _ms(t)
+
+    # The generate_report pipeline, one section at a time
+    buf = BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4, rightMargin=15*mm, leftMargin=15*mm,
+                            topMargin=20*mm, bottomMargin=20*mm, pageCompression=1)
+    stage = gr.ChartStage(gr.chart_specs(data), backend)
+    ctx = gr.ReportContext(gr.get_styles(), doc.width, stage)
+    story, sections = [], {}
+    for section, build in gr.SECTIONS:
+        t = time.perf_counter()
+        story.extend(build(data, ctx))
+        sections[section] = _ms(t)
+    result['sections_ms'] = sections
+    t = time.perf_counter()
+    doc.build(stage.resolve(story))
+    result['doc_build_ms'] = _ms(t)
+
+    t = time.perf_counter()
+    out = BytesIO()
+    gr.generate_report(data, out, chart_backend=backend)
+    result['total_ms'] = _ms(t)
+    result['pdf_bytes'] = out.tell()
+    result['peak_rss_mb'] = _peak_rss_mb()
+
+    # Each chart function on its own (after the report, so it does not skew
+    # the report's peak RSS; warmed once so first-use font loading is excluded)
+    charts = {}
+    for kind, (args, w, h) in gr.chart_specs(data).items():
+        fn = gr.MPL_CHARTS[kind]
+        fn.uncached(*args)
+        t = time.perf_counter()
+        fn.uncached(*args)
+        charts[fn.__name__] = _ms(t)
+        gr.chart_flowable(kind, args, w, h, 'vector')
+        t = time.perf_counter()
+        gr.chart_flowable(kind, args, w, h, 'vector')
+        charts[f'vector_{kind}'] = _ms(t)
+    result['charts_ms'] = charts
+    return result
+
+
+def run_suite(profiles=tuple(PROFILES), backends=('vector',)):
+    """Every (profile, backend) in a fresh process; machine-readable results."""
+    runs = [_in_fresh_process(_run_profile, p, b) for p in profiles for b in backends]
+    return {'meta': _versions(), 'runs': runs}
+
+
+def _flatten(run):
+    flat = {}
+    for key, value in run.items():
+        if isinstance(value, dict):
+            flat.update({f'{key}.{k}': v for k, v in value.items()})
+        elif isinstance(value, (int, float)):
+            flat[key] = value
+    return flat
+
+
+def compare(old, new, threshold=0.10):
+    """Per-metric ratios new/old for runs present in both result files."""
+    index = {(r['profile'], r['backend']): _flatten(r) for r in old['runs']}
+    rows = []
+    for run in new['runs']:
+        base = index.get((run['profile'], run['backend']))
+        if base is None:
+            continue
+        for metric, value in _flatten(run).items():
+            before = base.get(metric)
+            if not before:
+                continue
+            ratio = value / before
+            rows.append({'profile': run['profile'], 'backend': run['backend'],
+                         'metric': metric, 'old': before, 'new': value,
+                         'ratio': round(ratio, 3),
+                         'regression': ratio > 1 + threshold})
+    return rows
+
+
+def _in_fresh_process(fn, *args):
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(fn, args)
+
+
+def bench_appendix(sizes=(10_000, 100_000), baseline=False):
+    results = []
+    for n in sizes:
+        results.append(_in_fresh_process(_render_appendix, n, False))
+        if baseline:
+            results.append(_in_fresh_process(_render_appendix, n, True))
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Report rendering benchmarks.')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_app = sub.add_parser('appendix', help='full-transaction appendix at N rows')
+    p_app.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    p_app.add_argument('--baseline', action='store_true',
+                       help='also render the rows through styled_table()')
+    p_ch = sub.add_parser('charts', help='vector vs matplotlib chart backends')
+    p_ch.add_argument('--repeat', type=int, default=20)
+    p_pl = sub.add_parser('pipeline', help='chart stage: inline vs thread vs process pool')
+    p_pl.add_argument('--repeat', type=int, default=5)
+    p_pl.add_argument('--workers', type=int, default=4)
+    p_su = sub.add_parser('suite', help='per-section / per-chart timings for the profiles')
+    p_su.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=list(PROFILES))
+    p_su.add_argument('--charts', nargs='+', choices=['vector', 'matplotlib'],
+                      default=['vector', 'matplotlib'])
+    p_su.add_argument('--out', help='also write the results to this JSON file')
+    p_cmp = sub.add_parser('compare', help='ratios between two suite result files')
+    p_cmp.add_argument('old')
+    p_cmp.add_argument('new')
+    p_cmp.add_argument('--threshold', type=float, default=0.10,
+                       help='flag metrics that grew by more than this fraction')
+    args = parser.parse_args()
+
+    if args.cmd == 'appendix':
+        out = bench_appendix(args.rows, args.baseline)
+    elif args.cmd == 'charts':
+        out = bench_charts(args.repeat)
+    elif args.cmd == 'pipeline':
+        out = bench_pipeline(args.repeat, args.workers)
+    elif args.cmd == 'suite':
+        out = run_suite(args.profiles, args.charts)
+        if args.out:
+            with open(args.out, 'w', encoding='utf-8') as f:
+                json.dump(out, f, indent=2)
+    else:
+        with open(args.old, 'r', encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, 'r', encoding='utf-8') as f:
+            new = json.load(f)
+        out = compare(old, new, args.threshold)
+        for row in out:
+            flag = '  REGRESSION' if row['regression'] else ''
+            print(f"{row['profile']:8} {row['backend']:10} {row['metric']:32} "
+                  f"{row['old']:>12} -> {row['new']:>12}  x{row['ratio']}{flag}")
+        sys.exit(1 if any(r['regression'] for r in out) else 0)
+    print(json.dumps(out, indent=2))
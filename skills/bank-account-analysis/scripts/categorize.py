@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+סיווג טרנזקציות לקטגוריות - מודול 2 ב-references/analysis-guide.md.
+טבלת מילות המפתח מקומפלת פעם אחת לאוטומט Aho-Corasick, כך שכל תיאור נסרק
+במעבר יחיד במקום בדיקת כל מילת מפתח בנפרד.
+
+שימוש:
+  python categorize.py transactions.ndjson > categorized.ndjson
+  python categorize.py --bench 1000000
+
+Matching is case-insensitive. When several keywords match, the longest one
+wins (so "סלקום tv" beats "סלקום", "הוט מובייל" beats "הוט"), ties go to the
+category listed first. Results are memoised per normalised merchant name.
+"""
+
+import re
+import sys
+import json
+from collections import deque
+
+
+OTHER = 'אחר'
+
+# Module 2 keyword table (references/analysis-guide.md)
+CATEGORY_KEYWORDS = [
+    ('דיור ומשכנתא',   ['משכנתא', 'שכ"ד', 'שכר דירה', 'ועד בית', 'ארנונה', 'עירייה']),
+    ('מזון וסופר',     ['שופרסל', 'רמי לוי', 'מגה', 'ויקטורי', 'יוחננוף', 'חצי חינם', 'סופר',
+                        'מרקט', 'שוק']),
+    ('מסעדות וקפה',    ['מסעד', 'קפה', 'פיצ', 'בורגר', 'סושי', 'wolt', 'תן ביס', 'cibus', 'סיבוס',
+                        'משלוח']),
+    ('תחבורה ורכב',    ['דלק', 'פז', 'דור אלון', 'סונול', 'חניה', 'רכבת', 'אגד', 'דן', 'מונית',
+                        'gett', 'bubble']),
+    ('בריאות',         ['מכבי', 'כללית', 'מאוחדת', 'לאומית', 'בית מרקחת', 'סופר פארם', 'רפואה']),
+    ('חינוך וילדים',   ['גן', 'צהרון', 'חוגים', 'בי"ס', 'אוניברסיט', 'מכללה', 'שכר לימוד']),
+    ('בילויים ופנאי',  ['סרט', 'הופע', 'כרטיס', 'yes', 'נטפליקס', 'netflix', 'spotify', 'סלקום tv',
+                        'הוט']),
+    ('ביגוד והנעלה',   ['h&m', 'zara', 'fox', 'castro', 'golf', 'termina', 'קניון', 'אופנה']),
+    ('ביטוח',          ['הפניקס', 'מגדל', 'הראל', 'כלל', 'ביטוח', 'פוליס']),
+    ('תקשורת',         ['סלקום', 'פרטנר', 'הוט מובייל', 'גולן', '012', '013', 'בזק', 'אינטרנט']),
+    ('חשבונות בית',    ['חשמל', 'מים', 'גז', 'מקורות', 'חברת חשמל']),
+    ('חיסכון והשקעות', ['פנסיה', 'גמל', 'השתלמות', 'קרן', 'השקע', 'ני"ע', 'בורסה', 'etoro',
+                        'interactive']),
+    ('העברות',         ['העברה', 'הו"ק', 'הוראת קבע', 'bit', 'paybox', 'פפר']),
+    ('משכורת',         ['משכורת', 'שכר', 'salary']),
+]
+
+CATEGORIES = [name for name, _ in CATEGORY_KEYWORDS] + [OTHER]
+
+_PUNCT = str.maketrans({'״': '"', '׳': "'", '“': '"', '”': '"', '’': "'"})
+# Long digit runs are card / terminal / reference numbers, not part of the merchant
+_NOISE = re.compile(r'\d{4,}|[\s\-_*#/\\.,:;|]+')
+
+
+def normalize(text):
+    """Normalised merchant key: lower-case, unified quotes, no reference numbers."""
+    if not text:
+        return ''
+    s = str(text).lower().translate(_PUNCT)
+    return ' '.join(_NOISE.sub(' ', s).split())
+
+
+# --- Aho-Corasick automaton ---
+class KeywordAutomaton:
+    """
+    Multi-pattern matcher over (keyword, category) pairs.
+
+    Each node keeps the best match ending at it (longest keyword, then
+    earliest category), already merged along its failure chain, so a scan is
+    a single loop over the characters of the text.
+    """
+
+    def __init__(self, table):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]   # (keyword length, -category rank, category)
+        for rank, (category, keywords) in enumerate(table):
+            for kw in keywords:
+                word = normalize(kw)
+                self._add(word, (len(word), -rank, category))
+        self._link()
+
+    def _add(self, word, out):
+        node = 0
+        for ch in word:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append(None)
+            node = nxt
+        if self.best[node] is None or out > self.best[node]:
+            self.best[node] = out
+
+    def _link(self):
+        q = deque(self.goto[0].values())
+        while q:
+            node = q.popleft()
+            for ch, nxt in self.goto[node].items():
+                q.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                inherited = self.best[self.fail[nxt]]
+                if inherited is not None and (self.best[nxt] is None or inherited > self.best[nxt]):
+                    self.best[nxt] = inherited
+
+    def match(self, text):
+        """Return the winning category for already-normalised text, or None."""
+        goto, fail, best = self.goto, self.fail, self.best
+        node, found = 0, None
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            b = best[node]
+            if b is not None and (found is None or b > found):
+                found = b
+        return found[2] if found else None
+
+
+# ============================================================
+# Categoriser
+# ============================================================
+class Categorizer:
+    """
+    Compiled keyword table plus a per-merchant memo.
+
+    The bank/card category hint (e.g. Visa Cal's "קטגוריה" column) is used
+    when the description itself matches no keyword: the hint text is run
+    through the same automaton ("מסעדות" -> מסעדות וקפה).
+    """
+
+    def __init__(self, table=CATEGORY_KEYWORDS, memo_size=200_000):
+        self.automaton = KeywordAutomaton(table)
+        self.memo_size = memo_size
+        self._raw = {}    # exact (description, hint) -> category
+        self._memo = {}   # (normalised merchant, hint) -> category
+
+    def categorize(self, description, hint=None):
+        raw = (description, hint)
+        cat = self._raw.get(raw)
+        if cat is not None:
+            return cat
+        key = (normalize(description), hint or '')
+        cat = self._memo.get(key)
+        if cat is None:
+            cat = self.automaton.match(key[0])
+            if cat is None and hint:
+                cat = self.automaton.match(normalize(hint))
+            cat = cat or OTHER
+            if len(self._memo) >= self.memo_size:
+                self._memo.clear()
+            self._memo[key] = cat
+        if len(self._raw) >= self.memo_size:
+            self._raw.clear()
+        self._raw[raw] = cat
+        return cat
+
+    def categorize_many(self, descriptions, hints=None):
+        """Categorise a whole column of descriptions (and optional hints)."""
+        if hints is None:
+            return [self.categorize(d) for d in descriptions]
+        return [self.categorize(d, h) for d, h in zip(descriptions, hints)]
+
+    def categorize_transactions(self, transactions):
+        """Fill 'category' on unified-schema transactions in place.
+
+        An existing 'category' value (the bank/card hint set by ingest.py)
+        is treated as the hint. Returns the same list.
+        """
+        for tx in transactions:
+            tx['category'] = self.categorize(tx.get('description'), tx.get('category'))
+        return transactions
+
+
+_default = None
+
+
+def get_categorizer():
+    """Process-wide categoriser, compiled on first use."""
+    global _default
+    if _default is None:
+        _default = Categorizer()
+    return _default
+
+
+def categorize_many(descriptions, hints=None):
+    return get_categorizer().categorize_many(descriptions, hints)
+
+
+# --- Benchmark ---
+def _synthetic_descriptions(n, seed=7):
+    import random
+    rnd = random.Random(seed)
+    keywords = [kw for _, kws in CATEGORY_KEYWORDS for kw in kws]
+    fillers = ['בע"מ', 'סניף', 'ת"א', 'ירושלים', 'חיפה', 'online', 'ltd', 'מרכז', 'קניות']
+    merchants = []
+    for _ in range(5000):
+        words = [rnd.choice(fillers) for _ in range(rnd.randint(1, 3))]
+        if rnd.random() < 0.8:
+            words.insert(rnd.randint(0, len(words)), rnd.choice(keywords))
+        merchants.append(' '.join(words))
+    # Card statements mostly repeat the exact merchant string; some carry a
+    # per-transaction reference number
+    return [rnd.choice(merchants) if rnd.random() < 0.7
+            else f'{rnd.choice(merchants)} {rnd.randint(1000, 99999)}' for _ in range(n)]
+
+
+def _naive(descriptions):
+    table = [(cat, [normalize(k) for k in kws]) for cat, kws in CATEGORY_KEYWORDS]
+    out = []
+    for d in descriptions:
+        text, best = normalize(d), None
+        for rank, (cat, kws) in enumerate(table):
+            for kw in kws:
+                if kw in text and (best is None or (len(kw), -rank) > best[:2]):
+                    best = (len(kw), -rank, cat)
+        out.append(best[2] if best else OTHER)
+    return out
+
+
+def benchmark(n=1_000_000):
+    import time
+    descs = _synthetic_descriptions(n)
+    results = {'descriptions': n}
+
+    t = time.perf_counter()
+    Categorizer()
+    results['compile_seconds'] = round(time.perf_counter() - t, 4)
+
+    c = Categorizer(memo_size=n)
+    t = time.perf_counter()
+    memo_out = c.categorize_many(descs)
+    dt = time.perf_counter() - t
+    results['memoised_per_sec'] = round(n / dt)
+
+    raw = Categorizer()
+    sample = descs[:min(n, 100_000)]
+    t = time.perf_counter()
+    ac_out = [raw.automaton.match(normalize(d)) or OTHER for d in sample]
+    dt = time.perf_counter() - t
+    results['automaton_per_sec'] = round(len(sample) / dt)
+
+    t = time.perf_counter()
+    naive_out = _naive(sample)
+    dt = time.perf_counter() - t
+    results['naive_per_sec'] = round(len(sample) / dt)
+
+    results['matches_naive'] = ac_out == naive_out and memo_out[:len(sample)] == naive_out
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == '--bench':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+        print(json.dumps(benchmark(n), indent=2))
+        sys.exit(0)
+
+    if len(sys.argv) < 2:
+        print("Usage: python categorize.py <transactions.ndjson> > categorized.ndjson")
+        print("       python categorize.py --bench [N]")
+        sys.exit(1)
+
+    cat = get_categorizer()
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                tx = json.loads(line)
+                cat.categorize_transactions([tx])
+                sys.stdout.write(json.dumps(tx, ensure_ascii=False) + '\n')
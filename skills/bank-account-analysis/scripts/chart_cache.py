@@ -0,0 +1,222 @@
+"""
+מטמון לגרפים - שמירת תמונות PNG של גרפים לפי hash של הקלט.
+דוח שמופק מחדש עם אותם נתוני גרף מדלג על matplotlib לחלוטין.
+
+Two tiers:
+  - in-memory LRU (per process)
+  - optional on-disk directory with a byte cap, shared safely between
+    processes (atomic writes, oldest-access eviction)
+
+The disk size is tracked with a running counter, so a put does not list
+the directory. The directory is only scanned when the counter crosses the
+cap, or every DISK_RESCAN_PUTS puts to pick up other processes' writes.
+Eviction then goes down to DISK_LOW_WATER of the cap, so a full cache does
+not rescan on every put.
+"""
+
+import os
+import json
+import hashlib
+import inspect
+import functools
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+
+DISK_RESCAN_PUTS = 256
+DISK_LOW_WATER = 0.9
+
+class ChartCache:
+    """Content-addressed store of rendered chart images."""
+
+    def __init__(self, max_entries=256, disk_dir=None, disk_max_bytes=64 * 1024 * 1024,
+                 enabled=True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.memory_hits = self.disk_hits = 0
+        self._disk_bytes = None     # running estimate; None until the first scan
+        self._disk_puts = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # --- Keys ---
+    @staticmethod
+    def key(kind, args, style):
+        """Hash of the chart type, its inputs and the style constants."""
+        payload = json.dumps([kind, args, style], sort_keys=True, ensure_ascii=False,
+                             separators=(',', ':'), default=repr)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    # --- Lookup / store ---
+    def get(self, key):
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return data
+
+        data = self._disk_get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._mem_put(key, data)
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._mem_put(key, data)
+        self._disk_put(key, data)
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self.hits = self.misses = self.memory_hits = self.disk_hits = 0
+        if self.disk_dir:
+            for path, _, _ in self._disk_entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            with self._lock:
+                self._disk_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'entries': len(self._mem),
+            }
+
+    def _mem_put(self, key, data):
+        self._mem[key] = data
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    # --- Disk tier ---
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + '.png')
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # mark as recently used for eviction
+            return data
+        except OSError:
+            return None
+
+    def _disk_put(self, key, data):
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_puts += 1
+            rescan = self._disk_bytes is None or self._disk_puts % DISK_RESCAN_PUTS == 0
+            if not rescan:
+                self._disk_bytes += len(data)
+                rescan = self._disk_bytes > self.disk_max_bytes
+        if rescan:
+            self._disk_evict()
+
+    def _disk_entries(self):
+        entries = []
+        with os.scandir(self.disk_dir) as it:
+            for e in it:
+                if e.name.endswith('.png'):
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    entries.append((e.path, st.st_mtime, st.st_size))
+        return entries
+
+    def _disk_evict(self):
+        """Rescan the directory; over the cap, evict oldest-access entries down
+        to the low-water mark. Resets the running size estimate."""
+        entries = self._disk_entries()
+        total = sum(size for _, _, size in entries)
+        if total > self.disk_max_bytes:
+            target = self.disk_max_bytes * DISK_LOW_WATER
+            for path, _, size in sorted(entries, key=lambda e: e[1]):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= target:
+                    break
+        with self._lock:
+            self._disk_bytes = total
+
+
+# --- Process-wide cache ---
+_cache = ChartCache()
+
+
+def get_chart_cache():
+    return _cache
+
+
+def configure_chart_cache(**kw):
+    """Replace the process-wide cache, e.g. configure_chart_cache(disk_dir='/tmp/charts')."""
+    global _cache
+    _cache = ChartCache(**kw)
+    return _cache
+
+
+def cached_chart(kind, style):
+    """
+    Decorator for chart functions that return a PNG BytesIO.
+
+    kind:  chart type name, part of the cache key
+    style: callable returning the style constants that affect the image
+
+    Arguments are bound to the chart function's signature (defaults
+    applied) before hashing, so f(x, bands=b) and f(x, b) share an entry.
+    """
+    def wrap(render):
+        sig = inspect.signature(render)
+
+        @functools.wraps(render)
+        def inner(*args, **kwargs):
+            cache = _cache
+            if not cache.enabled:
+                return render(*args, **kwargs)
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            args, kwargs = bound.args, bound.kwargs
+            key = cache.key(kind, [args, kwargs] if kwargs else args, style())
+            data = cache.get(key)
+            if data is None:
+                data = render(*args, **kwargs).getvalue()
+                cache.put(key, data)
+            return BytesIO(data)
+        inner.uncached = render
+        return inner
+    return wrap
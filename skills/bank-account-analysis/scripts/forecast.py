@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+תחזית תזרים מזומנים - מודול 7 ב-references/analysis-guide.md, כסימולציית מונטה קרלו.
+
+שימוש:
+  python forecast.py analysis.json [--months 3] [--scenarios 5000] > forecast.json
+  python forecast.py --bench 100000
+
+The guide's point estimate becomes the centre of a simulation:
+
+  1. income and variable expenses (expenses minus the detected recurring
+     payments) are centred on 70% of the last 3 months' mean + 30% of the
+     whole history, plus a seasonal offset when there are 12+ months
+  2. their monthly spread and income/expense correlation are estimated
+     from the history
+  3. thousands of scenarios are drawn at once as correlated normals; the
+     recurring payments are subtracted as a fixed cost and the monthly net
+     is accumulated onto the last known balance
+  4. the median path becomes `balances_forecast`, selected percentiles
+     become `bands` for the chart to shade
+
+forecast_batch() runs the same model over a 2-D (accounts x months) history,
+chunked so the scenario array stays within MAX_CELLS.
+"""
+
+import sys
+import json
+import warnings
+
+import numpy as np
+
+
+RECENT_MONTHS = 3          # guide: 70% weight on the last 3 months,
+RECENT_WEIGHT = 0.7        # 30% on the whole history
+SEASONAL_MONTHS = 12
+MIN_SPREAD = 0.10          # spread as a share of the centre when history is too short
+PERCENTILES = (10, 25, 50, 75, 90)
+MAX_CELLS = 8_000_000      # accounts * months * scenarios per simulation chunk
+
+
+def next_months(last, n):
+    """The n month labels after `last`, in its format ('MM/YY' or 'YYYY-MM')."""
+    if '/' in last:
+        mm, yy = last.split('/')[:2]
+        month, year = int(mm), int(yy)
+    else:
+        yy, mm = last.split('-')[:2]
+        month, year = int(mm), int(yy)
+    out = []
+    for _ in range(n):
+        month += 1
+        if month > 12:
+            month, year = 1, year + 1
+        out.append(f'{month:02d}/{year % 100:02d}' if '/' in last else f'{year:04d}-{month:02d}')
+    return out
+
+
+def recurring_total(recurring):
+    """Monthly cost of the detected recurring payments (dicts with `monthly`, or numbers)."""
+    return sum(r.get('monthly', 0) if isinstance(r, dict) else r for r in recurring or ())
+
+
+# ============================================================
+# Model
+# ============================================================
+def _stats(x, horizon):
+    """Per-row (centre per forecast month, spread) of a NaN-padded (A, M) history."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        overall = np.nanmean(x, axis=1)
+        recent = np.nanmean(x[:, -RECENT_MONTHS:], axis=1)
+        centre = np.where(np.isnan(recent), overall,
+                          RECENT_WEIGHT * recent + (1 - RECENT_WEIGHT) * overall)
+        spread = np.nanstd(x, axis=1, ddof=1)
+        centre = np.nan_to_num(centre)
+        spread = np.where(np.isnan(spread), MIN_SPREAD * np.abs(centre), spread)
+
+        centre = np.repeat(centre[:, None], horizon, axis=1)
+        if x.shape[1] >= SEASONAL_MONTHS:
+            # Same calendar month last year relative to that year's mean
+            year = x[:, -SEASONAL_MONTHS:]
+            offsets = year[:, np.arange(horizon) % SEASONAL_MONTHS] - np.nanmean(year, axis=1)[:, None]
+            full = ~np.isnan(year).any(axis=1)
+            centre += np.where(full[:, None], np.nan_to_num(offsets), 0)
+    return centre, spread
+
+
+def _correlation(a, b):
+    """Row-wise Pearson correlation of two NaN-padded (A, M) arrays, clipped to ±0.9."""
+    valid = ~(np.isnan(a) | np.isnan(b))
+    n = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        a = np.where(valid, a, 0)
+        b = np.where(valid, b, 0)
+        da = np.where(valid, a - (a.sum(axis=1) / n)[:, None], 0)
+        db = np.where(valid, b - (b.sum(axis=1) / n)[:, None], 0)
+        rho = (da * db).sum(axis=1) / np.sqrt((da * da).sum(axis=1) * (db * db).sum(axis=1))
+    return np.clip(np.nan_to_num(rho), -0.9, 0.9)
+
+
+def _simulate(inc_c, inc_s, var_c, var_s, rho, fixed, start, scenarios, percentiles, rng):
+    """Balance percentiles (P, a, H) and P(balance < 0) (a, H) for one chunk of accounts."""
+    a, horizon = inc_c.shape
+    # Scenario axis last, so each month and each percentile pick is a contiguous row
+    z = rng.standard_normal((2, a, horizon, scenarios), dtype=np.float32)
+    zi, zv = z[0], z[1]
+    zv *= np.sqrt(1 - rho * rho).astype(np.float32)[:, None, None]
+    zv += rho.astype(np.float32)[:, None, None] * zi
+
+    income = zi
+    income *= inc_s.astype(np.float32)[:, None, None]
+    income += inc_c.astype(np.float32)[:, :, None]
+    np.maximum(income, 0, out=income)
+    spend = zv
+    spend *= var_s.astype(np.float32)[:, None, None]
+    spend += var_c.astype(np.float32)[:, :, None]
+    np.maximum(spend, 0, out=spend)
+
+    net = income
+    net -= spend
+    net -= fixed.astype(np.float32)[:, None, None]
+    # Running balance month by month (np.cumsum over the strided month axis is slower)
+    balance = net
+    balance[:, 0] += start.astype(np.float32)[:, None]
+    for h in range(1, horizon):
+        balance[:, h] += balance[:, h - 1]
+
+    negative = (balance < 0).mean(axis=2)
+    # One in-place sort then interpolated picks ('linear', as np.percentile) -
+    # several times faster than np.percentile's partitioning on this shape
+    balance.sort(axis=2)
+    pos = np.asarray(percentiles, dtype=float) / 100 * (scenarios - 1)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, scenarios - 1)
+    frac = (pos - lo)[:, None, None]
+    below, above = balance[..., lo], balance[..., hi]           # (a, H, P)
+    bands = below + (above - below) * frac.transpose(1, 2, 0)
+    return bands.transpose(2, 0, 1), negative
+
+
+def forecast_batch(incomes, expenses, recurring=0, start_balances=0, horizon=3,
+                   scenarios=1000, percentiles=PERCENTILES, seed=0):
+    """
+    Monte Carlo forecast for many accounts at once.
+
+    incomes, expenses: (accounts, months) monthly totals, oldest first;
+        shorter histories are left-padded with NaN
+    recurring: monthly recurring-payment cost per account, (accounts,) or scalar
+    start_balances: last known balance per account, (accounts,) or scalar
+    Returns {'percentiles', 'bands' (P, accounts, horizon), 'median'
+    (accounts, horizon) when 50 is among the percentiles, 'negative_probability'
+    (accounts, horizon)}.
+    """
+    inc = np.atleast_2d(np.asarray(incomes, dtype=float))
+    exp = np.atleast_2d(np.asarray(expenses, dtype=float))
+    n = inc.shape[0]
+    fixed = np.broadcast_to(np.asarray(recurring, dtype=float), (n,))
+    start = np.broadcast_to(np.asarray(start_balances, dtype=float), (n,))
+    variable = np.maximum(exp - fixed[:, None], 0)   # NaN stays NaN
+
+    inc_c, inc_s = _stats(inc, horizon)
+    var_c, var_s = _stats(variable, horizon)
+    rho = _correlation(inc, variable)
+
+    # Fixed seed by default: the same history gives the same report (and chart cache key)
+    rng = np.random.default_rng(seed)
+    percentiles = list(percentiles)
+    bands = np.empty((len(percentiles), n, horizon))
+    negative = np.empty((n, horizon))
+    step = max(1, MAX_CELLS // (horizon * scenarios))
+    for i in range(0, n, step):
+        s = slice(i, i + step)
+        bands[:, s], negative[s] = _simulate(inc_c[s], inc_s[s], var_c[s], var_s[s], rho[s],
+                                             fixed[s], start[s], scenarios, percentiles, rng)
+    out = {'percentiles': percentiles, 'bands': bands, 'negative_probability': negative}
+    if 50 in percentiles:
+        out['median'] = bands[percentiles.index(50)]
+    return out
+
+
+def forecast_account(months, incomes, expenses, recurring=(), balances_actual=None,
+                     horizon=3, scenarios=5000, percentiles=PERCENTILES, seed=0):
+    """
+    The `forecast` block of analysis_data for one account.
+
+    months/incomes/expenses: the monthly history (as in `trends`)
+    recurring: the `recurring` list (or monthly amounts)
+    balances_actual: month-end balances for the last months; without them
+        the balance is the running net saving over the history
+    Percentiles are paired outside-in into bands: (10, 90), (25, 75).
+    """
+    if balances_actual is None:
+        balances_actual = np.cumsum(np.subtract(incomes, expenses))[-RECENT_MONTHS:].round(2).tolist()
+    balances_actual = list(balances_actual)
+    months_actual = list(months[-len(balances_actual):])
+
+    res = forecast_batch([incomes], [expenses], recurring_total(recurring), balances_actual[-1],
+                         horizon, scenarios, percentiles, seed)
+    pcts = res['percentiles']
+    paths = {p: res['bands'][i, 0].round(2).tolist() for i, p in enumerate(pcts)}
+    lo = sorted(p for p in pcts if p < 50)
+    hi = sorted((p for p in pcts if p > 50), reverse=True)
+    median = paths[50] if 50 in paths else np.mean([paths[p] for p in pcts], axis=0).round(2).tolist()
+    return {
+        'months_actual': months_actual,
+        'balances_actual': balances_actual,
+        'months_forecast': next_months(months_actual[-1], horizon),
+        'balances_forecast': median,
+        'bands': [{'percentiles': [l, h], 'low': paths[l], 'high': paths[h]}
+                  for l, h in zip(lo, hi)],
+        'negative_probability': res['negative_probability'][0].round(3).tolist(),
+    }
+
+
+def forecast_from_analysis(d, **kwargs):
+    """forecast_account() over an analysis_data dict's trends, recurring and known balances."""
+    trends = d['trends']
+    return forecast_account(trends['months'], trends['incomes'], trends['expenses'],
+                            d.get('recurring', ()),
+                            d.get('forecast', {}).get('balances_actual'), **kwargs)
+
+
+def benchmark(n=100_000, months=24, horizon=3, scenarios=1000):
+    import time
+    rng = np.random.default_rng(1)
+    inc = rng.normal(18000, 2500, (n, months)).clip(0)
+    exp = rng.normal(15000, 3000, (n, months)).clip(0)
+    inc[: n // 10, : months // 2] = np.nan     # some shorter histories
+    rec = rng.uniform(500, 4000, n)
+    start = rng.normal(10000, 8000, n)
+    t = time.perf_counter()
+    res = forecast_batch(inc, exp, rec, start, horizon, scenarios)
+    dt = time.perf_counter() - t
+    return {'accounts': n, 'months': months, 'horizon': horizon, 'scenarios': scenarios,
+            'seconds': round(dt, 3), 'accounts_per_second': round(n / dt),
+            'mean_negative_probability': round(float(res['negative_probability'][:, -1].mean()), 3)}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    if len(sys.argv) >= 2 and sys.argv[1] == '--bench':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+        print(json.dumps(benchmark(n), indent=2))
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description='Monte Carlo cash-flow forecast (Module 7).')
+    parser.add_argument('analysis', help='analysis_data JSON with trends (and recurring)')
+    parser.add_argument('--months', type=int, default=3, help='forecast horizon')
+    parser.add_argument('--scenarios', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    with open(args.analysis, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    json.dump(forecast_from_analysis(data, horizon=args.months, scenarios=args.scenarios,
+                                     seed=args.seed),
+              sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+המרת מטבע חוץ לשקלים - טבלת שערים מקומית לפי תאריך, בלי גישה לרשת.
+
+שימוש:
+  python fx.py rates.csv transactions.ndjson > normalized.ndjson
+  python fx.py --bench 1000000
+
+The rate table is a CSV with a `date,currency,rate[,unit]` header: ILS per
+`unit` (default 1) units of the currency, e.g. exported Bank of Israel
+representative rates. Each currency gets a sorted date array and a rate
+array; a lookup is a binary search for the last rate on or before the
+transaction date (weekends and holidays use the previous published rate,
+up to MAX_RATE_AGE_DAYS).
+
+Whole columns are converted at once: rows are grouped by currency, the
+distinct dates of each group are looked up with one searchsorted call, and
+every (currency, date) rate is cached for the next chunk.
+
+Foreign-currency rows (card exports with `currency` / `original_amount`)
+get `currency` as an ISO code and `fx_rate`. When the ₪ charge is missing
+or 0 (not billed yet), `amount` is filled from original_amount x rate and the
+row is marked `fx_estimated`. Run it after ingest.py and before
+categorize.py / aggregates.py, or pass `fx_rates=` to ingest.iter_chunks
+(`ingest.py --rates rates.csv`).
+"""
+
+import sys
+import csv
+import json
+
+import numpy as np
+
+
+BASE_CURRENCY = 'ILS'
+MAX_RATE_AGE_DAYS = 10      # a rate older than this is treated as missing
+CACHE_SIZE = 200_000        # (currency, date) pairs
+
+CURRENCY_ALIASES = {
+    '₪': 'ILS', 'ש"ח': 'ILS', 'שח': 'ILS', 'NIS': 'ILS', 'שקל': 'ILS',
+    '$': 'USD', 'דולר': 'USD', 'US$': 'USD', 'דולר ארה"ב': 'USD',
+    '€': 'EUR', 'יורו': 'EUR', 'אירו': 'EUR',
+    '£': 'GBP', 'ליש"ט': 'GBP', 'לירה שטרלינג': 'GBP', 'פאונד': 'GBP',
+    '¥': 'JPY', 'ין': 'JPY',
+    'פרנק': 'CHF', 'פרנק שוויצרי': 'CHF',
+}
+
+
+def normalize_currency(value):
+    """ISO code for a currency label ('$', 'דולר', 'usd' -> 'USD'); None when empty."""
+    if value is None:
+        return None
+    s = str(value).strip()
+    if not s:
+        return None
+    return CURRENCY_ALIASES.get(s) or CURRENCY_ALIASES.get(s.replace('״', '"')) or s.upper()
+
+
+def _days(dates):
+    """ISO date strings (or None) -> datetime64[D] array, NaT where missing."""
+    try:
+        return np.array(dates, dtype='datetime64[D]')
+    except ValueError:      # timestamps or stray text
+        return np.array([d[:10] if d else 'NaT' for d in dates], dtype='datetime64[D]')
+
+
+# ============================================================
+# Rate table
+# ============================================================
+class RateTable:
+    """Dated ILS rates per currency: {code: (sorted datetime64[D] dates, rates)}."""
+
+    def __init__(self, series, max_age_days=MAX_RATE_AGE_DAYS):
+        self.series = series
+        self.max_age = np.timedelta64(max_age_days, 'D')
+        self._cache = {}
+        self.hits = self.misses = 0
+
+    @classmethod
+    def load(cls, path, **kw):
+        by_code = {}
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                code = normalize_currency(row.get('currency'))
+                if not code or not row.get('rate'):
+                    continue
+                unit = float(row.get('unit') or 1)
+                dates, rates = by_code.setdefault(code, ([], []))
+                dates.append(row['date'][:10])
+                rates.append(float(row['rate']) / unit)
+        series = {}
+        for code, (dates, rates) in by_code.items():
+            d = np.array(dates, dtype='datetime64[D]')
+            order = np.argsort(d, kind='stable')
+            series[code] = (d[order], np.array(rates)[order])
+        return cls(series, **kw)
+
+    @property
+    def currencies(self):
+        return sorted(self.series)
+
+    def _lookup(self, code, days):
+        """Rates of one currency for an array of days (NaN when unknown or stale)."""
+        uniq, inverse = np.unique(days, return_inverse=True)
+        out = np.empty(len(uniq))
+        missing = []
+        for i, day in enumerate(uniq.tolist()):
+            rate = self._cache.get((code, day))
+            if rate is None:
+                missing.append(i)
+            else:
+                out[i] = rate
+        self.hits += len(uniq) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            dates, rates = self.series[code]
+            want = uniq[missing]
+            idx = np.searchsorted(dates, want, side='right') - 1
+            found = idx >= 0
+            pos = np.maximum(idx, 0)
+            ok = found & (want - dates[pos] <= self.max_age) & ~np.isnat(want)
+            got = np.where(ok, rates[pos], np.nan)
+            out[missing] = got
+            if len(self._cache) + len(missing) > CACHE_SIZE:
+                self._cache.clear()
+            self._cache.update(zip(((code, d) for d in want.tolist()), got.tolist()))
+        return out[inverse]
+
+    def rates(self, currencies, dates):
+        """ILS rate per row for parallel currency / ISO date columns (NaN when unknown)."""
+        # A column holds a handful of labels: normalise each once, then work on int ids
+        labels = {}
+        ids = np.fromiter((labels.setdefault(c, len(labels)) for c in currencies),
+                          dtype=np.int32, count=len(currencies))
+        days = _days(dates)
+        out = np.full(len(ids), np.nan)
+        for label, i in labels.items():
+            code = normalize_currency(label)
+            if code == BASE_CURRENCY:
+                out[ids == i] = 1.0
+            elif code in self.series:
+                mask = ids == i
+                out[mask] = self._lookup(code, days[mask])
+        return out
+
+    def rate(self, currency, date):
+        return float(self.rates([currency], [date])[0])
+
+    def convert(self, amounts, currencies, dates):
+        """Amounts in ILS (NaN where no rate is known)."""
+        return np.asarray(amounts, dtype=float) * self.rates(currencies, dates)
+
+
+# ============================================================
+# Normalisation stage
+# ============================================================
+def fill_amounts(amounts, dates, currencies, originals, table):
+    """Vectorised core of the stage.
+
+    amounts: ILS charges (NaN, or 0 as the exports leave the cell empty,
+    when not billed yet); originals: amounts in the row currency. Returns
+    (amounts, rates, estimated): missing charges are filled as expenses of
+    original x rate.
+    """
+    amounts = np.array(amounts, dtype=float)
+    originals = np.array([np.nan if o is None else o for o in originals], dtype=float)
+    rates = table.rates(currencies, dates)
+    estimated = ((np.isnan(amounts) | (amounts == 0)) & (originals != 0)
+                 & ~np.isnan(originals) & ~np.isnan(rates))
+    amounts[estimated] = -np.round(originals[estimated] * rates[estimated], 2)
+    return amounts, rates, estimated
+
+
+def normalize_chunk(chunk, table):
+    """Apply the FX stage to a list of unified transactions in place."""
+    foreign = []
+    for tx in chunk:
+        code = normalize_currency(tx.get('currency'))
+        if code is None:
+            continue
+        tx['currency'] = code
+        if code != BASE_CURRENCY:
+            foreign.append(tx)
+    if not foreign:
+        return chunk
+    amounts = [np.nan if tx.get('amount') is None else tx['amount'] for tx in foreign]
+    amounts, rates, estimated = fill_amounts(
+        amounts, [tx.get('date') for tx in foreign], [tx['currency'] for tx in foreign],
+        [tx.get('original_amount') for tx in foreign], table)
+    for tx, amount, rate, est in zip(foreign, amounts.tolist(), rates.tolist(), estimated.tolist()):
+        tx['fx_rate'] = None if rate != rate else round(rate, 6)
+        if est:
+            tx['amount'] = amount
+            tx['fx_estimated'] = True
+    return chunk
+
+
+def normalize_transactions(transactions, table, chunk_size=5000):
+    """Stream transactions through the FX stage, chunk by chunk."""
+    chunk = []
+    for tx in transactions:
+        chunk.append(tx)
+        if len(chunk) == chunk_size:
+            yield from normalize_chunk(chunk, table)
+            chunk = []
+    if chunk:
+        yield from normalize_chunk(chunk, table)
+
+
+def benchmark(n=1_000_000, years=5):
+    import time
+    from bisect import bisect_right
+    rng = np.random.default_rng(3)
+    start = np.datetime64('2020-01-01')
+    days = start + np.arange(365 * years)
+    business = days[(days.astype('datetime64[D]').view('int64') + 4) % 7 < 5]
+    series = {c: (business, rng.uniform(lo, lo * 1.2, len(business)))
+              for c, lo in (('USD', 3.3), ('EUR', 3.6), ('GBP', 4.2))}
+    table = RateTable(series)
+    currencies = rng.choice(['USD', '$', 'EUR', 'GBP', '₪'], n).tolist()
+    dates = np.datetime_as_string(start + rng.integers(0, 365 * years, n)).tolist()
+    originals = rng.uniform(5, 500, n)
+
+    t = time.perf_counter()
+    ils = table.convert(originals, currencies, dates)
+    vec = time.perf_counter() - t
+
+    sample = min(n, 100_000)
+    plain = {c: (s[0].astype(str).tolist(), s[1].tolist()) for c, s in series.items()}
+    t = time.perf_counter()
+    for c, d, a in zip(currencies[:sample], dates[:sample], originals[:sample]):
+        code = normalize_currency(c)
+        if code != 'ILS':
+            ds, rs = plain[code]
+            a * rs[bisect_right(ds, d) - 1]
+    per_row = (time.perf_counter() - t) * n / sample
+
+    t = time.perf_counter()
+    table.convert(originals, currencies, dates)
+    warm = time.perf_counter() - t
+    return {'rows': n, 'vectorised_seconds': round(vec, 3),
+            'vectorised_cached_seconds': round(warm, 3),
+            'per_row_bisect_seconds_est': round(per_row, 3),
+            'cache': {'hits': table.hits, 'misses': table.misses},
+            'unconverted': int(np.isnan(ils).sum())}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == '--bench':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+        print(json.dumps(benchmark(n), indent=2))
+        sys.exit(0)
+    if len(sys.argv) < 3:
+        print("Usage: python fx.py <rates.csv> <transactions.ndjson> > normalized.ndjson")
+        print("       python fx.py --bench [N]")
+        sys.exit(1)
+    table = RateTable.load(sys.argv[1])
+    with open(sys.argv[2], 'r', encoding='utf-8') as f:
+        rows = (json.loads(line) for line in f if line.strip())
+        for tx in normalize_transactions(rows, table):
+            sys.stdout.write(json.dumps(tx, ensure_ascii=False) + '\n')
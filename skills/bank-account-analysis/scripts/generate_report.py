@@ -4,11 +4,15 @@
 שימוש: הסקריפט מקבל dict של נתוני הניתוח ומייצר PDF מקצועי.
 
 דרישות:
-  pip install reportlab matplotlib python-bidi --break-system-packages
+  pip install reportlab matplotlib Pillow python-bidi --break-system-packages
 """
 
 import os
 import json
+import warnings
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime
 from io import BytesIO
 
@@ -19,15 +23,16 @@ from reportlab.lib.units import mm
 from reportlab.lib.enums import TA_RIGHT, TA_CENTER
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    PageBreak, Image
+    PageBreak, Image, Flowable
 )
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
+# matplotlib (and with it numpy) and vector_charts are imported on the first
+# chart, so text-only reports (see PREVIEW_SECTIONS) never load them
+from chart_cache import cached_chart
+from report_trace import null_span
+from section_cache import SectionCache, copy_flowables
 
 # --- Hebrew Bidi support ---
 try:
@@ -36,16 +41,48 @@ try:
 except ImportError:
     HAS_BIDI = False
 
+# Reordered strings are memoised: category, merchant and month labels repeat
+# across rows, charts and reports. Constant UI strings live in a separate
+# table so long transaction listings cannot evict them from the LRU.
+HEB_CACHE_SIZE = 8192
+_STATIC_HEB = {}
+
+
+def _bidi(text):
+    try:
+        return get_display(text)
+    except Exception:
+        return text
+
+
+@lru_cache(maxsize=HEB_CACHE_SIZE)
+def _bidi_cached(text):
+    return _bidi(text)
+
+
 def heb(text):
     """Apply bidi algorithm for correct Hebrew display in PDF.
     NOTE: Do NOT use arabic_reshaper for Hebrew - it corrupts the glyphs.
     Hebrew only needs bidi reordering, not glyph shaping."""
     if not text or not HAS_BIDI:
         return str(text)
-    try:
-        return get_display(str(text))
-    except:
-        return str(text)
+    text = str(text)
+    shaped = _STATIC_HEB.get(text)
+    if shaped is None:
+        shaped = _bidi_cached(text)
+    return shaped
+
+
+def heb_many(values):
+    """heb() over a whole table column / header row."""
+    return [heb(v) for v in values]
+
+
+def heb_cache_info():
+    """Hit/miss statistics of the bidi memo."""
+    info = _bidi_cached.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+            'maxsize': info.maxsize, 'static': len(_STATIC_HEB)}
 
 
 # --- Font setup ---
@@ -53,8 +90,10 @@ FONT_REGULAR = None
 FONT_BOLD = None
 
 def setup_fonts():
-    """Register Hebrew-supporting fonts."""
+    """Register Hebrew-supporting fonts (once per process)."""
     global FONT_REGULAR, FONT_BOLD
+    if FONT_REGULAR is not None:
+        return
 
     # FreeSans has excellent Hebrew support
     candidates = [
@@ -97,6 +136,22 @@ CHART_COLORS = [
     '#6d28d9', '#c026d3', '#ea580c', '#2563eb', '#16a34a',
 ]
 
+CHART_DPI = 150
+FIG_SIZES = {
+    'pie':      (6, 4),
+    'trend':    (7, 3.5),
+    'forecast': (7, 3.5),
+    'gauge':    (4, 2.5),
+}
+# Bump when the drawing code changes so cached chart images are invalidated
+CHART_STYLE_VERSION = 2
+
+# 'vector': reportlab.graphics drawings embedded as PDF vector operators
+# 'matplotlib': PNG images rendered by the create_*_chart functions below
+# 'none': text only - chart sections keep their text and tables
+CHART_BACKENDS = ('vector', 'matplotlib', 'none')
+CHART_BACKEND = 'vector'
+
 
 # --- Styles ---
 def create_styles():
@@ -123,6 +178,17 @@ def create_styles():
     return styles
 
 
+_STYLES = None
+
+def get_styles():
+    """Return the shared stylesheet, building it on first use."""
+    global _STYLES
+    if _STYLES is None:
+        setup_fonts()
+        _STYLES = create_styles()
+    return _STYLES
+
+
 SCORE_LABELS = {
     'excellent': "מצוין - ניהול פיננסי חכם",
     'good':     "טוב - יש מקום לשיפור קל",
@@ -131,20 +197,97 @@ SCORE_LABELS = {
     'critical': "קריטי - מומלץ לפנות לייעוץ מקצועי",
 }
 
+# Module 8 score bands: lower bound -> (SCORE_LABELS key, colour)
+SCORE_BANDS = (0, 20, 40, 60, 80)
+SCORE_LEVELS = (('critical', '#dc2626'), ('poor', '#ea580c'), ('average', '#d97706'),
+                ('good', '#2563eb'), ('excellent', '#059669'))
+
+
+def score_level(score):
+    """(SCORE_LABELS key, colour) of a 0-100 health score."""
+    return SCORE_LEVELS[max(bisect_right(SCORE_BANDS, score) - 1, 0)]
+
+# Constant Hebrew strings of the report, shaped once by precompute_static_strings()
+UI_STRINGS = (
+    # Charts
+    "פילוח הוצאות", "מגמות חודשיות", "הכנסות", "הוצאות", "בפועל", "תחזית",
+    "תחזית תזרים מזומנים", "מתוך 100", "ציון בריאות פיננסית", "טווח צפוי",
+    # Headings
+    "דוח ניתוח פיננסי", "הופק באמצעות Open Finance AI", "תקציר מנהלים", "סיכום פיננסי",
+    "פילוח הוצאות לפי קטגוריות", "הוראות קבע ומנויים", "הוצאות חריגות",
+    "הוצאות שחרגו משמעותית מהדפוס הרגיל:", "פוטנציאל חיסכון", "המלצות מותאמות אישית:",
+    "* התחזית מבוססת על נתוני עבר ואינה מביאה בחשבון שינויים עתידיים.",
+    "הערה חשובה: דוח זה נוצר באופן אוטומטי ואינו מהווה ייעוץ פיננסי מקצועי. "
+    "לקבלת החלטות פיננסיות משמעותיות מומלץ להתייעץ עם יועץ פיננסי מוסמך.",
+    "Powered by Open Finance | open-finance.ai",
+    # Table headers and cells
+    "טרנזקציות", "חיסכון חודשי", "אחוז", "סכום", "קטגוריה", "חיסכון", "חודש",
+    "סוג", "שנתי", "חודשי", "שם", "רמה", "תיאור", "תאריך", "הזדמנות",
+    "חריגה גבוהה", "חריגה בינונית", "ציון", "מקסימום", "רכיב",
+    "נספח: פירוט כל הטרנזקציות", "מקור",
+)
+
+
+def precompute_static_strings(extra=()):
+    """Shape the constant UI strings once (called at import / worker start)."""
+    if not HAS_BIDI:
+        return
+    for text in (*UI_STRINGS, *SCORE_LABELS.values(), *extra):
+        if text not in _STATIC_HEB:
+            _STATIC_HEB[text] = _bidi(text)
+
+
+precompute_static_strings()
+
 
 # --- Matplotlib charts ---
-def _setup_mpl():
-    plt.rcParams['font.family'] = 'DejaVu Sans'
-    plt.rcParams['axes.unicode_minus'] = False
+# Figures are built with the object-oriented API (Figure + Agg canvas), not
+# pyplot, so no global figure state is shared and the charts of one report
+# can render concurrently (see ChartStage).
+@lru_cache(maxsize=None)
+def _mpl():
+    """(Figure, FigureCanvasAgg, ticker), importing matplotlib on first use."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.ticker as ticker
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    matplotlib.rcParams['font.family'] = 'DejaVu Sans'
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    return Figure, FigureCanvasAgg, ticker
+
+
+def _new_figure(kind):
+    Figure, FigureCanvasAgg, _ = _mpl()
+    fig = Figure(figsize=FIG_SIZES[kind])
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots(1, 1)
+
+
+def _money_axis(ax):
+    ax.yaxis.set_major_formatter(_mpl()[2].FuncFormatter(lambda v, _: f'{v:,.0f}'))
+
+
+def _png(fig):
+    buf = BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format='png', dpi=CHART_DPI, bbox_inches='tight', facecolor='white')
+    buf.seek(0)
+    return buf
+
 
+def _chart_style():
+    """Everything besides the inputs that changes how a chart looks (cache key)."""
+    return [CHART_STYLE_VERSION, CHART_DPI, FIG_SIZES, CHART_COLORS, HAS_BIDI]
 
+
+@cached_chart('pie', _chart_style)
 def create_pie_chart(categories, amounts):
-    _setup_mpl()
-    fig, ax = plt.subplots(1, 1, figsize=(6, 4))
+    fig, ax = _new_figure('pie')
 
     sorted_data = sorted(zip(amounts, categories), reverse=True)
     amounts_s = [d[0] for d in sorted_data]
-    cats_s = [heb(d[1]) for d in sorted_data]
+    cats_s = heb_many(d[1] for d in sorted_data)
     clrs = CHART_COLORS[:len(categories)]
 
     wedges, _, autotexts = ax.pie(
@@ -156,17 +299,12 @@ def create_pie_chart(categories, amounts):
               fontsize=8, frameon=False)
     ax.set_title(heb("פילוח הוצאות"), fontsize=14, fontweight='bold', pad=10)
 
-    buf = BytesIO()
-    fig.tight_layout()
-    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close(fig)
-    buf.seek(0)
-    return buf
+    return _png(fig)
 
 
+@cached_chart('trend', _chart_style)
 def create_trend_chart(months, incomes, expenses):
-    _setup_mpl()
-    fig, ax = plt.subplots(1, 1, figsize=(7, 3.5))
+    fig, ax = _new_figure('trend')
     x = range(len(months))
 
     ax.plot(x, incomes, color='#059669', marker='o', linewidth=2, markersize=5,
@@ -179,30 +317,32 @@ def create_trend_chart(months, incomes, expenses):
                     where=[i <= e for i, e in zip(incomes, expenses)], color='#dc2626')
 
     ax.set_xticks(x)
-    ax.set_xticklabels([heb(m) for m in months], fontsize=8, rotation=45)
-    ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda v, _: f'{v:,.0f}'))
+    ax.set_xticklabels(heb_many(months), fontsize=8, rotation=45)
+    _money_axis(ax)
     ax.set_title(heb("מגמות חודשיות"), fontsize=14, fontweight='bold')
     ax.legend(fontsize=9, frameon=False)
     ax.grid(axis='y', alpha=0.3)
     ax.spines['top'].set_visible(False)
     ax.spines['right'].set_visible(False)
 
-    buf = BytesIO()
-    fig.tight_layout()
-    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close(fig)
-    buf.seek(0)
-    return buf
+    return _png(fig)
 
 
-def create_forecast_chart(months_actual, balances_actual, months_forecast, balances_forecast):
-    _setup_mpl()
-    fig, ax = plt.subplots(1, 1, figsize=(7, 3.5))
+@cached_chart('forecast', _chart_style)
+def create_forecast_chart(months_actual, balances_actual, months_forecast, balances_forecast,
+                          bands=None):
+    fig, ax = _new_figure('forecast')
 
     all_months = months_actual + months_forecast
     x_actual = range(len(months_actual))
     x_forecast = range(len(months_actual) - 1, len(all_months))
 
+    # Percentile bands (forecast.py), outermost first; overlaps darken the inner ones
+    for i, band in enumerate(bands or ()):
+        ax.fill_between(x_forecast, [balances_actual[-1]] + band['low'],
+                        [balances_actual[-1]] + band['high'], color='#1a56db', alpha=0.12,
+                        linewidth=0, label=heb('טווח צפוי') if i == 0 else None)
+
     ax.plot(x_actual, balances_actual, color='#1a56db', marker='o', linewidth=2,
             label=heb('בפועל'))
     forecast_line = [balances_actual[-1]] + balances_forecast
@@ -213,26 +353,21 @@ def create_forecast_chart(months_actual, balances_actual, months_forecast, balan
         ax.axhline(y=0, color='#dc2626', linestyle=':', alpha=0.5)
 
     ax.set_xticks(range(len(all_months)))
-    ax.set_xticklabels([heb(m) for m in all_months], fontsize=8, rotation=45)
-    ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda v, _: f'{v:,.0f}'))
+    ax.set_xticklabels(heb_many(all_months), fontsize=8, rotation=45)
+    _money_axis(ax)
     ax.set_title(heb("תחזית תזרים מזומנים"), fontsize=14, fontweight='bold')
     ax.legend(fontsize=9, frameon=False)
     ax.grid(axis='y', alpha=0.3)
     ax.spines['top'].set_visible(False)
     ax.spines['right'].set_visible(False)
 
-    buf = BytesIO()
-    fig.tight_layout()
-    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close(fig)
-    buf.seek(0)
-    return buf
+    return _png(fig)
 
 
+@cached_chart('gauge', _chart_style)
 def create_health_gauge(score):
     import numpy as np
-    _setup_mpl()
-    fig, ax = plt.subplots(1, 1, figsize=(4, 2.5))
+    fig, ax = _new_figure('gauge')
 
     theta = np.linspace(np.pi, 0, 100)
     r_outer, r_inner = 1.0, 0.6
@@ -263,12 +398,7 @@ def create_health_gauge(score):
     ax.axis('off')
     ax.set_title(heb("ציון בריאות פיננסית"), fontsize=14, fontweight='bold', pad=5)
 
-    buf = BytesIO()
-    fig.tight_layout()
-    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close(fig)
-    buf.seek(0)
-    return buf
+    return _png(fig)
 
 
 # --- Table helper ---
@@ -296,42 +426,313 @@ def styled_table(data, col_widths=None, header=True):
             ('FONTNAME',   (0,0), (-1,0), FONT_BOLD),
             ('FONTSIZE',   (0,0), (-1,0), 10),
         ]
-    for i in range(1 if header else 0, len(rtl_data)):
-        if i % 2 == 0:
-            cmds.append(('BACKGROUND', (0,i), (-1,i), C['light_bg']))
+    # Even rows are shaded; a single ROWBACKGROUNDS command instead of one per row
+    first = 1 if header else 0
+    stripes = [C['white'], C['light_bg']] if first % 2 else [C['light_bg'], C['white']]
+    cmds.append(('ROWBACKGROUNDS', (0,first), (-1,-1), stripes))
 
     table.setStyle(TableStyle(cmds))
     return table
 
 
+# --- Transaction appendix ---
+APPENDIX_HEADER = ["תאריך", "תיאור", "קטגוריה", "מקור", "סכום"]
+APPENDIX_COL_WIDTHS = [25*mm, 63*mm, 32*mm, 32*mm, 28*mm]
+APPENDIX_ROW_HEIGHT = 5.5*mm
+
+
+class TransactionAppendix(Flowable):
+    """
+    Listing of every transaction, laid out one page-sized Table at a time.
+
+    Rows are pulled lazily from the transactions iterable as each page is
+    split off, so memory stays flat regardless of row count (a single Table
+    would hold - and lay out - every row at once). Row heights are fixed, so
+    the rows per page are known without measuring, and striping is one
+    ROWBACKGROUNDS command per page instead of one BACKGROUND per row.
+    """
+
+    def __init__(self, transactions, col_widths=APPENDIX_COL_WIDTHS,
+                 row_height=APPENDIX_ROW_HEIGHT):
+        Flowable.__init__(self)
+        self.col_widths = col_widths[::-1]
+        self.row_height = row_height
+        self._rows = self._iter_rows(transactions)
+        self._next = next(self._rows, None)
+        self._header = heb_many(APPENDIX_HEADER)[::-1]
+        self._style = TableStyle([
+            ('ALIGN',         (0,0), (-1,-1), 'RIGHT'),
+            ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
+            ('FONTNAME',      (0,0), (-1,-1), FONT_REGULAR),
+            ('FONTSIZE',      (0,0), (-1,-1), 8),
+            ('TOPPADDING',    (0,0), (-1,-1), 2),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 2),
+            ('LEFTPADDING',   (0,0), (-1,-1), 4),
+            ('RIGHTPADDING',  (0,0), (-1,-1), 4),
+            ('GRID',          (0,0), (-1,-1), 0.25, C['border']),
+            ('BACKGROUND',    (0,0), (-1,0), C['primary']),
+            ('TEXTCOLOR',     (0,0), (-1,0), C['white']),
+            ('FONTNAME',      (0,0), (-1,0), FONT_BOLD),
+            ('ROWBACKGROUNDS', (0,1), (-1,-1), [C['white'], C['light_bg']]),
+        ])
+
+    @staticmethod
+    def _iter_rows(transactions):
+        # Built directly in display (left-to-right) order
+        for tx in transactions:
+            yield [
+                f"{tx.get('amount') or 0:,.2f}",
+                heb(tx.get('source') or ''),
+                heb(tx.get('category') or ''),
+                heb(str(tx.get('description') or '')[:45]),
+                tx.get('date', ''),
+            ]
+
+    def wrap(self, availWidth, availHeight):
+        if self._next is None:
+            return (0, 0)
+        # Never report a fit, so the frame always splits off one page
+        return (availWidth, availHeight + 1)
+
+    def split(self, availWidth, availHeight):
+        if self._next is None:
+            return []
+        per_page = int(availHeight // self.row_height) - 1   # minus header row
+        if per_page < 1:
+            # Too little room left under the previous chunk / heading
+            return [PageBreak(), self]
+        rows = [self._header]
+        while len(rows) <= per_page and self._next is not None:
+            rows.append(self._next)
+            self._next = next(self._rows, None)
+        page = Table(rows, colWidths=self.col_widths, rowHeights=self.row_height)
+        page.setStyle(self._style)
+        return [page, self] if self._next is not None else [page]
+
+    def draw(self):
+        pass
+
+
+# --- Chart backend dispatch ---
+def _vector_chart(kind, args, width, height):
+    import vector_charts
+    fonts = (FONT_REGULAR, FONT_BOLD)
+    if kind == 'pie':
+        labels, amounts = args
+        return vector_charts.pie_chart(heb_many(labels), amounts, width, height,
+                                       heb("פילוח הוצאות"), fonts, CHART_COLORS)
+    if kind == 'trend':
+        months, incomes, expenses = args
+        return vector_charts.trend_chart(heb_many(months), incomes, expenses, width, height,
+                                         heb("מגמות חודשיות"),
+                                         heb_many(["הכנסות", "הוצאות"]), fonts)
+    if kind == 'forecast':
+        months_a, balances_a, months_f, balances_f, bands = args
+        return vector_charts.forecast_chart(heb_many(months_a), balances_a,
+                                            heb_many(months_f), balances_f, width, height,
+                                            heb("תחזית תזרים מזומנים"),
+                                            heb_many(["בפועל", "תחזית", "טווח צפוי"]), fonts,
+                                            bands)
+    if kind == 'gauge':
+        (score,) = args
+        return vector_charts.health_gauge(score, width, height, heb("ציון בריאות פיננסית"),
+                                          heb("מתוך 100"), fonts)
+    raise ValueError(f"Unknown chart: {kind}")
+
+
+MPL_CHARTS = {
+    'pie': create_pie_chart,
+    'trend': create_trend_chart,
+    'forecast': create_forecast_chart,
+    'gauge': create_health_gauge,
+}
+
+
+# --- Chart image encoding (matplotlib backend) ---
+# image_options: {'dpi': ..., 'image_format': 'png'|'jpeg', 'jpeg_quality': ...,
+# 'png_colors': ...}. Charts are rendered (and cached) at CHART_DPI and
+# re-encoded from there. Encoders are deterministic, so identical charts give
+# identical streams and reportlab embeds each distinct image once per PDF.
+IMAGE_FORMATS = ('png', 'jpeg')
+
+# Steps tried in order when a report exceeds its max_bytes budget
+SIZE_LADDER = [
+    {'dpi': 110, 'image_format': 'png', 'png_colors': 64},
+    {'dpi': 96,  'image_format': 'jpeg', 'jpeg_quality': 75},
+    {'dpi': 72,  'image_format': 'jpeg', 'jpeg_quality': 55},
+]
+
+
+def encode_chart_image(buf, dpi=None, image_format='png', jpeg_quality=85, png_colors=None):
+    """Resample / quantise / re-encode a rendered chart PNG; returns a BytesIO."""
+    dpi = dpi or CHART_DPI
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format: {image_format} (expected one of {IMAGE_FORMATS})")
+    if dpi == CHART_DPI and image_format == 'png' and not png_colors:
+        return buf
+    from PIL import Image as PILImage
+
+    img = PILImage.open(buf)
+    img.load()
+    if dpi != CHART_DPI:
+        size = (max(1, round(img.width * dpi / CHART_DPI)),
+                max(1, round(img.height * dpi / CHART_DPI)))
+        img = img.resize(size, PILImage.LANCZOS)
+    out = BytesIO()
+    if image_format == 'jpeg':
+        img.convert('RGB').save(out, format='JPEG', quality=jpeg_quality, optimize=True)
+    else:
+        if png_colors:
+            img = img.convert('RGB').quantize(colors=png_colors)
+        img.save(out, format='PNG', optimize=True)
+    out.seek(0)
+    return out
+
+
+def chart_flowable(kind, args, width, height, backend=None, image_options=None):
+    """The flowable for one chart, drawn by the selected backend."""
+    backend = backend or CHART_BACKEND
+    if backend == 'vector':
+        return _vector_chart(kind, args, width, height)
+    if backend == 'matplotlib':
+        buf = encode_chart_image(MPL_CHARTS[kind](*args), **(image_options or {}))
+        return Image(buf, width=width, height=height)
+    if backend == 'none':
+        return None
+    raise ValueError(f"Unknown chart backend: {backend} (expected one of {CHART_BACKENDS})")
+
+
 # ============================================================
-# Main report generator
+# Chart stage
 # ============================================================
-def generate_report(analysis_data, output_path):
-    """
-    Generate the full PDF report.
+# Chart jobs are submitted before any section is built and collected when
+# the story is assembled, so matplotlib renders overlap with each other and
+# with table/paragraph building. Threads are the default (the figures use no
+# shared pyplot state); pass a ProcessPoolExecutor as chart_executor for
+# CPU parallelism - the chart functions and their arguments pickle. Vector
+# drawings take ~1ms and are built inline.
+CHART_WORKERS = min(4, os.cpu_count() or 1)
+_chart_pool = None
 
-    analysis_data: dict with keys:
-        user_name, period, sources, summary, categories, trends,
-        recurring, anomalies, savings_potential, forecast,
-        health_score, key_insights
+
+def _default_chart_executor():
+    global _chart_pool
+    if _chart_pool is None and CHART_WORKERS > 1:
+        _chart_pool = ThreadPoolExecutor(max_workers=CHART_WORKERS,
+                                         thread_name_prefix='report-chart')
+    return _chart_pool
+
+
+def _forget_chart_pool():
+    # A forked child (report_daemon workers) inherits the pool but not its threads
+    global _chart_pool
+    _chart_pool = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_chart_pool)
+
+
+def chart_specs(d, kinds=None):
+    """{kind: (args, width, height)} for every chart this report contains
+    (or only those in `kinds`)."""
+    specs = {}
+    cats = d.get('categories', {})
+    if cats.get('labels'):
+        specs['pie'] = ((cats['labels'], cats['amounts']), 160*mm, 110*mm)
+    trends = d.get('trends', {})
+    if trends.get('months'):
+        specs['trend'] = ((trends['months'], trends['incomes'], trends['expenses']),
+                          170*mm, 90*mm)
+    forecast = d.get('forecast', {})
+    if forecast.get('months_actual'):
+        specs['forecast'] = ((forecast['months_actual'], forecast['balances_actual'],
+                              forecast['months_forecast'], forecast['balances_forecast'],
+                              forecast.get('bands')),
+                             170*mm, 90*mm)
+    health = d.get('health_score', {})
+    if health.get('total') is not None:
+        specs['gauge'] = ((health['total'],), 100*mm, 65*mm)
+    if kinds is not None:
+        specs = {k: v for k, v in specs.items() if k in kinds}
+    return specs
+
+
+class _PendingChart:
+    """Story placeholder for a chart still rendering."""
+
+    def __init__(self, kind, future, width, height, image_options):
+        self.kind, self.future, self.width, self.height = kind, future, width, height
+        self.image_options = image_options
+
+    def result(self):
+        buf = encode_chart_image(self.future.result(), **self.image_options)
+        return Image(buf, width=self.width, height=self.height)
+
+
+class ChartStage:
+    """The charts of one report: started up front, slotted into the story at the end."""
+
+    def __init__(self, specs, backend=None, executor=None, image_options=None, span=null_span):
+        self.backend = backend or CHART_BACKEND
+        self.span = span
+        if self.backend not in CHART_BACKENDS:
+            raise ValueError(f"Unknown chart backend: {self.backend} "
+                             f"(expected one of {CHART_BACKENDS})")
+        self.specs = specs
+        self.image_options = image_options or {}
+        self._pending = {}
+        if self.backend == 'matplotlib':
+            executor = executor or _default_chart_executor()
+            if executor is not None:
+                for kind, (args, w, h) in specs.items():
+                    self._pending[kind] = _PendingChart(
+                        kind, executor.submit(MPL_CHARTS[kind], *args), w, h,
+                        self.image_options)
+
+    def flowable(self, kind):
+        """The chart's flowable, or None for the 'none' backend."""
+        if kind in self._pending:
+            return self._pending[kind]
+        if self.backend == 'none':
+            return None
+        args, w, h = self.specs[kind]
+        with self.span(f'chart:{kind}', backend=self.backend):
+            return chart_flowable(kind, args, w, h, self.backend, self.image_options)
+
+    def resolve(self, story):
+        out = []
+        for f in story:
+            if isinstance(f, _PendingChart):
+                # Time spent waiting for the pool plus re-encoding
+                with self.span(f'chart:{f.kind}', backend=self.backend, pooled=True):
+                    f = f.result()
+            out.append(f)
+        return out
+
+
+# ============================================================
+# Report sections
+# ============================================================
+class ReportContext:
+    """What section builders share: styles, frame width, charts, appendix rows.
+
+    compact: the preview layout - no cover spacing, sections run on
+    without page breaks, health shows score, level and top recommendations.
     """
-    setup_fonts()
-    styles = create_styles()
 
-    doc = SimpleDocTemplate(
-        output_path, pagesize=A4,
-        rightMargin=15*mm, leftMargin=15*mm,
-        topMargin=20*mm, bottomMargin=20*mm,
-    )
+    def __init__(self, styles, width, charts, transactions=None, compact=False):
+        self.styles = styles
+        self.width = width
+        self.charts = charts
+        self.transactions = transactions
+        self.compact = compact
 
-    story = []
-    d = analysis_data
 
-    # ===== Cover page =====
-    story.append(Spacer(1, 40*mm))
-    story.append(Paragraph(heb("דוח ניתוח פיננסי"), styles['HTitle']))
-    story.append(Spacer(1, 5*mm))
+def build_cover(d, ctx):
+    styles = ctx.styles
+    story = [Spacer(1, 0 if ctx.compact else 40*mm),
+             Paragraph(heb("דוח ניתוח פיננסי"), styles['HTitle']), Spacer(1, 5*mm)]
 
     if d.get('user_name'):
         story.append(Paragraph(heb(d['user_name']), styles['HCenter']))
@@ -348,20 +749,25 @@ def generate_report(analysis_data, output_path):
     story.append(Paragraph(heb(f"הופק בתאריך: {today}"), styles['HSmall']))
     story.append(Paragraph(heb("הופק באמצעות Open Finance AI"), styles['HSmall']))
     story.append(PageBreak())
+    return story
+
 
-    # ===== Executive summary =====
-    story.append(Paragraph(heb("תקציר מנהלים"), styles['HH1']))
+def build_insights(d, ctx):
+    styles = ctx.styles
+    story = [Paragraph(heb("תקציר מנהלים"), styles['HH1'])]
     for insight in d.get('key_insights', []):
         story.append(Paragraph(heb(f"- {insight}"), styles['HBody']))
     story.append(Spacer(1, 5*mm))
+    return story
+
 
-    # ===== Financial summary KPIs =====
-    story.append(Paragraph(heb("סיכום פיננסי"), styles['HH1']))
+def build_kpis(d, ctx):
+    styles = ctx.styles
+    story = [Paragraph(heb("סיכום פיננסי"), styles['HH1'])]
     s = d.get('summary', {})
 
     kpi_data = [
-        [heb("טרנזקציות"), heb("חיסכון חודשי"),
-         heb("הוצאות"), heb("הכנסות")],
+        heb_many(["טרנזקציות", "חיסכון חודשי", "הוצאות", "הכנסות"]),
         [
             str(s.get('total_transactions', 0)),
             f"{s.get('avg_monthly_saving', 0):,.0f}",
@@ -369,7 +775,7 @@ def generate_report(analysis_data, output_path):
             f"{s.get('total_income', 0):,.0f}",
         ],
     ]
-    kpi = Table(kpi_data, colWidths=[doc.width/4]*4)
+    kpi = Table(kpi_data, colWidths=[ctx.width/4]*4)
     kpi.setStyle(TableStyle([
         ('ALIGN',        (0,0), (-1,-1), 'CENTER'),
         ('FONTNAME',     (0,0), (-1,0), FONT_REGULAR),
@@ -391,169 +797,509 @@ def generate_report(analysis_data, output_path):
         story.append(Paragraph(
             heb(f"יחס הוצאות/הכנסות: {s['expense_ratio']:.0f}%"), styles['HBody']))
     story.append(PageBreak())
+    return story
 
-    # ===== Expense categories =====
+
+def build_categories(d, ctx):
     cats = d.get('categories', {})
-    if cats.get('labels'):
-        story.append(Paragraph(heb("פילוח הוצאות לפי קטגוריות"), styles['HH1']))
+    if not cats.get('labels'):
+        return []
+    story = [Paragraph(heb("פילוח הוצאות לפי קטגוריות"), ctx.styles['HH1']),
+             ctx.charts.flowable('pie'), Spacer(1, 3*mm)]
+
+    header_row = heb_many(["אחוז", "סכום", "קטגוריה"])
+    rows = [header_row]
+    for lbl, amt, pct in sorted(
+            zip(cats['labels'], cats['amounts'], cats['percentages']),
+            key=lambda x: x[1], reverse=True):
+        rows.append([f"{pct:.1f}%", f"{amt:,.0f}", heb(lbl)])
+    story.append(styled_table(rows, col_widths=[30*mm, 40*mm, 60*mm]))
+    story.append(PageBreak())
+    return story
 
-        pie_buf = create_pie_chart(cats['labels'], cats['amounts'])
-        story.append(Image(pie_buf, width=160*mm, height=110*mm))
-        story.append(Spacer(1, 3*mm))
 
-        header_row = [heb("אחוז"), heb("סכום"), heb("קטגוריה")]
-        rows = [header_row]
-        for lbl, amt, pct in sorted(
-                zip(cats['labels'], cats['amounts'], cats['percentages']),
-                key=lambda x: x[1], reverse=True):
-            rows.append([f"{pct:.1f}%", f"{amt:,.0f}", heb(lbl)])
-        story.append(styled_table(rows, col_widths=[30*mm, 40*mm, 60*mm]))
-        story.append(PageBreak())
-
-    # ===== Monthly trends =====
+def build_trends(d, ctx):
     trends = d.get('trends', {})
-    if trends.get('months'):
-        story.append(Paragraph(heb("מגמות חודשיות"), styles['HH1']))
-        trend_buf = create_trend_chart(trends['months'], trends['incomes'], trends['expenses'])
-        story.append(Image(trend_buf, width=170*mm, height=90*mm))
-        story.append(Spacer(1, 3*mm))
+    if not trends.get('months'):
+        return []
+    story = [Paragraph(heb("מגמות חודשיות"), ctx.styles['HH1']),
+             ctx.charts.flowable('trend'), Spacer(1, 3*mm)]
+
+    header_row = heb_many(["חיסכון", "הוצאות", "הכנסות", "חודש"])
+    rows = [header_row]
+    savings = trends.get('savings', [0]*len(trends['months']))
+    for i, month in enumerate(trends['months']):
+        rows.append([
+            f"{savings[i]:,.0f}",
+            f"{trends['expenses'][i]:,.0f}",
+            f"{trends['incomes'][i]:,.0f}",
+            heb(month),
+        ])
+    story.append(styled_table(rows, col_widths=[35*mm]*4))
+    story.append(PageBreak())
+    return story
 
-        header_row = [heb("חיסכון"), heb("הוצאות"), heb("הכנסות"), heb("חודש")]
-        rows = [header_row]
-        savings = trends.get('savings', [0]*len(trends['months']))
-        for i, month in enumerate(trends['months']):
-            rows.append([
-                f"{savings[i]:,.0f}",
-                f"{trends['expenses'][i]:,.0f}",
-                f"{trends['incomes'][i]:,.0f}",
-                heb(month),
-            ])
-        story.append(styled_table(rows, col_widths=[35*mm]*4))
-        story.append(PageBreak())
-
-    # ===== Recurring payments =====
+
+def build_recurring(d, ctx):
     recurring = d.get('recurring', [])
-    if recurring:
-        story.append(Paragraph(heb("הוראות קבע ומנויים"), styles['HH1']))
-        total_m = sum(r['monthly'] for r in recurring)
-        total_y = sum(r['yearly'] for r in recurring)
-        story.append(Paragraph(
-            heb(f"סה\"כ: {total_m:,.0f} לחודש | {total_y:,.0f} לשנה"), styles['HBody']))
+    if not recurring:
+        return []
+    styles = ctx.styles
+    story = [Paragraph(heb("הוראות קבע ומנויים"), styles['HH1'])]
+    total_m = sum(r['monthly'] for r in recurring)
+    total_y = sum(r['yearly'] for r in recurring)
+    story.append(Paragraph(
+        heb(f"סה\"כ: {total_m:,.0f} לחודש | {total_y:,.0f} לשנה"), styles['HBody']))
+
+    header_row = heb_many(["סוג", "שנתי", "חודשי", "שם"])
+    rows = [header_row]
+    for r in sorted(recurring, key=lambda x: x['yearly'], reverse=True):
+        rows.append([heb(r['type']), f"{r['yearly']:,.0f}",
+                     f"{r['monthly']:,.0f}", heb(r['name'])])
+    story.append(styled_table(rows, col_widths=[30*mm, 35*mm, 35*mm, 50*mm]))
+    story.append(PageBreak())
+    return story
 
-        header_row = [heb("סוג"), heb("שנתי"), heb("חודשי"), heb("שם")]
-        rows = [header_row]
-        for r in sorted(recurring, key=lambda x: x['yearly'], reverse=True):
-            rows.append([heb(r['type']), f"{r['yearly']:,.0f}",
-                         f"{r['monthly']:,.0f}", heb(r['name'])])
-        story.append(styled_table(rows, col_widths=[30*mm, 35*mm, 35*mm, 50*mm]))
-        story.append(PageBreak())
 
-    # ===== Anomalies =====
+def build_anomalies(d, ctx):
     anomalies = d.get('anomalies', [])
-    if anomalies:
-        story.append(Paragraph(heb("הוצאות חריגות"), styles['HH1']))
-        story.append(Paragraph(
-            heb("הוצאות שחרגו משמעותית מהדפוס הרגיל:"), styles['HBody']))
-
-        header_row = [heb("רמה"), heb("סכום"), heb("תיאור"), heb("תאריך")]
-        rows = [header_row]
-        for a in anomalies:
-            sev = heb("חריגה גבוהה") if a['severity'] == 'high' else heb("חריגה בינונית")
-            rows.append([sev, f"{abs(a['amount']):,.0f}",
-                         heb(a['description'][:30]), a['date']])
-        story.append(styled_table(rows, col_widths=[30*mm, 30*mm, 50*mm, 30*mm]))
-
-    # ===== Savings potential =====
+    if not anomalies:
+        return []
+    styles = ctx.styles
+    story = [Paragraph(heb("הוצאות חריגות"), styles['HH1']),
+             Paragraph(heb("הוצאות שחרגו משמעותית מהדפוס הרגיל:"), styles['HBody'])]
+
+    header_row = heb_many(["רמה", "סכום", "תיאור", "תאריך"])
+    rows = [header_row]
+    for a in anomalies:
+        sev = heb("חריגה גבוהה") if a['severity'] == 'high' else heb("חריגה בינונית")
+        rows.append([sev, f"{abs(a['amount']):,.0f}",
+                     heb(a['description'][:30]), a['date']])
+    story.append(styled_table(rows, col_widths=[30*mm, 30*mm, 50*mm, 30*mm]))
+    return story
+
+
+def build_savings(d, ctx):
     savings_p = d.get('savings_potential', [])
-    if savings_p:
-        story.append(Spacer(1, 5*mm))
-        story.append(Paragraph(heb("פוטנציאל חיסכון"), styles['HH1']))
-        tm = sum(s['monthly_saving'] for s in savings_p)
-        ty = sum(s['yearly_saving'] for s in savings_p)
-        story.append(Paragraph(
-            heb(f"פוטנציאל כולל: {tm:,.0f} לחודש | {ty:,.0f} לשנה"), styles['HBody']))
+    if not savings_p:
+        return []
+    styles = ctx.styles
+    story = [Spacer(1, 5*mm), Paragraph(heb("פוטנציאל חיסכון"), styles['HH1'])]
+    tm = sum(s['monthly_saving'] for s in savings_p)
+    ty = sum(s['yearly_saving'] for s in savings_p)
+    story.append(Paragraph(
+        heb(f"פוטנציאל כולל: {tm:,.0f} לחודש | {ty:,.0f} לשנה"), styles['HBody']))
+
+    header_row = heb_many(["שנתי", "חודשי", "הזדמנות"])
+    rows = [header_row]
+    for sv in sorted(savings_p, key=lambda x: x['yearly_saving'], reverse=True):
+        rows.append([f"{sv['yearly_saving']:,.0f}", f"{sv['monthly_saving']:,.0f}",
+                     heb(sv['description'][:40])])
+    story.append(styled_table(rows, col_widths=[35*mm, 35*mm, 70*mm]))
+    story.append(PageBreak())
+    return story
 
-        header_row = [heb("שנתי"), heb("חודשי"), heb("הזדמנות")]
-        rows = [header_row]
-        for sv in sorted(savings_p, key=lambda x: x['yearly_saving'], reverse=True):
-            rows.append([f"{sv['yearly_saving']:,.0f}", f"{sv['monthly_saving']:,.0f}",
-                         heb(sv['description'][:40])])
-        story.append(styled_table(rows, col_widths=[35*mm, 35*mm, 70*mm]))
-        story.append(PageBreak())
 
-    # ===== Cash flow forecast =====
+def build_forecast(d, ctx):
     forecast = d.get('forecast', {})
-    if forecast.get('months_actual'):
-        story.append(Paragraph(heb("תחזית תזרים מזומנים"), styles['HH1']))
-        fc_buf = create_forecast_chart(
-            forecast['months_actual'], forecast['balances_actual'],
-            forecast['months_forecast'], forecast['balances_forecast'])
-        story.append(Image(fc_buf, width=170*mm, height=90*mm))
-        story.append(Spacer(1, 3*mm))
+    if not forecast.get('months_actual'):
+        return []
+    styles = ctx.styles
+    story = [
+        Paragraph(heb("תחזית תזרים מזומנים"), styles['HH1']),
+        ctx.charts.flowable('forecast'),
+        Spacer(1, 3*mm),
+    ]
+    bands = forecast.get('bands')
+    if bands:
+        lo, hi = bands[0]['percentiles']
+        story.append(Paragraph(heb(f"האזור המוצלל: {hi - lo}% מהתרחישים בסימולציה."),
+                               styles['HSmall']))
+    # Module 7 alert: a meaningful chance of a negative balance
+    risk = forecast.get('negative_probability') or []
+    if risk and max(risk) >= 0.1:
+        month = forecast['months_forecast'][risk.index(max(risk))]
         story.append(Paragraph(
-            heb("* התחזית מבוססת על נתוני עבר ואינה מביאה בחשבון שינויים עתידיים."),
-            styles['HSmall']))
+            heb(f"[!] סיכוי של {max(risk):.0%} ליתרה שלילית עד {month}"), styles['HBody']))
+    story.append(Paragraph(
+        heb("* התחזית מבוססת על נתוני עבר ואינה מביאה בחשבון שינויים עתידיים."),
+        styles['HSmall']))
+    return story
 
-    # ===== Health score =====
+
+def build_health(d, ctx):
     health = d.get('health_score', {})
-    if health.get('total') is not None:
-        story.append(Spacer(1, 5*mm))
-        story.append(Paragraph(heb("ציון בריאות פיננסית"), styles['HH1']))
+    if health.get('total') is None:
+        return []
+    styles = ctx.styles
+    gauge = ctx.charts.flowable('gauge')
+    if gauge is None:
+        # Text-only: the score the gauge would show
+        gauge = Paragraph(heb(f"{health['total']} מתוך 100"), styles['HTitle'])
+    story = [Spacer(1, 5*mm), Paragraph(heb("ציון בריאות פיננסית"), styles['HH1']),
+             gauge, Spacer(1, 3*mm)]
+
+    key, clr = score_level(health['total'])
+    story.append(Paragraph(
+        f'<font color="{clr}">{heb(SCORE_LABELS[key])}</font>', styles['HCenter']))
 
-        gauge_buf = create_health_gauge(health['total'])
-        story.append(Image(gauge_buf, width=100*mm, height=65*mm))
+    if health.get('components') and not ctx.compact:
+        header_row = heb_many(["ציון", "מקסימום", "תיאור", "רכיב"])
+        rows = [header_row]
+        for comp in health['components']:
+            rows.append([
+                str(comp['score']), str(comp['max']),
+                heb(comp.get('description', '')[:30]), heb(comp['name'])])
         story.append(Spacer(1, 3*mm))
+        story.append(styled_table(rows, col_widths=[20*mm, 25*mm, 55*mm, 40*mm]))
 
-        score = health['total']
-        if score >= 80:
-            level, clr = SCORE_LABELS['excellent'], '#059669'
-        elif score >= 60:
-            level, clr = SCORE_LABELS['good'], '#2563eb'
-        elif score >= 40:
-            level, clr = SCORE_LABELS['average'], '#d97706'
-        elif score >= 20:
-            level, clr = SCORE_LABELS['poor'], '#ea580c'
-        else:
-            level, clr = SCORE_LABELS['critical'], '#dc2626'
+    recommendations = health.get('recommendations') or []
+    if ctx.compact:
+        # The one-page preview: score and level only, plus the top few actions
+        recommendations = recommendations[:PREVIEW_RECOMMENDATIONS]
+    if recommendations:
+        story.append(Spacer(1, 5*mm))
+        story.append(Paragraph(heb("המלצות מותאמות אישית:"), styles['HH2']))
+        for i, rec in enumerate(recommendations, 1):
+            story.append(Paragraph(heb(f"{i}. {rec}"), styles['HBody']))
+    return story
+
+
+def build_disclaimer(d, ctx):
+    styles = ctx.styles
+    return [
+        Spacer(1, 10*mm),
+        Paragraph(
+            heb("הערה חשובה: דוח זה נוצר באופן אוטומטי ואינו מהווה ייעוץ פיננסי מקצועי. "
+                "לקבלת החלטות פיננסיות משמעותיות מומלץ להתייעץ עם יועץ פיננסי מוסמך."),
+            styles['HDisclaim']),
+        Paragraph(heb("Powered by Open Finance | open-finance.ai"), styles['HDisclaim']),
+    ]
+
+
+def build_appendix(d, ctx):
+    transactions = ctx.transactions
+    if transactions is None:
+        transactions = d.get('transactions')
+    if not transactions:
+        return []
+    return [PageBreak(), Paragraph(heb("נספח: פירוט כל הטרנזקציות"), ctx.styles['HH1']),
+            TransactionAppendix(transactions)]
+
+
+# Report layout, in order
+SECTIONS = (
+    ('cover',      build_cover),
+    ('insights',   build_insights),
+    ('kpis',       build_kpis),
+    ('categories', build_categories),
+    ('trends',     build_trends),
+    ('recurring',  build_recurring),
+    ('anomalies',  build_anomalies),
+    ('savings',    build_savings),
+    ('forecast',   build_forecast),
+    ('health',     build_health),
+    ('disclaimer', build_disclaimer),
+    ('appendix',   build_appendix),
+)
+SECTION_NAMES = tuple(name for name, _ in SECTIONS)
+
+# Charts drawn by each section; only the selected sections' charts are rendered
+SECTION_CHARTS = {'categories': ('pie',), 'trends': ('trend',), 'forecast': ('forecast',),
+                  'health': ('gauge',)}
+
+# The one-page mobile preview: text only, compact layout; its health section
+# drops the components table and keeps the top recommendations
+PREVIEW_SECTIONS = ('cover', 'kpis', 'health')
+PREVIEW_RECOMMENDATIONS = 3
+
+# The analysis_data keys each section reads. Sections listed here are cached
+# by the hash of that slice (see section_cache); the appendix streams its
+# rows and is always rebuilt.
+SECTION_INPUTS = {
+    'cover':      ('user_name', 'period', 'sources'),
+    'insights':   ('key_insights',),
+    'kpis':       ('summary',),
+    'categories': ('categories',),
+    'trends':     ('trends',),
+    'recurring':  ('recurring',),
+    'anomalies':  ('anomalies',),
+    'savings':    ('savings_potential',),
+    'forecast':   ('forecast',),
+    'health':     ('health_score',),
+    'disclaimer': (),
+}
+# Bump when a section builder changes so cached sections are rebuilt
+SECTION_CACHE_VERSION = 1
+
+
+def select_sections(names=None):
+    """The (name, builder) pairs of SECTIONS to render, in report order."""
+    if names is None:
+        return SECTIONS
+    unknown = set(names) - set(SECTION_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown section(s): {', '.join(sorted(unknown))} "
+                         f"(expected some of {SECTION_NAMES})")
+    return tuple((name, build) for name, build in SECTIONS if name in names)
+
+
+def section_env(styles, width, backend, image_options, compact):
+    """Digest of everything besides the data that changes a section's flowables."""
+    style_attrs = [(name, vars(style)) for name, style in sorted(styles.byName.items())]
+    return SectionCache.key('env', [
+        SECTION_CACHE_VERSION, CHART_STYLE_VERSION, FONT_REGULAR, FONT_BOLD, style_attrs,
+        C, CHART_COLORS, width, compact, backend, image_options], None)
+
+
+def section_key(name, d, env):
+    """Cache key of one section: its input slice under the given section_env()."""
+    inputs = {k: d.get(k) for k in SECTION_INPUTS[name]}
+    if name == 'cover':
+        inputs['today'] = datetime.now().strftime('%d/%m/%Y')   # the "הופק בתאריך" line
+    return SectionCache.key(name, inputs, env)
 
-        story.append(Paragraph(
-            f'<font color="{clr}">{heb(level)}</font>', styles['HCenter']))
-
-        if health.get('components'):
-            header_row = [heb("ציון"), heb("מקסימום"), heb("תיאור"), heb("רכיב")]
-            rows = [header_row]
-            for comp in health['components']:
-                rows.append([
-                    str(comp['score']), str(comp['max']),
-                    heb(comp.get('description', '')[:30]), heb(comp['name'])])
-            story.append(Spacer(1, 3*mm))
-            story.append(styled_table(rows, col_widths=[20*mm, 25*mm, 55*mm, 40*mm]))
-
-        if health.get('recommendations'):
-            story.append(Spacer(1, 5*mm))
-            story.append(Paragraph(heb("המלצות מותאמות אישית:"), styles['HH2']))
-            for i, rec in enumerate(health['recommendations'], 1):
-                story.append(Paragraph(heb(f"{i}. {rec}"), styles['HBody']))
-
-    # ===== Disclaimer =====
-    story.append(Spacer(1, 10*mm))
-    story.append(Paragraph(
-        heb("הערה חשובה: דוח זה נוצר באופן אוטומטי ואינו מהווה ייעוץ פיננסי מקצועי. "
-            "לקבלת החלטות פיננסיות משמעותיות מומלץ להתייעץ עם יועץ פיננסי מוסמך."),
-        styles['HDisclaim']))
-    story.append(Paragraph(
-        heb("Powered by Open Finance | open-finance.ai"),
-        styles['HDisclaim']))
 
-    doc.build(story)
+# ============================================================
+# Main report generator
+# ============================================================
+def _build_document(d, output, transactions, chart_backend, chart_executor, image_options,
+                    span=null_span, sections=None, compact=False, section_cache=None):
+    with span('setup'):
+        setup_fonts()
+        styles = get_styles()
+
+    doc = SimpleDocTemplate(
+        output, pagesize=A4,
+        rightMargin=15*mm, leftMargin=15*mm,
+        topMargin=20*mm, bottomMargin=20*mm,
+        pageCompression=1,
+    )
+
+    selected = select_sections(sections)
+    cache = section_cache
+    keys, cached = {}, {}
+    if cache is not None and cache.enabled:
+        env = section_env(styles, doc.width, chart_backend or CHART_BACKEND, image_options,
+                          compact)
+        for name, _ in selected:
+            if name in SECTION_INPUTS:
+                keys[name] = section_key(name, d, env)
+                hit = cache.get(keys[name])
+                if hit is not None:
+                    cached[name] = hit
+    # Cached sections bring their charts along
+    kinds = {k for name, _ in selected if name not in cached
+             for k in SECTION_CHARTS.get(name, ())}
+    with span('charts.submit'):
+        charts = ChartStage(chart_specs(d, kinds), chart_backend, chart_executor,
+                            image_options, span)
+    ctx = ReportContext(styles, doc.width, charts, transactions, compact)
+
+    parts = []
+    for name, build in selected:
+        with span(f'section:{name}', cached=name in cached):
+            if name in cached:
+                parts.append((name, cached[name]))
+                continue
+            parts.append((name, [f for f in build(d, ctx) if f is not None
+                                 and not (compact and isinstance(f, PageBreak))]))
+
+    story = []
+    with span('charts.resolve'):
+        for name, flowables in parts:
+            if name not in cached:
+                flowables = charts.resolve(flowables)
+                if name in keys:
+                    cache.put(keys[name], flowables)
+                    flowables = copy_flowables(flowables)
+            story.extend(flowables)
+    while story and isinstance(story[-1], PageBreak):
+        story.pop()     # a trailing break would add a blank page
+
+    with span('doc.build'):
+        doc.build(story)
+
+
+def generate_report(analysis_data, output_path, transactions=None, chart_backend=None,
+                    chart_executor=None, image_options=None, max_bytes=None, tracer=None,
+                    sections=None, preview=False, section_cache=None):
+    """
+    Generate the full PDF report.
+
+    analysis_data: dict with keys:
+        user_name, period, sources, summary, categories, trends,
+        recurring, anomalies, savings_potential, forecast,
+        health_score, key_insights
+        and optionally transactions (see below)
+    output_path: file path or any writable binary file-like object
+    transactions: optional iterable of unified-schema transactions; when
+        given (or present as analysis_data['transactions']) a full listing
+        is appended. Any iterator works - rows are consumed page by page.
+    chart_backend: 'vector', 'matplotlib' or 'none' for text only
+        (default: CHART_BACKEND)
+    chart_executor: concurrent.futures executor for matplotlib charts
+        (default: a shared thread pool of CHART_WORKERS threads)
+    image_options: dpi / image_format / jpeg_quality / png_colors for
+        matplotlib chart images (see encode_chart_image)
+    max_bytes: size budget. The report is rendered in memory, stepping
+        down SIZE_LADDER (then the vector backend) until it fits; the
+        smallest attempt is written, with a warning if still over budget.
+        The chart executor, image options, size ladder and chart cache are
+        matplotlib-only: with the vector (default) or 'none' backend,
+        chart_executor / image_options warn and are ignored, and max_bytes
+        gets a single attempt.
+    tracer: optional report_trace.ReportTracer; records a span per setup
+        step, section, chart and doc.build (plus bidi and section cache
+        counters)
+    sections: names from SECTION_NAMES to render (default: all); only
+        their charts are drawn, and chart libraries are imported only
+        when a chart is actually drawn
+    preview: the one-page preview - PREVIEW_SECTIONS (unless `sections`
+        is given), no charts (unless `chart_backend` is given), no page breaks
+    section_cache: optional section_cache.SectionCache, for processes that
+        regenerate the same customers' reports (off by default - a one-off
+        report would only pay for hashing and holding its sections)
+
+    The report is built as a pipeline: chart jobs are started first, then
+    every section in SECTIONS builds its flowables, then finished charts
+    are slotted into the story and the document is laid out. Sections whose
+    SECTION_INPUTS slice is unchanged since an earlier report (same styles,
+    fonts, backend and layout) are taken from section_cache, charts included.
+    """
+    if preview:
+        sections = PREVIEW_SECTIONS if sections is None else sections
+        chart_backend = chart_backend or 'none'
+    if (chart_backend or CHART_BACKEND) != 'matplotlib':
+        ignored = [name for name, value in (('chart_executor', chart_executor),
+                                            ('image_options', image_options)) if value]
+        if ignored:
+            warnings.warn(f"{' and '.join(ignored)} only apply to matplotlib charts; ignored "
+                          f"with the {chart_backend or CHART_BACKEND!r} chart backend")
+            chart_executor = image_options = None
+    layout = {'sections': sections, 'compact': preview, 'section_cache': section_cache}
+    if tracer is None:
+        return _generate(analysis_data, output_path, transactions, chart_backend,
+                         chart_executor, image_options, max_bytes, null_span, layout)
+
+    started = tracer.start()
+    bidi_before = heb_cache_info()
+    sections_before = section_cache.stats() if section_cache is not None else None
+    try:
+        with tracer.span('report'):
+            return _generate(analysis_data, output_path, transactions, chart_backend,
+                             chart_executor, image_options, max_bytes, tracer.span, layout)
+    finally:
+        bidi = heb_cache_info()
+        tracer.meta['bidi'] = {'hits': bidi['hits'] - bidi_before['hits'],
+                               'misses': bidi['misses'] - bidi_before['misses'],
+                               'cache_size': bidi['size']}
+        if section_cache is not None:
+            cached = section_cache.stats()
+            tracer.meta['section_cache'] = {
+                'hits': cached['hits'] - sections_before['hits'],
+                'misses': cached['misses'] - sections_before['misses'],
+                'entries': cached['entries']}
+        if started:
+            tracer.stop()
+
+
+def _generate(d, output_path, transactions, chart_backend, chart_executor, image_options,
+              max_bytes, span, layout):
+    if not max_bytes:
+        _build_document(d, output_path, transactions, chart_backend, chart_executor,
+                        image_options, span, **layout)
+        return output_path
+
+    if transactions is None:
+        transactions = d.get('transactions')
+    if transactions is not None and not isinstance(transactions, (list, tuple)):
+        transactions = list(transactions)   # every attempt needs the rows again
+
+    backend = chart_backend or CHART_BACKEND
+    attempts = [(backend, image_options)]
+    if backend == 'matplotlib':
+        attempts += [('matplotlib', opts) for opts in SIZE_LADDER] + [('vector', None)]
+
+    best = None
+    for backend, opts in attempts:
+        buf = BytesIO()
+        with span('attempt', backend=backend, image_options=opts):
+            _build_document(d, buf, transactions, backend, chart_executor, opts, span, **layout)
+        if best is None or buf.tell() < best.tell():
+            best = buf
+        if best.tell() <= max_bytes:
+            break
+    else:
+        hint = '' if len(attempts) > 1 else f" (no size ladder for {backend!r} charts)"
+        warnings.warn(f"Report is {best.tell():,} bytes, over the {max_bytes:,} byte budget{hint}")
+
+    data = best.getvalue()
+    if hasattr(output_path, 'write'):
+        output_path.write(data)
+    else:
+        with open(output_path, 'wb') as f:
+            f.write(data)
     return output_path
 
 
 if __name__ == '__main__':
     import sys
-    if len(sys.argv) < 3:
-        print("Usage: python generate_report.py <analysis_data.json> <output.pdf>")
-        sys.exit(1)
-    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate the Hebrew PDF report.')
+    parser.add_argument('analysis_data', help='analysis_data.json')
+    parser.add_argument('output', help="output PDF path, or '-' for stdout")
+    parser.add_argument('--charts', choices=CHART_BACKENDS,
+                        help=f"chart backend (default: {CHART_BACKEND}; 'none' with --preview)")
+    parser.add_argument('--sections', type=lambda v: [s for s in v.split(',') if s],
+                        help=f"comma-separated sections to render, from: {','.join(SECTION_NAMES)}")
+    parser.add_argument('--preview', action='store_true',
+                        help=f"one-page text-only preview ({','.join(PREVIEW_SECTIONS)})")
+    size = parser.add_argument_group('output size (image options need --charts matplotlib)')
+    size.add_argument('--dpi', type=int, help=f'chart image resolution (default: {CHART_DPI})')
+    size.add_argument('--image-format', choices=IMAGE_FORMATS, help='default: png')
+    size.add_argument('--jpeg-quality', type=int, help='default: 85')
+    size.add_argument('--png-colors', type=int, help='quantise PNG charts to N colours')
+    size.add_argument('--max-bytes', type=int,
+                      help='size budget; with matplotlib charts, steps down quality to fit')
+    prof = parser.add_argument_group('profiling')
+    prof.add_argument('--profile', metavar='TRACE_JSON',
+                      help='write per-section / chart / doc.build timings and allocations')
+    prof.add_argument('--cprofile', metavar='PSTATS',
+                      help='also run under cProfile and dump pstats to this file')
+    args = parser.parse_args()
+    if args.sections:
+        try:
+            select_sections(args.sections)
+        except ValueError as e:
+            parser.error(str(e))
+    with open(args.analysis_data, 'r', encoding='utf-8') as f:
         data = json.load(f)
-    print(f"Report generated: {generate_report(data, sys.argv[2])}")
+
+    image_options = {k: v for k, v in (('dpi', args.dpi), ('image_format', args.image_format),
+                                       ('jpeg_quality', args.jpeg_quality),
+                                       ('png_colors', args.png_colors)) if v is not None}
+    to_stdout = args.output == '-'
+    out = sys.stdout.buffer if to_stdout else args.output
+    tracer = None
+    if args.profile:
+        from report_trace import ReportTracer
+        tracer = ReportTracer(allocations=True)
+    profiler = None
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    generate_report(data, out, chart_backend=args.charts, image_options=image_options,
+                    max_bytes=args.max_bytes, tracer=tracer, sections=args.sections,
+                    preview=args.preview)
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+    if tracer is not None:
+        tracer.save(args.profile)
+    if to_stdout:
+        sys.stdout.buffer.flush()
+    else:
+        print(f"Report generated: {args.output}")
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+ציון בריאות פיננסית - מודול 8 ב-references/analysis-guide.md, מחושב במקביל לחשבונות רבים.
+
+שימוש:
+  python health_score.py metrics.ndjson > scores.ndjson
+  python health_score.py --analysis analysis.json > health_score.json
+  python health_score.py --bench 1000000
+
+Each Module 8 component is scored linearly between the guide's "0" and
+"full" thresholds (COMPONENTS), on whole columns of per-account metrics:
+
+  savings_rate        (income - expenses) / income
+  income_cv           std / mean of monthly income
+  balance_trend       monthly balance slope / mean monthly income
+  top_category_share  largest expense category / all expenses
+  high_anomalies      number of 'high' anomalies
+  recurring_ratio     recurring payments / monthly income
+  fee_ratio           bank fees / income
+
+A missing metric (absent key or NaN) drops its component, and the total is
+rescaled over the components that were scored. The three components that
+lost the most points pick the recommendations. health_scores() then emits
+the `health_score` dicts generate_report expects, one account at a time.
+"""
+
+import sys
+import json
+
+import numpy as np
+
+
+# (metric, component name, max points, value for full points, value for 0 points)
+COMPONENTS = (
+    ('savings_rate',       'יחס חיסכון',    25, 0.20, 0.0),
+    ('income_cv',          'יציבות הכנסה',  15, 0.10, 0.50),
+    ('balance_trend',      'מגמת יתרה',     15, 0.05, -0.05),
+    ('top_category_share', 'פיזור הוצאות',  15, 0.35, 0.60),
+    ('high_anomalies',     'הוצאות חריגות', 10, 1,    5),
+    ('recurring_ratio',    'עלות מנויים',   10, 0.05, 0.15),
+    ('fee_ratio',          'עמלות ובנקינג', 10, 0.005, 0.02),
+)
+METRICS = tuple(c[0] for c in COMPONENTS)
+N_RECOMMENDATIONS = 3
+
+FEE_KEYWORDS = ('עמלה', 'עמלת', 'דמי ניהול', 'ריבית חובה')
+
+
+def _describe_savings(v):
+    return f"חוסך {v:.0%} מההכנסה" if v >= 0 else f"גירעון של {-v:.0%} מההכנסה"
+
+
+def _describe_trend(v):
+    if v > 0.01:
+        return "יתרה עולה"
+    return "יתרה יורדת" if v < -0.01 else "יתרה יציבה"
+
+
+DESCRIPTIONS = {
+    'savings_rate': _describe_savings,
+    'income_cv': lambda v: f"סטיית תקן {v:.0%} בהכנסה",
+    'balance_trend': _describe_trend,
+    'top_category_share': lambda v: f"הקטגוריה הגדולה: {v:.0%} מההוצאות",
+    'high_anomalies': lambda v: f"{v:.0f} חריגות גבוהות",
+    'recurring_ratio': lambda v: f"מנויים: {v:.1%} מההכנסה",
+    'fee_ratio': lambda v: f"עמלות: {v:.1%} מההכנסה",
+}
+
+RECOMMENDATIONS = {
+    'savings_rate': "להגדיל את ההפקדה החודשית לחיסכון",
+    'income_cv': "לבנות כרית ביטחון לחודשים עם הכנסה נמוכה",
+    'balance_trend': "לעצור את שחיקת היתרה - לבדוק את ההוצאות הקבועות",
+    'top_category_share': "לבחון את ההוצאה בקטגוריה הגדולה ביותר",
+    'high_anomalies': "לבדוק את ההוצאות החריגות שזוהו",
+    'recurring_ratio': "לבטל מנויים והוראות קבע שאינם בשימוש",
+    'fee_ratio': "לנהל מו\"מ על עמלות הבנק או לעבור למסלול זול יותר",
+}
+
+
+# ============================================================
+# Scoring
+# ============================================================
+def _column(metrics, key, n):
+    values = metrics.get(key)
+    col = np.full(n, np.nan) if values is None else \
+        np.broadcast_to(np.asarray(values, dtype=float), (n,))
+    if key == 'savings_rate' and metrics.get('expense_ratio') is not None:
+        # summary.expense_ratio is a percentage of income
+        ratio = np.broadcast_to(np.asarray(metrics['expense_ratio'], dtype=float), (n,))
+        col = np.where(np.isnan(col), 1 - ratio / 100, col)
+    return col
+
+
+def score_batch(metrics):
+    """
+    Score many accounts at once.
+
+    metrics: {metric: array (accounts,)} - see METRICS; `expense_ratio` (%)
+        stands in for a missing savings_rate
+    Returns {'values' (accounts, C) metric values, 'scores' (accounts, C)
+    points with NaN where unscored, 'total' (accounts,) int 0-100,
+    'recommend' (accounts, N_RECOMMENDATIONS) component indices, -1 = none}.
+    """
+    n = max((np.size(v) for v in metrics.values() if v is not None), default=0)
+    values = np.column_stack([_column(metrics, key, n) for key in METRICS]) if n else \
+        np.empty((0, len(METRICS)))
+    full = np.array([c[3] for c in COMPONENTS], dtype=float)
+    zero = np.array([c[4] for c in COMPONENTS], dtype=float)
+    maxes = np.array([c[2] for c in COMPONENTS], dtype=float)
+
+    # Linear between the thresholds; works whichever side "good" is on
+    frac = np.clip((values - zero) / (full - zero), 0, 1)
+    scores = np.rint(frac * maxes)                     # NaN stays NaN
+    scored = ~np.isnan(scores)
+    possible = (scored * maxes).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total = np.nan_to_num(np.nansum(scores, axis=1) / possible * 100)
+    total = np.rint(total).astype(np.int64)
+
+    lost = np.where(scored, maxes - np.nan_to_num(scores), 0)
+    k = min(N_RECOMMENDATIONS, len(METRICS))
+    top = np.argsort(-lost, axis=1, kind='stable')[:, :k]
+    recommend = np.where(np.take_along_axis(lost, top, axis=1) > 0, top, -1)
+    return {'values': values, 'scores': scores, 'total': total, 'recommend': recommend}
+
+
+def health_scores(result, descriptions=True):
+    """Yield one `health_score` dict per account from score_batch() output."""
+    values, scores = result['values'].tolist(), result['scores'].tolist()
+    for row in range(len(values)):
+        components = []
+        for c, (key, name, mx, _, _) in enumerate(COMPONENTS):
+            s = scores[row][c]
+            if s != s:          # NaN: not scored
+                continue
+            comp = {'name': name, 'score': int(s), 'max': mx}
+            if descriptions:
+                comp['description'] = DESCRIPTIONS[key](values[row][c])
+            components.append(comp)
+        yield {
+            'total': int(result['total'][row]),
+            'components': components,
+            'recommendations': [RECOMMENDATIONS[METRICS[c]]
+                                for c in result['recommend'][row] if c >= 0],
+        }
+
+
+def stack_metrics(rows):
+    """[{metric: value}] -> {metric: array} for score_batch (missing values become NaN)."""
+    return {key: np.array([np.nan if r.get(key) is None else r[key] for r in rows], dtype=float)
+            for key in (*METRICS, 'expense_ratio')}
+
+
+# --- One account from analysis_data ---
+def metrics_from_analysis(d):
+    """Module 8 metrics from an analysis_data dict (plus `transactions` for fees)."""
+    summary = d.get('summary', {})
+    trends = d.get('trends', {})
+    incomes = np.asarray(trends.get('incomes') or [], dtype=float)
+    income = summary.get('total_income') or incomes.sum()
+    expenses = summary.get('total_expenses')
+    monthly_income = incomes.mean() if len(incomes) else np.nan
+    m = {}
+    if income and expenses is not None:
+        m['savings_rate'] = (income - expenses) / income
+    if len(incomes) >= 2 and monthly_income:
+        m['income_cv'] = incomes.std(ddof=1) / monthly_income
+    balances = d.get('forecast', {}).get('balances_actual') or \
+        np.cumsum(trends.get('savings') or [])
+    if len(balances) >= 2 and monthly_income:
+        m['balance_trend'] = np.polyfit(np.arange(len(balances)), balances, 1)[0] / monthly_income
+    amounts = d.get('categories', {}).get('amounts') or []
+    if sum(amounts):
+        m['top_category_share'] = max(amounts) / sum(amounts)
+    if 'anomalies' in d:
+        m['high_anomalies'] = sum(1 for a in d['anomalies'] if a.get('severity') == 'high')
+    recurring = d.get('recurring')
+    if recurring is not None and monthly_income:
+        m['recurring_ratio'] = sum(r.get('monthly', 0) for r in recurring) / monthly_income
+    txs = d.get('transactions')
+    if isinstance(txs, list) and income:
+        fees = sum(-tx['amount'] for tx in txs if (tx.get('amount') or 0) < 0
+                   and any(k in (tx.get('description') or '') for k in FEE_KEYWORDS))
+        m['fee_ratio'] = fees / income
+    return m
+
+
+def score_analysis(d):
+    """The `health_score` block for one analysis_data dict."""
+    return next(health_scores(score_batch(stack_metrics([metrics_from_analysis(d)]))))
+
+
+def benchmark(n=1_000_000):
+    import time
+    rng = np.random.default_rng(1)
+    metrics = {
+        'savings_rate': rng.normal(0.08, 0.12, n),
+        'income_cv': rng.gamma(2, 0.08, n),
+        'balance_trend': rng.normal(0, 0.05, n),
+        'top_category_share': rng.uniform(0.2, 0.7, n),
+        'high_anomalies': rng.poisson(1.5, n).astype(float),
+        'recurring_ratio': rng.gamma(2, 0.04, n),
+        'fee_ratio': np.where(rng.random(n) < 0.2, np.nan, rng.gamma(2, 0.004, n)),
+    }
+    t = time.perf_counter()
+    res = score_batch(metrics)
+    score_s = time.perf_counter() - t
+    t = time.perf_counter()
+    count = sum(1 for _ in health_scores(res))
+    dicts_s = time.perf_counter() - t
+    return {'accounts': n, 'score_seconds': round(score_s, 3),
+            'dicts_seconds': round(dicts_s, 3), 'dicts': count,
+            'mean_total': round(float(res['total'].mean()), 1)}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    if len(sys.argv) >= 2 and sys.argv[1] == '--bench':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+        print(json.dumps(benchmark(n), indent=2))
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description='Batch financial health score (Module 8).')
+    parser.add_argument('metrics', nargs='?',
+                        help='NDJSON of per-account metrics ({"id": ..., "savings_rate": ...})')
+    parser.add_argument('--analysis', help='score one analysis_data JSON instead')
+    args = parser.parse_args()
+
+    if args.analysis:
+        with open(args.analysis, 'r', encoding='utf-8') as f:
+            json.dump(score_analysis(json.load(f)), sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+    elif args.metrics:
+        with open(args.metrics, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        scores = health_scores(score_batch(stack_metrics(rows)))
+        for row, health in zip(rows, scores):
+            sys.stdout.write(json.dumps({'id': row.get('id'), 'health_score': health},
+                                        ensure_ascii=False) + '\n')
+    else:
+        parser.error('give a metrics NDJSON file or --analysis')
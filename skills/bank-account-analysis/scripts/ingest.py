@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+קליטת דפי חשבון - זיהוי אוטומטי של הבנק / חברת האשראי לפי שורות הכותרת,
+וקריאה זורמת (streaming) של קבצי CSV/XLSX אל המבנה האחיד של הטרנזקציות.
+
+שימוש:
+  python ingest.py <statement.csv|xlsx> [...] > transactions.ndjson
+  python ingest.py --rates rates.csv <statement.xlsx> [...] > transactions.ndjson
+
+Every transaction follows the unified schema from SKILL.md:
+  {date, description, amount, balance, category, source, type}
+plus, when the source provides them: charge_date, installment, currency,
+original_amount. Pass fx_rates (an fx.RateTable) to iter_chunks to convert
+foreign-currency rows to ₪ while streaming - see fx.py.
+
+Only the first rows are read for detection; the rest of the file is streamed
+in chunks, so multi-year exports are parsed in bounded memory and rows are
+emitted as soon as their chunk is normalised.
+"""
+
+import os
+import csv
+import codecs
+import sys
+import json
+from datetime import datetime, date
+from itertools import chain, islice
+
+import numpy as np
+
+import fx
+
+
+# --- Known formats (see references/bank-formats.md) ---
+# signature: columns that identify the format, all must appear in the header row
+# Each field lists candidate column names, first match wins.
+FORMATS = {
+    'leumi': {
+        'name': 'בנק לאומי', 'type': 'bank',
+        'signature': ['תיאור הפעולה', 'יתרה לאחר פעולה'],
+        'date': ['תאריך'], 'description': ['תיאור הפעולה'],
+        'debit': ['חובה'], 'credit': ['זכות'], 'balance': ['יתרה לאחר פעולה'],
+    },
+    'discount': {
+        'name': 'בנק דיסקונט', 'type': 'bank',
+        'signature': ['תאריך פעולה', 'פרטים'],
+        'date': ['תאריך פעולה'], 'description': ['פרטים'],
+        'debit': ['חובה'], 'credit': ['זכות'], 'balance': ['יתרה'],
+    },
+    'fibi': {
+        'name': 'הבנק הבינלאומי', 'type': 'bank',
+        'signature': ['פרטי הפעולה'],
+        'date': ['תאריך'], 'description': ['פרטי הפעולה'],
+        'debit': ['חובה'], 'credit': ['זכות'], 'balance': ['יתרה'],
+    },
+    'poalim': {
+        'name': 'בנק הפועלים', 'type': 'bank',
+        'signature': ['תאריך', 'תיאור', 'אסמכתא'],
+        'date': ['תאריך'], 'description': ['תיאור'],
+        'debit': ['חובה', 'סכום חיוב'], 'credit': ['זכות', 'סכום זיכוי'], 'balance': ['יתרה'],
+    },
+    'mizrahi': {
+        'name': 'בנק מזרחי טפחות', 'type': 'bank',
+        'signature': ['תאריך', 'תיאור', 'סכום', 'יתרה'],
+        'date': ['תאריך'], 'description': ['תיאור'],
+        'amount': ['סכום'], 'balance': ['יתרה'],
+    },
+    'max': {
+        'name': 'מקס', 'type': 'credit',
+        'signature': ['תאריך עסקה', 'תאריך חיוב', 'שם בית עסק'],
+        'date': ['תאריך עסקה'], 'description': ['שם בית עסק'],
+        'charge': ['סכום חיוב'], 'charge_date': ['תאריך חיוב'],
+        'original_amount': ['סכום מקורי', 'סכום עסקה מקורי'],
+        'currency': ['מטבע מקורי', 'מטבע עסקה מקורי'],
+    },
+    'cal': {
+        'name': 'ויזה כאל', 'type': 'credit',
+        'signature': ['תאריך עסקה', 'שם בית העסק'],
+        'date': ['תאריך עסקה'], 'description': ['שם בית העסק'],
+        'charge': ['סכום חיוב'], 'category': ['קטגוריה'],
+        'original_amount': ['סכום עסקה'], 'currency': ['מטבע'],
+    },
+    'isracard': {
+        'name': 'ישראכארט', 'type': 'credit',
+        'signature': ['תאריך', 'שם בית עסק', 'סכום חיוב'],
+        'date': ['תאריך'], 'description': ['שם בית עסק'],
+        'charge': ['סכום חיוב'], 'installment': ['מספר תשלום מתוך'],
+        'original_amount': ['סכום'], 'currency': ['מטבע'],
+    },
+}
+
+# Generic keyword detection for unknown layouts (substring match on the header)
+GENERIC_KEYWORDS = {
+    'date':        ['תאריך', 'date'],
+    'description': ['תיאור', 'פרטים', 'שם בית', 'description'],
+    'debit':       ['חובה', 'חיוב', 'debit'],
+    'credit':      ['זכות', 'זיכוי', 'credit'],
+    'amount':      ['סכום', 'amount'],
+    'balance':     ['יתרה', 'balance'],
+}
+
+DATE_FORMATS = ['%d/%m/%Y', '%d/%m/%y', '%d-%m-%Y', '%d-%m-%y', '%d.%m.%Y', '%d.%m.%y',
+                '%Y-%m-%d', '%Y-%m-%d %H:%M:%S']
+
+SAMPLE_ROWS = 30
+CHUNK_SIZE = 5000
+
+
+class UnknownFormatError(ValueError):
+    """Raised when no header row matching a known or generic layout is found."""
+
+
+# --- Raw row readers ---
+def _sniff_encoding(path):
+    with open(path, 'rb') as f:
+        head = f.read(64 * 1024)
+    for enc in ('utf-8-sig', 'cp1255'):
+        try:
+            # final=False: the sample may end in the middle of a character
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def _iter_csv(path):
+    enc = _sniff_encoding(path)
+    with open(path, 'r', encoding=enc, newline='') as f:
+        sample = f.read(16 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _iter_xlsx(path, sheet=None):
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.active
+        for row in ws.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+
+def iter_raw_rows(path, sheet=None):
+    """Yield raw cell lists from a CSV or XLSX file without loading it whole."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        return _iter_xlsx(path, sheet)
+    if ext == '.xls':
+        raise ValueError(f"{path}: legacy .xls is not supported, save it as .xlsx or .csv")
+    return _iter_csv(path)
+
+
+# --- Detection ---
+def _norm_header(cell):
+    return ' '.join(str(cell).split()) if cell is not None else ''
+
+
+def _find_column(header, names):
+    for name in names:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+def _generic_columns(header):
+    cols = {}
+    for field, keywords in GENERIC_KEYWORDS.items():
+        for i, h in enumerate(header):
+            low = h.lower()
+            if i not in cols.values() and any(k in low for k in keywords):
+                cols[field] = i
+                break
+    if 'date' not in cols or 'description' not in cols:
+        return None
+    if not ('amount' in cols or 'debit' in cols or 'credit' in cols):
+        return None
+    # A combined "amount" column is only used when there is no debit/credit pair
+    if 'debit' in cols or 'credit' in cols:
+        cols.pop('amount', None)
+    return cols
+
+
+def _match_header(header):
+    """Return (format_key, columns) for a header row, or None."""
+    present = set(header)
+    best = None
+    for key, spec in FORMATS.items():
+        if not all(col in present for col in spec['signature']):
+            continue
+        cols = {}
+        for field, names in spec.items():
+            if isinstance(names, list) and field != 'signature':
+                idx = _find_column(header, names)
+                if idx is not None:
+                    cols[field] = idx
+        # Prefer the most specific signature when several match
+        score = len(spec['signature'])
+        if best is None or score > best[0]:
+            best = (score, key, cols)
+    if best:
+        return best[1], best[2]
+    cols = _generic_columns(header)
+    return ('generic', cols) if cols else None
+
+
+def detect_format(rows, sample_rows=SAMPLE_ROWS):
+    """
+    Find the header row among the first sample_rows rows.
+
+    Returns (fmt, header_index, columns) where fmt is a FORMATS key or
+    'generic' and columns maps unified field names to column positions.
+    """
+    for i, row in enumerate(islice(rows, sample_rows)):
+        header = [_norm_header(c) for c in row]
+        match = _match_header(header)
+        if match:
+            return match[0], i, match[1]
+    raise UnknownFormatError('no recognisable header row in the first '
+                             f'{sample_rows} rows - please specify the bank')
+
+
+# --- Vectorised cleanup ---
+def clean_amounts(values):
+    """Convert a column of Israeli-formatted amounts to a float array.
+
+    Strips ₪, thousands separators and spaces, treats (123) as negative and
+    blanks / '-' as 0.
+    """
+    arr = np.array(['' if v is None else str(v) for v in values], dtype=str)
+    for junk in ('₪', ',', ' ', '‏', '‎', '\xa0'):
+        arr = np.char.replace(arr, junk, '')
+    neg = np.char.startswith(arr, '(') & np.char.endswith(arr, ')')
+    arr = np.char.strip(arr, '()')
+    # Trailing minus ("123-") appears in some exports
+    trailing = np.char.endswith(arr, '-') & (np.char.str_len(arr) > 1)
+    arr = np.where(trailing, np.char.add('-', np.char.rstrip(arr, '-')), arr)
+    arr = np.where((arr == '') | (arr == '-'), '0', arr)
+    out = np.empty(len(arr), dtype=float)
+    try:
+        out[:] = arr.astype(float)
+    except ValueError:
+        for i, s in enumerate(arr):
+            try:
+                out[i] = float(s)
+            except ValueError:
+                out[i] = np.nan
+    out[neg] = -np.abs(out[neg])
+    return out
+
+
+def _parse_date(s):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_dates(values):
+    """Normalise a column of dates to 'YYYY-MM-DD' (None when unparseable).
+
+    Statements repeat the same few dates over and over, so each distinct
+    value is parsed once and the results are broadcast back.
+    """
+    keys = np.array(['' if v is None else (v.isoformat() if isinstance(v, (datetime, date))
+                                           else str(v).strip()) for v in values], dtype=str)
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    parsed = np.array([_parse_date(u[:19].replace('T', ' ')) if u else None for u in uniq],
+                      dtype=object)
+    return parsed[inverse].tolist()
+
+
+# --- Chunk normalisation ---
+def _column(rows, idx):
+    if idx is None:
+        return None
+    return [r[idx] if idx < len(r) else None for r in rows]
+
+
+def _normalize_chunk(rows, fmt, cols, source, kind, fx_rates=None):
+    dates = normalize_dates(_column(rows, cols['date']))
+    descs = _column(rows, cols['description'])
+
+    if 'charge' in cols:
+        amounts = -clean_amounts(_column(rows, cols['charge']))
+    elif 'amount' in cols:
+        amounts = clean_amounts(_column(rows, cols['amount']))
+    else:
+        credit = _column(rows, cols.get('credit'))
+        debit = _column(rows, cols.get('debit'))
+        amounts = np.zeros(len(rows))
+        if credit is not None:
+            amounts += np.abs(clean_amounts(credit))
+        if debit is not None:
+            amounts -= np.abs(clean_amounts(debit))
+
+    balances = _column(rows, cols.get('balance'))
+    if balances is not None:
+        has_balance = [b not in (None, '') for b in balances]
+        balances = clean_amounts(balances)
+    hints = _column(rows, cols.get('category'))
+    extras = {}
+    if 'charge_date' in cols:
+        extras['charge_date'] = normalize_dates(_column(rows, cols['charge_date']))
+    if 'original_amount' in cols:
+        raw = _column(rows, cols['original_amount'])
+        extras['original_amount'] = [a if r not in (None, '') else None
+                                     for r, a in zip(raw, clean_amounts(raw).tolist())]
+    for field in ('currency', 'installment'):
+        if field in cols:
+            extras[field] = [(_norm_header(v) or None) for v in _column(rows, cols[field])]
+
+    out = []
+    for i, d in enumerate(dates):
+        desc = _norm_header(descs[i])
+        # Summary rows ("סה\"כ") and blank lines have no valid date
+        if d is None or not desc or np.isnan(amounts[i]):
+            continue
+        tx = {
+            'date': d,
+            'description': desc,
+            'amount': float(amounts[i]),
+            'balance': (float(balances[i]) if balances is not None and has_balance[i]
+                        and not np.isnan(balances[i]) else None),
+            'category': (_norm_header(hints[i]) or None) if hints is not None else None,
+            'source': source,
+            'type': kind,
+        }
+        for field, col in extras.items():
+            tx[field] = col[i]
+        out.append(tx)
+    if fx_rates is not None:
+        # Foreign rows not billed yet have a blank (0) ₪ charge - fx fills it
+        fx.normalize_chunk(out, fx_rates)
+    return out
+
+
+# ============================================================
+# Public API
+# ============================================================
+def iter_chunks(path, chunk_size=CHUNK_SIZE, source=None, kind=None, sheet=None,
+                fx_rates=None):
+    """
+    Stream a statement file as lists of unified transactions.
+
+    source / kind override the detected source name and 'bank' / 'credit'
+    type (needed for 'generic' layouts). fx_rates (fx.RateTable) runs the FX
+    stage on each chunk. Yields one list per chunk_size rows.
+    """
+    rows = iter_raw_rows(path, sheet)
+    head = list(islice(rows, SAMPLE_ROWS))
+    fmt, header_idx, cols = detect_format(head)
+    spec = FORMATS.get(fmt, {})
+    source = source or spec.get('name') or os.path.splitext(os.path.basename(path))[0]
+    kind = kind or spec.get('type', 'bank')
+
+    body = chain(head[header_idx + 1:], rows)
+    while True:
+        chunk = list(islice(body, chunk_size))
+        if not chunk:
+            break
+        chunk = [r for r in chunk if r and any(c not in (None, '') for c in r)]
+        if chunk:
+            yield _normalize_chunk(chunk, fmt, cols, source, kind, fx_rates)
+
+
+def iter_transactions(path, **kw):
+    """Yield unified transactions one by one (see iter_chunks for options)."""
+    for chunk in iter_chunks(path, **kw):
+        yield from chunk
+
+
+def sniff(path, sheet=None):
+    """Detect a file's format from its first rows: {'format', 'source', 'type', 'header_row'}."""
+    fmt, header_idx, _ = detect_format(iter_raw_rows(path, sheet))
+    spec = FORMATS.get(fmt, {})
+    return {'format': fmt, 'source': spec.get('name'), 'type': spec.get('type'),
+            'header_row': header_idx}
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    fx_rates = None
+    if args[:1] == ['--rates'] and len(args) > 1:
+        fx_rates = fx.RateTable.load(args[1])
+        args = args[2:]
+    if not args:
+        print("Usage: python ingest.py [--rates rates.csv] <statement.csv|xlsx> [...] > transactions.ndjson")
+        sys.exit(1)
+    out = sys.stdout
+    for path in args:
+        try:
+            for chunk in iter_chunks(path, fx_rates=fx_rates):
+                out.write(''.join(json.dumps(tx, ensure_ascii=False) + '\n' for tx in chunk))
+        except UnknownFormatError as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            sys.exit(2)
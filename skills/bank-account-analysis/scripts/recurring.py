@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+זיהוי הוראות קבע ומנויים - מודול 4 ב-references/analysis-guide.md.
+
+שימוש:
+  python recurring.py transactions.ndjson > recurring.json
+
+The algorithm follows the guide - group descriptions by fuzzy match (80%),
+keep groups with 2+ occurrences, check interval regularity (±5 days for
+monthly, tighter for weekly, ~10% for longer periods) and amount spread
+(±10%) - without comparing every description to every other:
+
+  1. descriptions collapse to normalised merchant names (merchant_key)
+  2. names are blocked by MinHash over character 3-grams (LSH bands), so
+     only names sharing a bucket are compared with difflib
+  3. each resulting group is checked with NumPy over its sorted date array
+
+The output matches the `recurring` list consumed by generate_report:
+  [{name, monthly, yearly, type, frequency, count}, ...]
+"""
+
+import sys
+import json
+import zlib
+from difflib import SequenceMatcher
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from categorize import normalize
+
+
+DAYS_PER_MONTH = 30.44
+
+# Known billing periods in days -> (label, interval tolerance in days), tried
+# in order. None means max(day_tolerance, 10% of the period); the weekly
+# tolerance is fixed, a ±5 day window would accept any 2-12 day gap
+PERIODS = [
+    (7,                    'שבועי',    1.5),
+    (DAYS_PER_MONTH,       'חודשי',    None),
+    (DAYS_PER_MONTH * 2,   'דו-חודשי', None),
+    (DAYS_PER_MONTH * 3,   'רבעוני',   None),
+    (DAYS_PER_MONTH * 12,  'שנתי',     None),
+]
+# Periods shorter than a month are only reported with a fixed amount and at
+# least this many payments - frequent shopping at one merchant is not a charge
+SHORT_PERIOD_MIN_COUNT = 4
+
+# Tokens that do not identify the merchant ("נטפליקס בע"מ" == "netflix.com" minus suffix)
+_SUFFIXES = {'בע"מ', 'בעמ', 'ltd', 'inc', 'com', 'co', 'il', 'www'}
+
+TYPE_STANDING_ORDER = 'הוראת קבע'
+TYPE_SUBSCRIPTION = 'מנוי'
+TYPE_RECURRING = 'תשלום חוזר'
+
+# MinHash / LSH parameters: 12 bands x 2 rows catches pairs with 3-gram
+# Jaccard similarity well below what an 80% SequenceMatcher ratio implies
+NUM_HASHES = 24
+BAND_ROWS = 2
+# A bucket this crowded only shares boilerplate n-grams; true variants of a
+# merchant still meet in one of the other bands
+MAX_BUCKET = 500
+_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(0x5EED)
+_HASH_A = _rng.integers(1, 1 << 31, size=NUM_HASHES, dtype=np.uint64)
+_HASH_B = _rng.integers(0, 1 << 31, size=NUM_HASHES, dtype=np.uint64)
+
+
+def merchant_key(description):
+    """Normalised merchant name used for grouping."""
+    return ' '.join(t for t in normalize(description).split() if t not in _SUFFIXES)
+
+
+# --- Blocking index ---
+def _shingles(name, k=3):
+    s = f' {name} '
+    if len(s) <= k:
+        return {s}
+    return {s[i:i + k] for i in range(len(s) - k + 1)}
+
+
+def _minhash(name):
+    h = np.fromiter((zlib.crc32(g.encode('utf-8')) for g in _shingles(name)), dtype=np.uint64)
+    # (a*h + b) mod p for every hash function at once; values stay below 2^63
+    return ((np.outer(_HASH_A, h) + _HASH_B[:, None]) % np.uint64(_PRIME)).min(axis=1)
+
+
+def candidate_pairs(names):
+    """Index pairs (i, j) of names sharing at least one LSH bucket."""
+    buckets = defaultdict(list)
+    for i, name in enumerate(names):
+        sig = _minhash(name)
+        for band in range(0, NUM_HASHES, BAND_ROWS):
+            buckets[(band, sig[band:band + BAND_ROWS].tobytes())].append(i)
+    pairs = set()
+    for members in buckets.values():
+        if 1 < len(members) <= MAX_BUCKET:
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+
+def group_names(names, threshold=0.8):
+    """Cluster names whose fuzzy ratio >= threshold; returns a group id per name."""
+    parent = list(range(len(names)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in candidate_pairs(names):
+        ri, rj = find(i), find(j)
+        if ri != rj and SequenceMatcher(None, names[i], names[j]).ratio() >= threshold:
+            parent[rj] = ri
+    return [find(i) for i in range(len(names))]
+
+
+# --- Regularity checks ---
+def _check_group(days, amounts, day_tolerance, amount_tolerance):
+    """Return (period_days, label, fixed_amount) or None for one sorted group."""
+    intervals = np.diff(days)
+    intervals = intervals[intervals > 0]   # same-day duplicates are one payment
+    if len(intervals) == 0:
+        return None
+    median = float(np.median(intervals))
+    for period, label, tol in PERIODS:
+        if tol is None:
+            tol = max(day_tolerance, period * 0.10)
+        if abs(median - period) <= tol and np.all(np.abs(intervals - median) <= tol):
+            break
+    else:
+        return None
+    mean = float(np.mean(amounts))
+    fixed = mean > 0 and float(np.std(amounts)) <= amount_tolerance * mean
+    if period < DAYS_PER_MONTH and not (fixed and len(days) >= SHORT_PERIOD_MIN_COUNT):
+        return None
+    return period, label, fixed
+
+
+# ============================================================
+# Public API
+# ============================================================
+def find_recurring(transactions, threshold=0.8, day_tolerance=5, amount_tolerance=0.10,
+                   min_count=2):
+    """
+    Detect recurring payments among unified-schema transactions.
+
+    Only expenses (amount < 0) are considered. Returns the `recurring` list
+    for generate_report, sorted by yearly cost.
+    """
+    by_name = defaultdict(lambda: ([], [], [], Counter()))
+    for tx in transactions:
+        if (tx.get('amount') or 0) >= 0 or not tx.get('date'):
+            continue
+        key = merchant_key(tx.get('description'))
+        if not key:
+            continue
+        dates, amounts, kinds, labels = by_name[key]
+        dates.append(tx['date'])
+        amounts.append(-tx['amount'])
+        kinds.append(tx.get('type', 'bank'))
+        labels[tx['description']] += 1
+
+    names = list(by_name)
+    groups = defaultdict(list)
+    for name, gid in zip(names, group_names(names, threshold)):
+        groups[gid].append(name)
+
+    out = []
+    for members in groups.values():
+        dates, amounts, kinds, labels = [], [], [], Counter()
+        for m in members:
+            d, a, k, lbl = by_name[m]
+            dates += d
+            amounts += a
+            kinds += k
+            labels.update(lbl)
+        if len(dates) < min_count:
+            continue
+
+        days = np.array(dates, dtype='datetime64[D]').astype(np.int64)
+        amts = np.array(amounts, dtype=float)
+        order = np.argsort(days, kind='stable')
+        days, amts = days[order], amts[order]
+
+        res = _check_group(days, amts, day_tolerance, amount_tolerance)
+        if res is None:
+            continue
+        period, label, fixed = res
+        monthly = float(np.mean(amts)) * DAYS_PER_MONTH / period
+        if not fixed:
+            kind = TYPE_RECURRING
+        elif Counter(kinds).most_common(1)[0][0] == 'credit':
+            kind = TYPE_SUBSCRIPTION
+        else:
+            kind = TYPE_STANDING_ORDER
+        out.append({
+            'name': labels.most_common(1)[0][0],
+            'monthly': round(monthly, 2),
+            'yearly': round(monthly * 12, 2),
+            'type': kind,
+            'frequency': label,
+            'count': len(dates),
+        })
+
+    out.sort(key=lambda r: r['yearly'], reverse=True)
+    return out
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python recurring.py <transactions.ndjson> > recurring.json")
+        sys.exit(1)
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        txs = [json.loads(line) for line in f if line.strip()]
+    json.dump(find_recurring(txs), sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+שרת דוחות חם - תהליך ארוך-חיים שמחזיק את reportlab, matplotlib והפונטים טעונים,
+כך שכל דוח נוסף לא משלם שוב על זמן האתחול.
+
+שימוש:
+  python report_daemon.py --stdio                      # NDJSON ב-stdin/stdout
+  python report_daemon.py --socket /tmp/reports.sock   # NDJSON על Unix socket
+
+בקשה (שורת JSON):
+  {"id": "req-1", "data": {...analysis_data...}, "output": "/path/report.pdf"}
+  {"id": "req-2", "input": "/path/analysis.json"}      # ללא output - PDF מוחזר ב-base64
+תשובה:
+  {"id": "req-1", "ok": true, "output": "...", "error": null, "seconds": 0.08}
+
+Jobs go through a bounded queue to a small set of warm worker processes.
+Workers are forked from the already-warm supervisor, run each job under a
+timeout (a stuck worker is killed and replaced) and are recycled after
+--max-jobs renders to cap memory growth. With --section-cache N each worker
+keeps its last N report sections (see section_cache.py), so a regenerated
+report only rebuilds the sections whose data changed.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import base64
+import signal
+import threading
+import multiprocessing
+
+from batch_reports import warm_up, render_job
+from section_cache import SectionCache
+
+
+# --- Worker process ---
+def _worker_main(conn, max_jobs, section_cache=0):
+    cache = SectionCache(max_entries=section_cache) if section_cache else None
+    for _ in range(max_jobs):
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        conn.send(render_job(job, cache))
+    conn.close()
+
+
+class WarmWorker:
+    """One worker process, replaced after max_jobs renders or a timeout."""
+
+    def __init__(self, ctx, max_jobs, section_cache=0):
+        self.ctx = ctx
+        self.max_jobs = max_jobs
+        self.section_cache = section_cache
+        self.proc = None
+        self.conn = None
+        self.jobs_done = 0
+        self.spawn()
+
+    def spawn(self):
+        parent, child = self.ctx.Pipe()
+        self.proc = self.ctx.Process(target=_worker_main,
+                                     args=(child, self.max_jobs, self.section_cache),
+                                     daemon=True)
+        self.proc.start()
+        child.close()
+        self.conn = parent
+        self.jobs_done = 0
+
+    def kill(self):
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.proc.join(5)
+        if self.proc.is_alive():
+            self.proc.kill()
+            self.proc.join()
+        self.conn.close()
+
+    def run(self, job, timeout):
+        if not self.proc.is_alive():
+            self.kill()
+            self.spawn()
+
+        start = time.perf_counter()
+        try:
+            self.conn.send(job)
+            ready = self.conn.poll(timeout)
+            res = self.conn.recv() if ready else None
+        except (EOFError, OSError):
+            ready, res = True, None
+
+        if res is None:
+            self.kill()
+            self.spawn()
+            reason = f'timed out after {timeout}s' if not ready else 'worker died'
+            return {'id': job.get('id'), 'output': job.get('output'), 'ok': False,
+                    'error': f'render {reason}', 'seconds': time.perf_counter() - start}
+
+        self.jobs_done += 1
+        if self.jobs_done >= self.max_jobs:
+            # The worker exits by itself after max_jobs; fork a fresh one now
+            # so the next request does not wait for it.
+            self.proc.join(5)
+            self.conn.close()
+            self.spawn()
+        return res
+
+
+# ============================================================
+# Daemon
+# ============================================================
+class ReportDaemon:
+    """
+    Bounded job queue in front of a pool of warm workers.
+
+    workers:    number of worker processes
+    queue_size: jobs allowed to wait; beyond that submit() blocks (stdio) or
+                rejects the job (socket clients)
+    timeout:    per-job render timeout in seconds
+    max_jobs:   renders per worker before it is recycled
+    section_cache: report sections each worker keeps for regenerations (0 = off)
+    """
+
+    def __init__(self, workers=1, queue_size=64, timeout=30.0, max_jobs=200,
+                 chart_cache_dir=None, section_cache=0):
+        # Warm the supervisor once so forked workers start with everything loaded
+        warm_up(chart_cache_dir)
+        # Workers are forked so they inherit the warm imports, fonts and styles.
+        # The supervisor has threads by then (dispatchers, and the chart pool if
+        # warm_up drew a chart): a forked child must not reuse that pool, which
+        # generate_report drops with os.register_at_fork (_forget_chart_pool).
+        # Anything else that starts threads before forking needs the same reset.
+        methods = multiprocessing.get_all_start_methods()
+        self.ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        self.timeout = timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.workers = [WarmWorker(self.ctx, max_jobs, section_cache) for _ in range(workers)]
+        self.threads = [threading.Thread(target=self._dispatch, args=(w,), daemon=True)
+                        for w in self.workers]
+        for t in self.threads:
+            t.start()
+
+    def _dispatch(self, worker):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            job, reply = item
+            reply(worker.run(job, self.timeout))
+
+    def submit(self, job, reply, block=False, timeout=None):
+        """Queue a job; reply(result) is called from a dispatcher thread.
+
+        With block=True a full queue makes the caller wait (up to timeout
+        seconds). Returns False (and replies with an error) when the job
+        could not be queued."""
+        try:
+            self.queue.put((job, reply), block, timeout)
+            return True
+        except queue.Full:
+            reply({'id': job.get('id'), 'output': job.get('output'), 'ok': False,
+                   'error': 'queue full', 'seconds': 0.0})
+            return False
+
+    def render(self, job):
+        """Synchronous convenience wrapper around submit()."""
+        done = threading.Event()
+        box = {}
+
+        def reply(res):
+            box['res'] = res
+            done.set()
+
+        self.submit(job, reply)
+        done.wait()
+        return box['res']
+
+    def shutdown(self):
+        """Finish queued jobs, then stop the workers."""
+        for _ in self.threads:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join()
+        for w in self.workers:
+            w.close()
+
+
+def _encode(res):
+    res = dict(res)
+    pdf = res.pop('pdf', None)
+    if pdf is not None:
+        res['pdf_base64'] = base64.b64encode(pdf).decode('ascii')
+    return json.dumps(res, ensure_ascii=False) + '\n'
+
+
+def _parse(line):
+    try:
+        job = json.loads(line)
+        if not isinstance(job, dict) or not ('data' in job or 'input' in job):
+            raise ValueError("request needs 'data' or 'input'")
+        return job, None
+    except ValueError as e:
+        return None, {'id': None, 'output': None, 'ok': False,
+                      'error': f'bad request: {e}', 'seconds': 0.0}
+
+
+# --- Transports ---
+def serve_stdio(daemon, stdin=sys.stdin, stdout=sys.stdout):
+    """Read NDJSON requests until EOF; replies may arrive out of order (match on id).
+
+    A full queue stops reading stdin until a worker frees a slot, so a piped
+    batch of any size is rendered rather than rejected."""
+    lock = threading.Lock()
+
+    def reply(res):
+        with lock:
+            stdout.write(_encode(res))
+            stdout.flush()
+
+    for line in stdin:
+        if not line.strip():
+            continue
+        job, err = _parse(line)
+        if err:
+            reply(err)
+        else:
+            daemon.submit(job, reply, block=True)
+    daemon.shutdown()
+
+
+def serve_socket(daemon, path):
+    """Serve NDJSON over a Unix socket; each connection is handled in its own thread."""
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                job, res = _parse(line.decode('utf-8'))
+                if job is not None:
+                    res = daemon.render(job)
+                self.wfile.write(_encode(res).encode('utf-8'))
+                self.wfile.flush()
+
+    if os.path.exists(path):
+        os.remove(path)
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+        daemon.shutdown()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Long-lived warm report rendering worker.')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--stdio', action='store_true', help='NDJSON requests on stdin, replies on stdout')
+    mode.add_argument('--socket', metavar='PATH', help='listen on a Unix socket')
+    parser.add_argument('--workers', type=int, default=1, help='warm worker processes (default: 1)')
+    parser.add_argument('--queue-size', type=int, default=64, help='max queued jobs (default: 64)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-job timeout in seconds')
+    parser.add_argument('--max-jobs', type=int, default=200,
+                        help='recycle a worker after this many reports (default: 200)')
+    parser.add_argument('--chart-cache-dir', help='on-disk chart cache (see chart_cache.py)')
+    parser.add_argument('--section-cache', type=int, default=0, metavar='N',
+                        help='keep the last N report sections per worker for regenerations '
+                             '(see section_cache.py; default: off)')
+    args = parser.parse_args()
+
+    daemon = ReportDaemon(workers=args.workers, queue_size=args.queue_size,
+                          timeout=args.timeout, max_jobs=args.max_jobs,
+                          chart_cache_dir=args.chart_cache_dir,
+                          section_cache=args.section_cache)
+    if args.stdio:
+        serve_stdio(daemon)
+    else:
+        print(f"Listening on {args.socket}", file=sys.stderr)
+        serve_socket(daemon, args.socket)
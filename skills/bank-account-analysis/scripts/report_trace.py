@@ -0,0 +1,112 @@
+"""
+מעקב זמנים והקצאות זיכרון בזמן הפקת הדוח.
+
+    tracer = ReportTracer(allocations=True)
+    generate_report(data, 'report.pdf', tracer=tracer)
+    tracer.save('trace.json')
+
+generate_report opens a span for every section in SECTIONS, every chart
+and doc.build. A span records wall time and, when allocations are
+tracked (tracemalloc), the bytes allocated and the peak traced memory
+inside it. Spans nest (a chart inside its section). Listeners get each
+finished span as a dict, e.g. to forward it to a metrics system.
+
+Without a tracer, generate_report uses NULL_SPAN - one shared no-op
+context manager - so nothing is timed or allocated.
+"""
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+NULL_SPAN = nullcontext()
+
+
+def null_span(name, **attrs):
+    return NULL_SPAN
+
+
+class ReportTracer:
+    """Collects nested timing spans for one or more reports."""
+
+    def __init__(self, allocations=False, listeners=()):
+        self.allocations = allocations
+        self.listeners = list(listeners)
+        self.spans = []
+        self.meta = {}
+        self._stack = []
+        self._t0 = time.perf_counter()
+        self._owns_tracemalloc = False
+
+    def start(self):
+        """Start tracemalloc if allocations are wanted; True if this call started it."""
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+            return True
+        return False
+
+    def stop(self):
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        track = self.allocations and tracemalloc.is_tracing()
+        entry = {'name': name, 'depth': len(self._stack),
+                 'start_ms': round((time.perf_counter() - self._t0) * 1000, 3), **attrs}
+        if track:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent['_peak'] = max(parent['_peak'], peak)
+            tracemalloc.reset_peak()
+            entry['_start_bytes'] = current
+            entry['_peak'] = current
+        self._stack.append(entry)
+        t = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['ms'] = round((time.perf_counter() - t) * 1000, 3)
+            self._stack.pop()
+            if track:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(entry.pop('_peak'), peak)
+                start = entry.pop('_start_bytes')
+                entry['alloc_bytes'] = current - start
+                entry['peak_bytes'] = peak - start
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent['_peak'] = max(parent['_peak'], peak)
+            self.spans.append(entry)
+            for listener in self.listeners:
+                listener(entry)
+
+    # --- Output ---
+    def summary(self):
+        """{span name: total ms} over all recorded spans."""
+        out = {}
+        for s in self.spans:
+            out[s['name']] = round(out.get(s['name'], 0) + s['ms'], 3)
+        return out
+
+    def to_dict(self):
+        # Spans finish inner-first; report them in start order
+        return {'allocations': self.allocations, 'meta': self.meta,
+                'spans': sorted(self.spans, key=lambda s: s['start_ms']),
+                'summary': self.summary()}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,82 @@
+"""
+מטמון לפרקי הדוח - שמירת ה-flowables של כל פרק לפי hash של הנתונים שלו.
+דוח שמופק מחדש אחרי שינוי קטן (שם, תובנה, חודש חדש) בונה מחדש רק את
+הפרקים שהנתונים שלהם השתנו.
+
+Opt-in: pass a SectionCache to generate_report(section_cache=...) in a
+process that regenerates reports (report_daemon --section-cache). In-memory
+LRU only: flowables hold fonts, styles and decoded images by reference, so
+they are not worth serialising. Entries are keyed by the section name, its
+slice of analysis_data and everything else that changes the output (see
+generate_report.section_key); a cached list is never laid out itself -
+callers take copy_flowables() of it.
+"""
+
+import copy
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class SectionCache:
+    """Built section flowables by content hash."""
+
+    def __init__(self, max_entries=64, enabled=True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    # --- Keys ---
+    @staticmethod
+    def key(name, inputs, env):
+        """Hash of the section name, its input slice and the layout/style environment."""
+        payload = json.dumps([name, inputs, env], sort_keys=True, ensure_ascii=False,
+                             separators=(',', ':'), default=repr)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    # --- Lookup / store ---
+    def get(self, key):
+        with self._lock:
+            flowables = self._mem.get(key)
+            if flowables is None:
+                self.misses += 1
+                return None
+            self._mem.move_to_end(key)
+            self.hits += 1
+        return copy_flowables(flowables)
+
+    def put(self, key, flowables):
+        with self._lock:
+            self._mem[key] = list(flowables)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'entries': len(self._mem),
+            }
+
+
+def copy_flowables(flowables):
+    """Shallow copies for one layout pass.
+
+    wrap() / split() store their results (widths, line breaks, split parts)
+    on the flowable, so a cached instance is never handed out directly;
+    the copies share the immutable parts - text fragments, cell values,
+    drawings and decoded images.
+    """
+    return [copy.copy(f) for f in flowables]
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+מאגר טרנזקציות עמודתי - היסטוריית הטרנזקציות כקובצי .npy ממופים לזיכרון,
+עם קידוד מילוני לטקסט ואינדקס תאריכים ממוין.
+
+שימוש:
+  python tx_store.py build store_dir/ transactions.ndjson [...]
+  python tx_store.py report store_dir/ [--from YYYY-MM] [--to YYYY-MM] [--source NAME]
+  python tx_store.py --bench 1000000
+
+A store is a directory with one .npy file per column of the unified schema
+(SKILL.md), opened with mmap_mode='r':
+
+  date         datetime64[D]
+  amount       float64
+  balance      float64 (NaN when the statement has none)
+  duplicate    bool (reconcile.py)
+  description, category, source, type
+               int32 codes into the string tables in dictionaries.json
+
+Rows are clustered by source and sorted by date within each source, and
+`offsets` holds where each source starts. A (period, source) query is then
+two binary searches and a slice: the columns it returns are views of the
+mapped files, not copies. The `summary`, `categories` and `trends` blocks
+(same shape as aggregates.py) are built from column scans with bincount.
+"""
+
+import os
+import sys
+import json
+
+import numpy as np
+
+from aggregates import trends_block, summary_block, categories_block
+
+
+NUMERIC_COLUMNS = {'date': 'datetime64[D]', 'amount': 'float64', 'balance': 'float64',
+                   'duplicate': 'bool'}
+TEXT_COLUMNS = ('description', 'category', 'source', 'type')
+CHUNK_SIZE = 65536
+DEFAULT_CATEGORY = 'אחר'     # expenses without a category, as in aggregates.py
+
+
+def _day_bounds(start, end):
+    """[start, end) as datetime64[D] from 'YYYY-MM' or 'YYYY-MM-DD' strings (None = open)."""
+    lo = hi = None
+    if start:
+        lo = np.datetime64(start[:10], 'D') if len(start) > 7 else \
+            np.datetime64(start[:7], 'M').astype('datetime64[D]')
+    if end:
+        hi = np.datetime64(end[:10], 'D') + 1 if len(end) > 7 else \
+            (np.datetime64(end[:7], 'M') + 1).astype('datetime64[D]')
+    return lo, hi
+
+
+class _Encoder:
+    """String -> int32 code, in first-seen order."""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {v: i for i, v in enumerate(self.values)}
+
+    def encode(self, items):
+        codes, values = self.codes, self.values
+        out = np.empty(len(items), dtype=np.int32)
+        for i, v in enumerate(items):
+            c = codes.get(v)
+            if c is None:
+                c = codes[v] = len(values)
+                values.append(v)
+            out[i] = c
+        return out
+
+
+# ============================================================
+# Store
+# ============================================================
+class TransactionStore:
+    """Read-only columnar view over a store directory (see build())."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'dictionaries.json'), 'r', encoding='utf-8') as f:
+            self.dictionaries = json.load(f)
+        self.columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+                        for name in (*NUMERIC_COLUMNS, *TEXT_COLUMNS)}
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'))
+        self.sources = self.dictionaries['source']
+
+    def __len__(self):
+        return len(self.columns['date'])
+
+    @classmethod
+    def build(cls, path, transactions, chunk_size=CHUNK_SIZE):
+        """Write a store from an iterable of unified transactions and open it.
+
+        The input is consumed in chunks and kept only as compact per-column
+        arrays until the final sort, so any iterator (e.g.
+        ingest.iter_transactions) works.
+        """
+        os.makedirs(path, exist_ok=True)
+        encoders = {name: _Encoder() for name in TEXT_COLUMNS}
+        parts = {name: [] for name in (*NUMERIC_COLUMNS, *TEXT_COLUMNS)}
+        chunk = []
+        it = iter(transactions)
+        while True:
+            chunk.clear()
+            for tx in it:
+                if tx.get('date'):
+                    chunk.append(tx)
+                    if len(chunk) == chunk_size:
+                        break
+            if not chunk:
+                break
+            parts['date'].append(np.array([tx['date'][:10] for tx in chunk], dtype='datetime64[D]'))
+            parts['amount'].append(np.array([tx.get('amount') or 0 for tx in chunk], dtype=float))
+            parts['balance'].append(np.array(
+                [np.nan if tx.get('balance') is None else tx['balance'] for tx in chunk], dtype=float))
+            parts['duplicate'].append(np.array([bool(tx.get('duplicate')) for tx in chunk]))
+            for name in TEXT_COLUMNS:
+                parts[name].append(encoders[name].encode([tx.get(name) or '' for tx in chunk]))
+            if len(chunk) < chunk_size:
+                break
+
+        cols = {name: np.concatenate(p) if p else np.empty(0, dtype=NUMERIC_COLUMNS.get(name, np.int32))
+                for name, p in parts.items()}
+        # Cluster by source, date order inside each source (stable keeps input order on ties)
+        order = np.lexsort((cols['date'], cols['source']))
+        for name, values in cols.items():
+            np.save(os.path.join(path, f'{name}.npy'), values[order])
+        n_sources = len(encoders['source'].values)
+        counts = np.bincount(cols['source'], minlength=n_sources)
+        np.save(os.path.join(path, 'offsets.npy'), np.concatenate([[0], np.cumsum(counts)]))
+        with open(os.path.join(path, 'dictionaries.json'), 'w', encoding='utf-8') as f:
+            json.dump({name: enc.values for name, enc in encoders.items()}, f, ensure_ascii=False)
+        return cls(path)
+
+    # --- Queries ---
+    def ranges(self, start=None, end=None, sources=None):
+        """[(source, lo, hi)] row ranges for a period and (optionally) some sources."""
+        lo_day, hi_day = _day_bounds(start, end)
+        dates = self.columns['date']
+        wanted = range(len(self.sources)) if sources is None else \
+            [self.sources.index(s) for s in sources if s in self.sources]
+        out = []
+        for code in wanted:
+            a, b = int(self.offsets[code]), int(self.offsets[code + 1])
+            lo = a if lo_day is None else a + int(np.searchsorted(dates[a:b], lo_day))
+            hi = b if hi_day is None else a + int(np.searchsorted(dates[a:b], hi_day))
+            if hi > lo:
+                out.append((self.sources[code], lo, hi))
+        return out
+
+    def query(self, start=None, end=None, source=None):
+        """{column: array} for one source (or the whole store when it holds a
+        single source) in [start, end] - views of the mapped files."""
+        if source is None and len(self.sources) > 1:
+            raise ValueError("query() needs a source when the store has several; use scan()")
+        ranges = self.ranges(start, end, None if source is None else [source])
+        if not ranges:
+            return {name: col[:0] for name, col in self.columns.items()}
+        _, lo, hi = ranges[0]
+        return {name: col[lo:hi] for name, col in self.columns.items()}
+
+    def scan(self, start=None, end=None, sources=None, columns=None):
+        """Yield (source, {column: view}) for each source with rows in the period."""
+        names = columns or self.columns
+        for source, lo, hi in self.ranges(start, end, sources):
+            yield source, {name: self.columns[name][lo:hi] for name in names}
+
+    def decode(self, column, codes):
+        """Codes of a text column back to strings."""
+        table = self.dictionaries[column]
+        return [table[c] for c in codes]
+
+    def iter_transactions(self, start=None, end=None, sources=None):
+        """Unified-schema dicts for a period, source by source (e.g. for the report appendix)."""
+        for _, cols in self.scan(start, end, sources):
+            dates = np.datetime_as_string(cols['date'])
+            text = {name: self.decode(name, cols[name]) for name in TEXT_COLUMNS}
+            for i in range(len(dates)):
+                tx = {'date': str(dates[i]), 'amount': float(cols['amount'][i])}
+                for name in TEXT_COLUMNS:
+                    tx[name] = text[name][i]
+                if not np.isnan(cols['balance'][i]):
+                    tx['balance'] = float(cols['balance'][i])
+                if cols['duplicate'][i]:
+                    tx['duplicate'] = True
+                yield tx
+
+    # --- Report blocks ---
+    def monthly(self, start=None, end=None, sources=None):
+        """(month labels, incomes, expenses, counts, {category code: expense}) by column scans.
+
+        Card-bill duplicates are skipped, as in aggregates.aggregate_month.
+        """
+        per_month = {}
+        cats = np.zeros(len(self.dictionaries['category']))
+        for _, cols in self.scan(start, end, sources,
+                                 ('date', 'amount', 'category', 'duplicate')):
+            keep = ~cols['duplicate']
+            amount = cols['amount'][keep]
+            month = cols['date'][keep].astype('datetime64[M]').astype(np.int64)
+            if not len(month):
+                continue
+            m0 = month.min()
+            idx = month - m0
+            size = int(idx.max()) + 1
+            inc = np.bincount(idx, np.where(amount > 0, amount, 0), size)
+            exp = np.bincount(idx, np.where(amount < 0, -amount, 0), size)
+            cnt = np.bincount(idx, minlength=size)
+            for k in np.flatnonzero(cnt):
+                acc = per_month.setdefault(int(m0 + k), [0.0, 0.0, 0])
+                acc[0] += inc[k]
+                acc[1] += exp[k]
+                acc[2] += int(cnt[k])
+            spent = amount < 0
+            cats += np.bincount(cols['category'][keep][spent], -amount[spent], len(cats))
+        keys = sorted(per_month)
+        labels = [str(np.datetime64(k, 'M')) for k in keys]
+        rows = [per_month[k] for k in keys]
+        return (labels, [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows],
+                {c: cats[c] for c in np.flatnonzero(cats)})
+
+    def report_blocks(self, start=None, end=None, sources=None):
+        """The `summary`, `categories`, `trends` and `period` blocks for generate_report."""
+        months, incomes, expenses, counts, cats = self.monthly(start, end, sources)
+        totals = {}
+        for code, amount in cats.items():
+            name = self.dictionaries['category'][code] or DEFAULT_CATEGORY
+            totals[name] = totals.get(name, 0) + amount
+        return {
+            'period': {'from': months[0] if months else '', 'to': months[-1] if months else ''},
+            'summary': summary_block(sum(incomes), sum(expenses), sum(counts), len(months)),
+            'categories': categories_block(sorted(totals.items(), key=lambda r: r[1], reverse=True)),
+            'trends': trends_block(months, incomes, expenses),
+        }
+
+
+def benchmark(n=1_000_000):
+    import time
+    import shutil
+    import tempfile
+    import tracemalloc
+    from bench_report import synthetic_transactions
+
+    out = {'transactions': n}
+    tracemalloc.start()
+    rows = list(synthetic_transactions(n))
+    out['dict_bytes_per_row'] = round(tracemalloc.get_traced_memory()[0] / n)
+    tracemalloc.stop()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        t = time.perf_counter()
+        store = TransactionStore.build(tmp, rows)
+        out['build_seconds'] = round(time.perf_counter() - t, 3)
+        out['store_bytes_per_row'] = round(
+            sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / n)
+
+        t = time.perf_counter()
+        blocks = store.report_blocks('2024-04', '2024-09')
+        out['store_report_seconds'] = round(time.perf_counter() - t, 4)
+
+        from aggregates import aggregate_month
+        t = time.perf_counter()
+        by_month = {}
+        for tx in rows:
+            if '2024-04' <= tx['date'][:7] <= '2024-09':
+                by_month.setdefault(tx['date'][:7], []).append(tx)
+        naive = {m: aggregate_month(txs) for m, txs in by_month.items()}
+        out['dict_scan_seconds'] = round(time.perf_counter() - t, 4)
+        out['same_totals'] = bool(np.allclose(
+            blocks['trends']['expenses'], [round(naive[m][1], 2) for m in sorted(naive)]))
+    finally:
+        shutil.rmtree(tmp)
+    return out
+
+
+if __name__ == '__main__':
+    import argparse
+
+    if len(sys.argv) >= 2 and sys.argv[1] == '--bench':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+        print(json.dumps(benchmark(n), indent=2))
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description='Columnar memory-mapped transaction store.')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_build = sub.add_parser('build', help='build a store from NDJSON transaction files')
+    p_build.add_argument('store')
+    p_build.add_argument('transactions', nargs='+')
+    p_rep = sub.add_parser('report', help='print summary/categories/trends as JSON')
+    p_rep.add_argument('store')
+    p_rep.add_argument('--from', dest='start')
+    p_rep.add_argument('--to', dest='end')
+    p_rep.add_argument('--source', action='append', dest='sources')
+    args = parser.parse_args()
+
+    if args.cmd == 'build':
+        def _rows():
+            for path in args.transactions:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+        store = TransactionStore.build(args.store, _rows())
+        print(f"Stored {len(store)} transaction(s) from {len(store.sources)} source(s)")
+    else:
+        json.dump(TransactionStore(args.store).report_blocks(args.start, args.end, args.sources),
+                  sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
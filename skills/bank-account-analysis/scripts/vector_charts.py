@@ -0,0 +1,233 @@
+"""
+גרפים וקטוריים - ציור הגרפים של הדוח ישירות כ-reportlab Drawing.
+
+The pie, trend, forecast and health-gauge charts of generate_report.py,
+drawn with reportlab.graphics (Pie, LinePlot, Wedge) instead of matplotlib.
+A Drawing is a flowable: it goes into the story as vector PDF operators,
+with no figure, rasterisation or embedded PNG.
+
+Callers pass text already run through heb() and the registered font names;
+sizes are in points (the size the chart occupies on the page).
+"""
+
+import math
+
+from reportlab.lib import colors
+from reportlab.graphics.shapes import Drawing, String, Line, Circle, Wedge, Polygon
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.widgets.markers import makeMarker
+
+
+INCOME_COLOR = colors.HexColor('#059669')
+EXPENSE_COLOR = colors.HexColor('#dc2626')
+BALANCE_COLOR = colors.HexColor('#1a56db')
+TEXT_COLOR = colors.HexColor('#1f2937')
+MUTED_COLOR = colors.HexColor('#6b7280')
+GRID_COLOR = colors.HexColor('#e5e7eb')
+
+GAUGE_SEGMENTS = [
+    (0, 20, '#dc2626'), (20, 40, '#ea580c'), (40, 60, '#d97706'),
+    (60, 80, '#2563eb'), (80, 100, '#059669'),
+]
+
+TITLE_SIZE = 14
+LABEL_SIZE = 8
+
+
+def _title(d, text, font):
+    d.add(String(d.width / 2, d.height - TITLE_SIZE - 4, text, fontName=font,
+                 fontSize=TITLE_SIZE, fillColor=TEXT_COLOR, textAnchor='middle'))
+
+
+def nice_range(lo, hi, ticks=5):
+    """(min, max, step) with round steps covering [lo, hi]."""
+    if lo == hi:
+        lo, hi = lo - 1, hi + 1
+    raw = (hi - lo) / ticks
+    mag = 10 ** math.floor(math.log10(raw))
+    step = next(m * mag for m in (1, 2, 2.5, 5, 10) if m * mag >= raw)
+    return math.floor(lo / step) * step, math.ceil(hi / step) * step, step
+
+
+def _line_plot(d, n_points, y_values, labels, font):
+    """A LinePlot laid out in the drawing, with fixed axis ranges so callers
+    can map data to drawing coordinates themselves (see _to_xy)."""
+    lp = LinePlot()
+    lp.x, lp.y = 48, 40
+    lp.width, lp.height = d.width - lp.x - 12, d.height - lp.y - TITLE_SIZE - 30
+    lo, hi, step = nice_range(min(y_values), max(y_values))
+    lp.yValueAxis.valueMin, lp.yValueAxis.valueMax, lp.yValueAxis.valueStep = lo, hi, step
+    lp.yValueAxis.labelTextFormat = lambda v: f'{v:,.0f}'
+    lp.yValueAxis.labels.fontName = font
+    lp.yValueAxis.labels.fontSize = LABEL_SIZE
+    lp.yValueAxis.visibleGrid = 1
+    lp.yValueAxis.gridStrokeColor = GRID_COLOR
+    lp.yValueAxis.visibleAxis = 0
+    lp.xValueAxis.valueMin, lp.xValueAxis.valueMax = -0.3, max(n_points - 1, 1) + 0.3
+    lp.xValueAxis.valueSteps = list(range(n_points))
+    lp.xValueAxis.labelTextFormat = lambda v: labels[int(round(v))] if 0 <= v < len(labels) else ''
+    lp.xValueAxis.labels.fontName = font
+    lp.xValueAxis.labels.fontSize = LABEL_SIZE
+    lp.xValueAxis.labels.angle = 45
+    lp.xValueAxis.labels.boxAnchor = 'ne'
+    lp.xValueAxis.strokeColor = MUTED_COLOR
+    return lp
+
+
+def _to_xy(lp, x, y):
+    xa, ya = lp.xValueAxis, lp.yValueAxis
+    px = lp.x + (x - xa.valueMin) / (xa.valueMax - xa.valueMin) * lp.width
+    py = lp.y + (y - ya.valueMin) / (ya.valueMax - ya.valueMin) * lp.height
+    return px, py
+
+
+def _legend(d, pairs, font, x, y):
+    lg = Legend()
+    lg.x, lg.y = x, y
+    lg.alignment = 'right'
+    lg.fontName = font
+    lg.fontSize = LABEL_SIZE + 1
+    lg.colorNamePairs = pairs
+    lg.columnMaximum = len(pairs)
+    lg.strokeColor = None
+    lg.dx = lg.dy = 8
+    lg.deltay = 12
+    d.add(lg)
+
+
+# ============================================================
+# Charts
+# ============================================================
+def pie_chart(labels, amounts, width, height, title, fonts, palette):
+    """Expense breakdown pie, largest slice first, legend on the left."""
+    font, bold = fonts
+    d = Drawing(width, height)
+    _title(d, title, bold)
+    data = sorted(zip(amounts, labels), key=lambda p: p[0], reverse=True)
+    total = sum(a for a, _ in data) or 1
+    size = min(height - TITLE_SIZE - 30, width * 0.55)
+
+    pie = Pie()
+    pie.x, pie.y = width - size - 20, (height - TITLE_SIZE - 10 - size) / 2
+    pie.width = pie.height = size
+    pie.data = [a for a, _ in data]
+    pie.labels = [f'{a / total:.0%}' for a, _ in data]
+    pie.startAngle, pie.direction = 90, 'clockwise'
+    pie.simpleLabels = 1
+    pie.slices.strokeColor = colors.white
+    pie.slices.strokeWidth = 0.5
+    pie.slices.labelRadius = 0.8
+    pie.slices.fontName = font
+    pie.slices.fontSize = LABEL_SIZE + 1
+    for i in range(len(data)):
+        pie.slices[i].fillColor = colors.HexColor(palette[i % len(palette)])
+    d.add(pie)
+
+    pairs = [(colors.HexColor(palette[i % len(palette)]), name) for i, (_, name) in enumerate(data)]
+    _legend(d, pairs, font, 10, pie.y + size - 10)
+    return d
+
+
+def trend_chart(months, incomes, expenses, width, height, title, series_labels, fonts):
+    """Monthly income vs expenses, the gap shaded green (saving) or red."""
+    font, bold = fonts
+    d = Drawing(width, height)
+    _title(d, title, bold)
+    n = len(months)
+    lp = _line_plot(d, n, list(incomes) + list(expenses), months, font)
+
+    # Shade between the lines, one quad per interval coloured by who is on top
+    for i in range(n - 1):
+        pts = [_to_xy(lp, i, incomes[i]), _to_xy(lp, i + 1, incomes[i + 1]),
+               _to_xy(lp, i + 1, expenses[i + 1]), _to_xy(lp, i, expenses[i])]
+        saving = incomes[i] + incomes[i + 1] > expenses[i] + expenses[i + 1]
+        d.add(Polygon([c for p in pts for c in p], strokeColor=None,
+                      fillColor=INCOME_COLOR if saving else EXPENSE_COLOR, fillOpacity=0.1))
+
+    lp.data = [list(enumerate(incomes)), list(enumerate(expenses))]
+    for i, (color, marker) in enumerate(((INCOME_COLOR, 'FilledCircle'),
+                                         (EXPENSE_COLOR, 'FilledSquare'))):
+        lp.lines[i].strokeColor = color
+        lp.lines[i].strokeWidth = 2
+        lp.lines[i].symbol = makeMarker(marker, size=4, fillColor=color, strokeColor=color)
+    d.add(lp)
+    _legend(d, [(INCOME_COLOR, series_labels[0]), (EXPENSE_COLOR, series_labels[1])],
+            font, width - 60, height - TITLE_SIZE - 14)
+    return d
+
+
+def forecast_chart(months_actual, balances_actual, months_forecast, balances_forecast,
+                   width, height, title, series_labels, fonts, bands=None):
+    """Actual balance (solid) continued by the forecast (dashed), with optional
+    percentile bands ({low, high}, outermost first) shaded around it."""
+    font, bold = fonts
+    d = Drawing(width, height)
+    _title(d, title, bold)
+    months = list(months_actual) + list(months_forecast)
+    n_act = len(balances_actual)
+    forecast = [(n_act - 1, balances_actual[-1])] + [
+        (n_act + i, b) for i, b in enumerate(balances_forecast)]
+    values = list(balances_actual) + list(balances_forecast)
+    for band in bands or ():
+        values += list(band['low']) + list(band['high'])
+    lp = _line_plot(d, len(months), values + [0] if min(values) < 0 else values, months, font)
+
+    for band in bands or ():
+        xs = range(n_act - 1, len(months))
+        upper = [balances_actual[-1]] + list(band['high'])
+        lower = [balances_actual[-1]] + list(band['low'])
+        pts = [_to_xy(lp, x, y) for x, y in zip(xs, upper)]
+        pts += [_to_xy(lp, x, y) for x, y in reversed(list(zip(xs, lower)))]
+        d.add(Polygon([c for p in pts for c in p], strokeColor=None,
+                      fillColor=BALANCE_COLOR, fillOpacity=0.12))
+
+    lp.data = [list(enumerate(balances_actual)), forecast]
+    lp.lines[0].strokeColor = BALANCE_COLOR
+    lp.lines[0].strokeWidth = 2
+    lp.lines[0].symbol = makeMarker('FilledCircle', size=4, fillColor=BALANCE_COLOR,
+                                    strokeColor=BALANCE_COLOR)
+    faded = colors.Color(BALANCE_COLOR.red, BALANCE_COLOR.green, BALANCE_COLOR.blue, alpha=0.6)
+    lp.lines[1].strokeColor = faded
+    lp.lines[1].strokeWidth = 2
+    lp.lines[1].strokeDashArray = (5, 3)
+    lp.lines[1].symbol = makeMarker('FilledSquare', size=4, fillColor=faded, strokeColor=faded)
+    d.add(lp)
+
+    if any(b < 0 for b in balances_forecast):
+        x0, y0 = _to_xy(lp, lp.xValueAxis.valueMin, 0)
+        x1, _ = _to_xy(lp, lp.xValueAxis.valueMax, 0)
+        d.add(Line(x0, y0, x1, y0, strokeColor=EXPENSE_COLOR, strokeWidth=1,
+                   strokeDashArray=(1, 2), strokeOpacity=0.5))
+    pairs = [(BALANCE_COLOR, series_labels[0]), (faded, series_labels[1])]
+    if bands:
+        pairs.append((colors.Color(BALANCE_COLOR.red, BALANCE_COLOR.green, BALANCE_COLOR.blue,
+                                   alpha=0.25), series_labels[2]))
+    _legend(d, pairs, font, width - 60, height - TITLE_SIZE - 14)
+    return d
+
+
+def health_gauge(score, width, height, title, caption, fonts):
+    """Half-ring gauge, 0 on the left, with a needle at the score."""
+    font, bold = fonts
+    d = Drawing(width, height)
+    _title(d, title, bold)
+    r_outer = min(width / 2.6, (height - TITLE_SIZE - 10) / 1.65)
+    r_inner = r_outer * 0.6
+    cx, cy = width / 2, 0.55 * r_outer + 8
+
+    for start, end, color in GAUGE_SEGMENTS:
+        # score 0 sits at 180 degrees, 100 at 0 degrees
+        d.add(Wedge(cx, cy, r_outer, 180 - end * 1.8, 180 - start * 1.8, radius1=r_inner,
+                    fillColor=colors.HexColor(color), fillOpacity=0.3, strokeColor=None))
+
+    angle = math.pi * (1 - score / 100)
+    d.add(Line(cx, cy, cx + math.cos(angle) * r_outer * 0.85, cy + math.sin(angle) * r_outer * 0.85,
+               strokeColor=TEXT_COLOR, strokeWidth=3, strokeLineCap=1))
+    d.add(Circle(cx, cy, 4, fillColor=TEXT_COLOR, strokeColor=None))
+    d.add(String(cx, cy - 0.15 * r_outer - 11, f'{score}', fontName=bold, fontSize=32,
+                 fillColor=TEXT_COLOR, textAnchor='middle'))
+    d.add(String(cx, cy - 0.35 * r_outer - 12, caption, fontName=font, fontSize=10,
+                 fillColor=MUTED_COLOR, textAnchor='middle'))
+    return d
@@ -0,0 +1,68 @@
+"""
+Monthly aggregate store (aggregates.AggregateStore).
+
+  python -m unittest discover -s skills/bank-account-analysis/tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from aggregates import AggregateStore   # noqa: E402
+
+
+def tx(date, amount, category='מזון', source='בנק'):
+    return {'date': date, 'description': 'עסק', 'amount': amount,
+            'category': category, 'source': source}
+
+
+JUNE = [tx('2025-06-02', -100.0), tx('2025-06-10', -50.0), tx('2025-06-20', -30.0),
+        tx('2025-06-28', 5000.0, category=None)]
+
+
+class AggregateStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = AggregateStore()
+        self.store.ingest('acct', JUNE)
+
+    def tearDown(self):
+        self.store.close()
+
+    def expenses(self):
+        return {m: e for m, _, e, _ in self.store.months('acct')}
+
+    def test_partial_statement_keeps_earlier_days(self):
+        # A statement starting mid-June with one corrected row and a July row
+        self.store.ingest('acct', [tx('2025-06-20', -35.0), tx('2025-06-28', 5000.0),
+                                   tx('2025-07-03', -80.0)])
+        self.assertEqual(self.expenses(), {'2025-06': 185.0, '2025-07': 80.0})
+
+    def test_reingest_is_idempotent(self):
+        self.store.ingest('acct', JUNE)
+        self.assertEqual(self.expenses(), {'2025-06': 180.0})
+        self.assertEqual(self.store.summary('acct')['total_transactions'], 4)
+
+    def test_whole_months_replaces_the_month(self):
+        self.store.ingest('acct', [tx('2025-06-20', -35.0)], mode='months')
+        self.assertEqual(self.expenses(), {'2025-06': 35.0})
+
+    def test_append_adds(self):
+        self.store.ingest('acct', [tx('2025-06-20', -35.0)], mode='append')
+        self.assertEqual(self.expenses(), {'2025-06': 215.0})
+
+    def test_sources_are_replaced_separately(self):
+        self.store.ingest('acct', [tx('2025-06-15', -40.0, source='מקס')])
+        self.assertEqual(self.expenses(), {'2025-06': 220.0})
+
+    def test_month_filters(self):
+        self.store.ingest('acct', [tx('2025-07-31', -80.0), tx('2025-08-01', -10.0)])
+        self.assertEqual([r[0] for r in self.store.months('acct', '2025-07', '2025-07')],
+                         ['2025-07'])
+        self.assertEqual(self.store.categories('acct', '2025-07', '2025-07')['amounts'], [80.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
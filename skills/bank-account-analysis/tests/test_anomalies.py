@@ -0,0 +1,86 @@
+"""
+Streaming anomaly detection (anomalies.py).
+
+  python -m unittest discover -s skills/bank-account-analysis/tests
+"""
+
+import os
+import sys
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from anomalies import AnomalyDetector, Welford, detect_anomalies   # noqa: E402
+
+
+def tx(day, amount, description='עסק', category='מזון'):
+    return {'date': day.isoformat(), 'description': description, 'amount': -amount,
+            'category': category, 'source': 'בנק'}
+
+
+def days(start, n, step=1):
+    d = date.fromisoformat(start)
+    return [d + timedelta(days=i * step) for i in range(n)]
+
+
+class WelfordTest(unittest.TestCase):
+
+    def test_add_repeated_matches_add(self):
+        a, b = Welford(), Welford()
+        for x in (12.0, 40.5, 3.25):
+            a.add(x)
+            b.add(x)
+        for _ in range(9):
+            a.add(0.0)
+        b.add_repeated(0.0, 9)
+        self.assertEqual(a.n, b.n)
+        self.assertAlmostEqual(a.mean, b.mean)
+        self.assertAlmostEqual(a.m2, b.m2)
+
+
+class AnomalyDetectorTest(unittest.TestCase):
+
+    def test_flat_history_does_not_flag_small_rise(self):
+        txs = [tx(d, 50.0) for d in days('2024-01-01', 10)] + [tx(date(2024, 1, 11), 53.0)]
+        self.assertEqual([a for a in detect_anomalies(txs) if a['kind'] != 'month'], [])
+
+    def test_flat_history_flags_large_rise(self):
+        txs = [tx(d, 50.0) for d in days('2024-01-01', 10)] + [tx(date(2024, 1, 11), 400.0)]
+        kinds = {a['kind'] for a in detect_anomalies(txs)}
+        self.assertIn('transaction', kinds)
+
+    def test_days_without_expenses_count_as_zero(self):
+        det = AnomalyDetector()
+        det.update([tx(d, 70.0) for d in days('2024-01-01', 5, step=7)])
+        det.update([tx(date(2024, 2, 1), 70.0)])
+        self.assertEqual(det.daily.n, 31)
+        self.assertAlmostEqual(det.daily.mean, 5 * 70.0 / 31)
+
+    def test_update_streams_ordered_input(self):
+        det = AnomalyDetector()
+        det.update(iter([tx(d, 20.0) for d in days('2024-01-01', 3)]))
+        self.assertEqual(det.open_day, '2024-01-03')
+
+    def test_update_rejects_out_of_order_input(self):
+        rows = [tx(date(2024, 1, 5), 20.0), tx(date(2024, 1, 2), 20.0)]
+        with self.assertRaises(ValueError):
+            AnomalyDetector().update(rows)
+        self.assertEqual(len(detect_anomalies(rows)), 0)
+
+    def test_resume_with_overlap_matches_single_run(self):
+        rows = [tx(d, 30.0 + i % 7, description=f'עסק {i % 3}')
+                for i, d in enumerate(days('2024-01-01', 60))]
+        rows.append(tx(date(2024, 3, 1), 30.0, description='עסק 0'))
+        full = AnomalyDetector()
+        full.update(rows)
+
+        split = AnomalyDetector()
+        split.update(rows[:45])
+        resumed = AnomalyDetector.from_dict(split.to_dict())
+        resumed.update(rows[40:])
+        self.assertEqual(resumed.to_dict(), full.to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
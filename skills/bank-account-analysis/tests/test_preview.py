@@ -0,0 +1,51 @@
+"""
+The one-page preview (generate_report(..., preview=True)) must stay one page.
+
+  python -m unittest discover -s skills/bank-account-analysis/tests
+"""
+
+import os
+import re
+import sys
+import unittest
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import generate_report                          # noqa: E402
+from bench_report import PROFILES, synthetic_analysis   # noqa: E402
+
+
+def page_count(pdf):
+    return len(re.findall(rb'/Type /Page\b', pdf))
+
+
+class PreviewTest(unittest.TestCase):
+
+    def render(self, data, **kw):
+        buf = BytesIO()
+        generate_report.generate_report(data, buf, preview=True, **kw)
+        return buf.getvalue()
+
+    def test_typical_profile_is_one_page(self):
+        self.assertEqual(page_count(self.render(synthetic_analysis(**PROFILES['typical']))), 1)
+
+    def test_every_profile_is_one_page(self):
+        for name, profile in PROFILES.items():
+            with self.subTest(profile=name):
+                self.assertEqual(page_count(self.render(synthetic_analysis(**profile))), 1)
+
+    def test_long_recommendation_list_is_trimmed(self):
+        data = synthetic_analysis(**PROFILES['typical'])
+        data['health_score']['recommendations'] = [f'המלצה מספר {i}' for i in range(1, 16)]
+        self.assertEqual(page_count(self.render(data)), 1)
+
+    def test_full_report_has_more_pages(self):
+        buf = BytesIO()
+        generate_report.generate_report(synthetic_analysis(**PROFILES['typical']), buf,
+                                        chart_backend='none')
+        self.assertGreater(page_count(buf.getvalue()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
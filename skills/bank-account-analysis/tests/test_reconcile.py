@@ -0,0 +1,69 @@
+"""
+Card-bill reconciliation (reconcile.py).
+
+  python -m unittest discover -s skills/bank-account-analysis/tests
+"""
+
+import os
+import sys
+import unittest
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import reconcile   # noqa: E402
+
+
+def card(date, amount, source):
+    return {'date': date, 'description': 'עסק', 'amount': -amount,
+            'source': source, 'type': 'credit'}
+
+
+def bank(date, amount, description):
+    return {'date': date, 'description': description, 'amount': -amount,
+            'source': 'בנק', 'type': 'bank'}
+
+
+# Cal billed on the 2nd (the 2024-03-02 debit moved from Saturday to Sunday),
+# Max on the 15th
+TRANSACTIONS = [
+    card('2024-01-05', 100.0, 'ויזה כאל'), card('2024-01-20', 50.0, 'ויזה כאל'),
+    card('2024-02-04', 80.0, 'ויזה כאל'),
+    card('2024-01-03', 200.0, 'מקס'), card('2024-02-01', 70.0, 'מקס'),
+    bank('2024-02-02', 150.0, 'כאל חיוב חודשי'),
+    bank('2024-03-03', 80.0, 'כאל חיוב חודשי'),
+    bank('2024-01-15', 200.0, 'מקס איט פיננסים'),
+    bank('2024-02-15', 70.0, 'מקס איט פיננסים'),
+    bank('2024-02-10', 150.0, 'העברה'),
+]
+
+
+class ReconcileTest(unittest.TestCase):
+
+    def test_billing_days_are_inferred_from_bank_lines(self):
+        self.assertEqual(reconcile.infer_billing_days(TRANSACTIONS), {'ויזה כאל': 2, 'מקס': 15})
+
+    def test_every_bill_matches_with_inferred_days(self):
+        res = reconcile.reconcile(TRANSACTIONS)
+        self.assertEqual(len(res['matches']), 4)
+        self.assertEqual(res['unmatched_bills'], [])
+        self.assertEqual(list(res['duplicates']), [False] * 5 + [True] * 4 + [False])
+
+    def test_override_wins_over_inferred_day(self):
+        res = reconcile.reconcile(TRANSACTIONS, {'ויזה כאל': 20})
+        self.assertEqual(res['billing_days']['ויזה כאל'], 20)
+        self.assertEqual(len(res['matches']), 2)
+
+    def test_unmatched_bills_warn(self):
+        txs = [dict(tx) for tx in TRANSACTIONS if tx['description'] != 'כאל חיוב חודשי']
+        with self.assertWarnsRegex(UserWarning, 'matched no bank line'):
+            reconcile.mark_duplicates(txs)
+
+    def test_no_warning_when_all_bills_match(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            reconcile.mark_duplicates([dict(tx) for tx in TRANSACTIONS])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Recurring-payment detection (recurring.find_recurring).
+
+  python -m unittest discover -s skills/bank-account-analysis/tests
+"""
+
+import os
+import sys
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from recurring import find_recurring   # noqa: E402
+
+
+def rows(description, start, gaps, amounts, type_='credit'):
+    d = date.fromisoformat(start)
+    out = []
+    for gap, amount in zip([0] + list(gaps), amounts):
+        d += timedelta(days=gap)
+        out.append({'date': d.isoformat(), 'description': description,
+                    'amount': -amount, 'type': type_})
+    return out
+
+
+class RecurringTest(unittest.TestCase):
+
+    def test_irregular_supermarket_is_not_recurring(self):
+        gaps = [4, 9, 6, 10, 5, 7, 8, 4, 6, 9, 5, 10, 7, 6, 4, 8]
+        amounts = [412.3, 188.9, 655.0, 302.4, 97.8, 540.1, 233.6, 471.2, 150.0,
+                   389.9, 610.5, 276.4, 199.9, 505.3, 344.8, 128.7, 460.0]
+        txs = rows('שופרסל דיל', '2024-01-03', gaps, amounts)
+        self.assertEqual(find_recurring(txs), [])
+
+    def test_fixed_weekly_payment_is_recurring(self):
+        txs = rows('חוג שחייה', '2024-01-07', [7, 7, 6, 8, 7, 7], [120.0] * 7)
+        res = find_recurring(txs)
+        self.assertEqual(len(res), 1)
+        self.assertEqual(res[0]['frequency'], 'שבועי')
+
+    def test_short_weekly_run_is_not_recurring(self):
+        txs = rows('חוג שחייה', '2024-01-07', [7, 7], [120.0] * 3)
+        self.assertEqual(find_recurring(txs), [])
+
+    def test_monthly_subscription(self):
+        txs = rows('NETFLIX.COM', '2024-01-15', [31, 29, 31, 30, 31], [54.9] * 6)
+        res = find_recurring(txs)
+        self.assertEqual(len(res), 1)
+        self.assertEqual((res[0]['frequency'], res[0]['type']), ('חודשי', 'מנוי'))
+
+
+if __name__ == '__main__':
+    unittest.main()